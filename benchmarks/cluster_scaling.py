@@ -0,0 +1,79 @@
+"""Scaling benchmark of sharded monitoring. Local stand-in serves streams, coordinator with local workers
+   monitors the same number of streams per worker for every number of workers. Received frame rate of all
+   streams is compared to frame rate of stand-in, so efficiency must stay flat as workers are added.
+   Exit status is 1 if efficiency of any run is below the limit"""
+import argparse
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+RUN: str = 'from timestampinspect.display.application import run; run()'
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def measure(workers: int, streams: int, port: int, control: int, duration: float, environment: Dict[str, str]) -> float:
+    """Returns total frame rate of streams reported by coordinator with local workers"""
+    with tempfile.NamedTemporaryFile('w', suffix='.txt') as inventory:
+        inventory.writelines(f'http://127.0.0.1:{port}/s{workers}/{i}/0/0\n' for i in range(streams))
+        inventory.flush()
+        coordinator: subprocess.Popen = subprocess.Popen([sys.executable, '-c', RUN, 'coordinator', inventory.name,
+                                                          '-port', str(free_port()),
+                                                          '-period', '1',
+                                                          '-workers', str(workers),
+                                                          '-worker_options', f'-cp {control}'],
+                                                         env=environment,
+                                                         stdout=subprocess.PIPE,
+                                                         stderr=subprocess.DEVNULL)
+        time.sleep(duration)
+        coordinator.send_signal(signal.SIGINT)
+        output: str = coordinator.communicate()[0].decode()
+    lines: List[str] = [x for x in output.splitlines() if x.startswith('coordinator ')]
+    match = re.search(r' fps=([\d.]+)', lines[-1]) if lines else None
+    return float(match.group(1)) if match else 0.
+
+
+def run(argv: List[str] = None) -> int:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='scaling benchmark of sharded monitoring')
+    parser.add_argument('-workers', type=int, nargs='+', default=[1, 2, 4], help='numbers of workers (def. 1 2 4)')
+    parser.add_argument('-streams', type=int, default=8, help='streams per worker (def. 8)')
+    parser.add_argument('-fps', type=float, default=25., help='frame rate of stand-in streams (def. 25)')
+    parser.add_argument('-duration', type=float, default=6., help='seconds of every run (def. 6)')
+    parser.add_argument('-limit', type=float, default=.9, help='minimal efficiency (def. 0.9)')
+    args: argparse.Namespace = parser.parse_args(argv)
+    environment: Dict[str, str] = dict(os.environ)
+    source: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+    environment['PYTHONPATH'] = os.pathsep.join(filter(None, [source, environment.get('PYTHONPATH')]))
+    port, control = free_port(), free_port()
+    standin: subprocess.Popen = subprocess.Popen([sys.executable, '-c', RUN, 'standin',
+                                                  '-port', str(port), '-cp', str(control), '-fps', str(args.fps)],
+                                                 env=environment,
+                                                 stdout=subprocess.DEVNULL)
+    failed: int = 0
+    try:
+        time.sleep(.5)
+        for workers in args.workers:
+            streams: int = workers * args.streams
+            fps: float = measure(workers, streams, port, control, args.duration, environment)
+            efficiency: float = fps / (streams * args.fps)
+            print(f'workers={workers} streams={streams} fps={fps:.1f} efficiency={efficiency:.2f}' +
+                  (f' FAILED below {args.limit:.2f}' if efficiency < args.limit else ''))
+            failed += efficiency < args.limit
+    finally:
+        standin.terminate()
+        standin.wait()
+    return int(failed > 0)
+
+
+if __name__ == '__main__':
+    sys.exit(run())
@@ -0,0 +1,64 @@
+"""Import time benchmark of headless modules. Every module is imported in fresh interpreter several times,
+   median time is compared to budget and modules of terminal display and crypto must not be loaded.
+   Exit status is 1 if any module breaks the limits"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+MODULES: List[str] = ['timestampinspect.display.application',
+                      'timestampinspect.offline.analyzer',
+                      'timestampinspect.cluster.worker',
+                      'timestampinspect.cluster.coordinator',
+                      'timestampinspect.load.generator',
+                      'timestampinspect.analysis.statistics',
+                      'timestampinspect.protocols.rtsp',
+                      'timestampinspect.protocols.flv',
+                      'timestampinspect.protocols.axon',
+                      'timestampinspect.protocols.cdn']
+FORBIDDEN: List[str] = ['npyscreen', 'curses', '_curses', 'Crypto', 'sqlite3']
+PROBE: str = 'import sys, time, json\n' \
+             'start = time.perf_counter()\n' \
+             'import {module}\n' \
+             'elapsed = time.perf_counter() - start\n' \
+             'print(json.dumps([elapsed * 1000., sorted(set(sys.modules) & set({forbidden!r}))]))\n'
+
+
+def probe(module: str, environment: Dict[str, str]) -> List[Any]:
+    """Returns import time of module in msec. and forbidden modules loaded with it"""
+    output: bytes = subprocess.check_output([sys.executable, '-c', PROBE.format(module=module, forbidden=FORBIDDEN)],
+                                            env=environment)
+    return json.loads(output)
+
+
+def run(argv: List[str] = None) -> int:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='import time benchmark of headless modules')
+    parser.add_argument('-repeat', type=int, default=5, help='imports of every module (def. 5)')
+    parser.add_argument('-budget', type=float, default=80., help='median import time budget msec. (def. 80)')
+    parser.add_argument('modules', type=str, nargs='*', default=MODULES, help='modules to import (def. headless)')
+    args: argparse.Namespace = parser.parse_args(argv)
+    environment: Dict[str, str] = dict(os.environ)
+    source: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+    environment['PYTHONPATH'] = os.pathsep.join(filter(None, [source, environment.get('PYTHONPATH')]))
+    failed: int = 0
+    for module in args.modules:
+        try:
+            probes: List[List[Any]] = [probe(module, environment) for _ in range(args.repeat)]
+        except subprocess.CalledProcessError as err:
+            print(f'{module}: import failed with status {err.returncode}')
+            failed += 1
+            continue
+        median: float = statistics.median(p[0] for p in probes)
+        loaded: List[str] = sorted(set().union(*(p[1] for p in probes)))
+        errors: List[str] = ([f'over budget {args.budget:.0f}'] if median > args.budget else []) + \
+                            ([f'loads {",".join(loaded)}'] if loaded else [])
+        print(f'{module}: {median:.1f} ms' + (f' FAILED {"; ".join(errors)}' if errors else ''))
+        failed += bool(errors)
+    return int(failed > 0)
+
+
+if __name__ == '__main__':
+    sys.exit(run())
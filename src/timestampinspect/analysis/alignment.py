@@ -0,0 +1,124 @@
+"""Alignment of frames of two streams of the same content by cross-correlation of their frame intervals"""
+import operator
+from collections import Counter, namedtuple
+from typing import List, Sequence, Tuple
+
+
+Comparison: namedtuple = namedtuple('Comparison',
+                                    'frames lag correlation offset latency dropped duplicated rewritten deviation')
+
+MAX_LAG: int = 500
+MIN_OVERLAP: int = 16
+WINDOW: int = 64
+REWRITE_TOLERANCE: float = 2.
+
+
+def to_ms(timestamps: Sequence[int], rate: int, wrap: int = 1 << 32) -> List[float]:
+    """Returns timestamps in ms, unwrapped into increasing series"""
+    rc: List[float] = []
+    half: int = wrap >> 1
+    value: int = timestamps[0] if timestamps else 0
+    for timestamp in timestamps:
+        value += (timestamp - value % wrap + half) % wrap - half
+        rc.append(value * 1000. / rate)
+    return rc
+
+
+def intervals(values: Sequence[float]) -> List[float]:
+    return list(map(operator.sub, values[1:], values[:-1]))
+
+
+def correlation(x: Sequence[float], y: Sequence[float]) -> float:
+    """Returns Pearson correlation of two series of the same length"""
+    n: int = len(x)
+    mean_x: float = sum(x) / n
+    mean_y: float = sum(y) / n
+    dx: List[float] = [v - mean_x for v in x]
+    dy: List[float] = [v - mean_y for v in y]
+    sxx: float = sum(map(operator.mul, dx, dx))
+    syy: float = sum(map(operator.mul, dy, dy))
+    return sum(map(operator.mul, dx, dy)) / (sxx * syy) ** .5 if sxx and syy else 0.
+
+
+def best_lag(reference: Sequence[float], other: Sequence[float], max_lag: int = MAX_LAG) -> Tuple[int, float]:
+    """Returns lag of other series against reference one with the highest correlation, and the correlation.
+       Frame i of reference corresponds to frame i + lag of other. Correlation is taken over WINDOW values
+       at head of the series which starts later, so that every lag is judged by the same number of values,
+       and frames dropped later in the streams do not shift alignment"""
+    window: int = min(WINDOW, len(reference), len(other))
+    rc: Tuple[int, float] = (0, -2.)
+    if window < MIN_OVERLAP:
+        return rc
+    for lag in range(min(max_lag, len(other) - window) + 1):
+        value: float = correlation(reference[:window], other[lag:lag + window])
+        if value > rc[1]:
+            rc = (lag, value)
+    for lag in range(1, min(max_lag, len(reference) - window) + 1):
+        value = correlation(reference[lag:lag + window], other[:window])
+        if value > rc[1]:
+            rc = (-lag, value)
+    return rc
+
+
+def compare(reference: Tuple[List[float], List[int]],
+            other: Tuple[List[float], List[int]],
+            max_lag: int = MAX_LAG) -> Comparison:
+    """Compares frames of other stream with frames of reference stream. Frames are given as
+       timestamps in ms and arrival times in ns. Lag is found by correlation of frame intervals;
+       if they do not vary, frames are aligned by arrival time (correlation is 0). Offset of timestamps
+       is the most frequent one over aligned frames, as dropped frames shift alignment of the rest.
+       Offset and latency are medians over aligned frames having that offset. Frames are then matched
+       by timestamps shifted by offset: unmatched reference frames are dropped, unmatched other frames
+       are duplicated, and matched frames deviating from offset by more than REWRITE_TOLERANCE ms
+       have rewritten timestamps"""
+    timestamps, arrivals = reference
+    other_timestamps, other_arrivals = other
+    if len(timestamps) < MIN_OVERLAP + 1 or len(other_timestamps) < MIN_OVERLAP + 1:
+        return Comparison(0, 0, 0., 0., 0., 0, 0, 0, 0.)
+    lag, value = best_lag(intervals(timestamps), intervals(other_timestamps), max_lag)
+    if value <= 0.:
+        lag, value = _nearest(other_arrivals, arrivals[0]) - _nearest(arrivals, other_arrivals[0]), 0.
+    pairs: List[Tuple[int, int]] = [(i, i + lag) for i in range(max(0, -lag), min(len(timestamps),
+                                                                                  len(other_timestamps) - lag))]
+    offsets: List[float] = [other_timestamps[j] - timestamps[i] for i, j in pairs]
+    common: int = Counter(round(x / REWRITE_TOLERANCE) for x in offsets).most_common(1)[0][0]
+    pairs = [pair for pair, x in zip(pairs, offsets) if abs(x - common * REWRITE_TOLERANCE) <= REWRITE_TOLERANCE]
+    offset: float = _median([other_timestamps[j] - timestamps[i] for i, j in pairs])
+    latency: float = _median([other_arrivals[j] - arrivals[i] for i, j in pairs]) / 1e6
+    tolerance: float = _median(intervals(timestamps)) / 2.
+    begin: float = max(timestamps[0], other_timestamps[0] - offset) - tolerance
+    end: float = min(timestamps[-1], other_timestamps[-1] - offset) + tolerance
+    matched = dropped = duplicated = rewritten = 0
+    deviation: float = 0.
+    i: int = 0
+    j: int = 0
+    while i < len(timestamps) and j < len(other_timestamps):
+        r: float = timestamps[i]
+        o: float = other_timestamps[j] - offset
+        if not begin <= r <= end:
+            i += 1
+        elif not begin <= o <= end:
+            j += 1
+        elif abs(o - r) <= tolerance:
+            matched += 1
+            if abs(o - r) > REWRITE_TOLERANCE:
+                rewritten += 1
+            deviation = max(deviation, abs(o - r))
+            i += 1
+            j += 1
+        elif o < r:
+            duplicated += 1
+            j += 1
+        else:
+            dropped += 1
+            i += 1
+    return Comparison(matched, lag, value, offset, latency, dropped, duplicated, rewritten, deviation)
+
+
+def _nearest(values: Sequence[int], value: int) -> int:
+    """Returns index of value nearest to given one"""
+    return min(range(len(values)), key=lambda i: abs(values[i] - value))
+
+
+def _median(values: List[float]) -> float:
+    return sorted(values)[len(values) // 2] if values else 0.
@@ -0,0 +1,82 @@
+"""Fingerprints of access units by crc32 of their payload, to detect frozen and repeated frames"""
+import zlib
+from collections import deque
+from enum import IntEnum
+from typing import Dict, Tuple
+
+
+Repeat: IntEnum = IntEnum('Repeat', ('NONE',
+                                     'WINDOW',
+                                     'PREVIOUS')
+                          )
+
+# Access unit bytes above the limit are sampled: only first SAMPLE_SIZE bytes of every chunk are hashed
+SAMPLE_LIMIT: int = 65536
+SAMPLE_SIZE: int = 64
+
+
+class RepeatDetector:
+    """Class to fingerprint access units and find ones repeating previous unit (frozen)
+       or some other unit in sliding window. Payload is hashed in place, without copying.
+       Access unit ends when chunk with new timestamp arrives"""
+    def __init__(self, window: int = 64, limit: int = SAMPLE_LIMIT) -> None:
+        self.frames: int = 0
+        self.frozen: int = 0
+        self.repeated: int = 0
+        self.run: int = 0
+        self.longest: Tuple[int, int] = (0, 0)
+        self.timestamp: int = -1
+        self._limit: int = limit
+        self._window: deque = deque(maxlen=window)
+        self._counts: Dict[int, int] = {}
+        self._crc: int = 0
+        self._size: int = 0
+
+    def __repr__(self):
+        return f'fingerprints: frames={self.frames} frozen={self.frozen} repeated={self.repeated} ' \
+               f'longest frozen run={self.longest[0]}@{self.longest[1]}'
+
+    def update(self, timestamp: int, data: memoryview) -> Repeat:
+        """Adds chunk of access unit with timestamp. Returns repeat kind of previous unit if chunk starts new one"""
+        rc: Repeat = Repeat.NONE
+        if timestamp != self.timestamp:
+            if self.timestamp >= 0:
+                rc = self._finish()
+            self.timestamp = timestamp
+            self._crc = 0
+            self._size = 0
+        self.update_payload(data)
+        return rc
+
+    def update_payload(self, data: memoryview) -> None:
+        """Adds continuation of last chunk"""
+        room: int = self._limit - self._size
+        if len(data) <= room:
+            self._crc = zlib.crc32(data, self._crc)
+        else:
+            self._crc = zlib.crc32(data[:max(room, SAMPLE_SIZE)], self._crc)
+        self._size += len(data)
+
+    def _finish(self) -> Repeat:
+        fingerprint: int = (self._size << 32) | self._crc
+        self.frames += 1
+        rc: Repeat = Repeat.NONE
+        if self._window and self._window[-1] == fingerprint:
+            rc = Repeat.PREVIOUS
+            self.frozen += 1
+            self.run += 1
+            if self.run > self.longest[0]:
+                self.longest = (self.run, self.timestamp)
+        else:
+            self.run = 0
+            if fingerprint in self._counts:
+                rc = Repeat.WINDOW
+                self.repeated += 1
+        if len(self._window) == self._window.maxlen:
+            oldest: int = self._window[0]
+            self._counts[oldest] -= 1
+            if not self._counts[oldest]:
+                del self._counts[oldest]
+        self._window.append(fingerprint)
+        self._counts[fingerprint] = self._counts.get(fingerprint, 0) + 1
+        return rc
@@ -0,0 +1,192 @@
+"""Compressed in-memory history of frame timestamps and arrival times.
+   Samples are delta-of-delta encoded into variable length bit codes and kept in chunks,
+   which are decoded only when a query touches them"""
+import bisect
+from collections import namedtuple
+from datetime import datetime
+from typing import Iterator, List, Tuple
+
+
+Sample: namedtuple = namedtuple('Sample', 'timestamp arrival')
+
+# Prefix bit codes of delta-of-delta value: (prefix, prefix width, value width)
+CODES: Tuple[Tuple[int, int, int], ...] = ((0b10, 2, 4),
+                                           (0b110, 3, 8),
+                                           (0b1110, 4, 16),
+                                           (0b1111, 4, 64))
+
+
+class BitWriter:
+    """Class to append bit fields to byte array. Full bytes are flushed as soon as they are ready"""
+    __slots__ = ('data', '_accumulator', '_length')
+
+    def __init__(self) -> None:
+        self.data: bytearray = bytearray()
+        self._accumulator: int = 0
+        self._length: int = 0
+
+    def write(self, value: int, width: int) -> None:
+        self._accumulator = (self._accumulator << width) | (value & ((1 << width) - 1))
+        self._length += width
+        while self._length >= 8:
+            self._length -= 8
+            self.data.append((self._accumulator >> self._length) & 0xff)
+        self._accumulator &= (1 << self._length) - 1
+
+    def write_dod(self, value: int) -> None:
+        """Writes delta-of-delta: single zero bit if it is zero, else shortest code it fits"""
+        if not value:
+            self.write(0, 1)
+            return
+        for prefix, prefix_width, width in CODES:
+            if -(1 << (width - 1)) <= value < 1 << (width - 1):
+                self.write(prefix, prefix_width)
+                self.write(value, width)
+                return
+
+    def getvalue(self) -> bytes:
+        """Returns written bits padded with zeros to byte boundary"""
+        return bytes(self.data) + (bytes(((self._accumulator << (8 - self._length)) & 0xff,))
+                                   if self._length else b'')
+
+
+class BitReader:
+    """Class to read bit fields written by BitWriter"""
+    __slots__ = ('_data', '_position', '_accumulator', '_length')
+
+    def __init__(self, data: bytes) -> None:
+        self._data: bytes = data
+        self._position: int = 0
+        self._accumulator: int = 0
+        self._length: int = 0
+
+    def read(self, width: int) -> int:
+        while self._length < width:
+            self._accumulator = (self._accumulator << 8) | self._data[self._position]
+            self._position += 1
+            self._length += 8
+        self._length -= width
+        value: int = self._accumulator >> self._length
+        self._accumulator &= (1 << self._length) - 1
+        return value
+
+    def read_dod(self) -> int:
+        if not self.read(1):
+            return 0
+        for i, (_, _, width) in enumerate(CODES):
+            if i == len(CODES) - 1 or not self.read(1):
+                value: int = self.read(width)
+                return value - (1 << width) if value >> (width - 1) else value
+        return 0
+
+
+class Chunk:
+    """Class of consecutive samples. First sample is kept as is, the rest are encoded by BitWriter"""
+    __slots__ = ('first', 'last', 'count', '_writer', '_data', '_delta')
+
+    def __init__(self, first: Sample) -> None:
+        self.first: Sample = first
+        self.last: Sample = first
+        self.count: int = 1
+        self._writer: BitWriter = BitWriter()
+        self._data: bytes = b''
+        self._delta: Tuple[int, int] = (0, 0)
+
+    def __len__(self):
+        return len(self._data) if self._writer is None else len(self._writer.data)
+
+    def append(self, sample: Sample, wrap: int) -> None:
+        half: int = wrap >> 1
+        delta: Tuple[int, int] = ((sample.timestamp - self.last.timestamp + half) % wrap - half,
+                                  sample.arrival - self.last.arrival)
+        self._writer.write_dod(delta[0] - self._delta[0])
+        self._writer.write_dod(delta[1] - self._delta[1])
+        self._delta = delta
+        self.last = sample
+        self.count += 1
+
+    def close(self) -> None:
+        """Freezes chunk. Its bits are kept as immutable bytes without spare capacity"""
+        self._data = self._writer.getvalue()
+        self._writer = None
+
+    def samples(self, wrap: int) -> Iterator[Sample]:
+        """Decodes samples of chunk"""
+        count: int = self.count
+        reader: BitReader = BitReader(self._data if self._writer is None else self._writer.getvalue())
+        timestamp, arrival = self.first
+        delta_timestamp: int = 0
+        delta_arrival: int = 0
+        yield self.first
+        for _ in range(count - 1):
+            delta_timestamp += reader.read_dod()
+            delta_arrival += reader.read_dod()
+            timestamp = (timestamp + delta_timestamp) % wrap
+            arrival += delta_arrival
+            yield Sample(timestamp, arrival)
+
+
+class TimestampHistory:
+    """Class of per frame history of stream timestamps and arrival times in nanoseconds.
+       Arrival times are kept with given resolution and expected not to decrease.
+       Samples with timestamp of previous sample belong to the same frame and are not kept"""
+    CHUNK_SIZE: int = 4096
+
+    def __init__(self, wrap: int = 1 << 32, resolution: int = 1000000) -> None:
+        self._wrap: int = wrap
+        self._resolution: int = resolution
+        self._chunks: List[Chunk] = []
+        self._begins: List[int] = []
+        self._decoded: Tuple[Chunk, List[Sample]] = (None, [])
+
+    def __len__(self):
+        return sum(chunk.count for chunk in self._chunks)
+
+    def __repr__(self):
+        count: int = len(self)
+        size: int = sum(len(chunk) for chunk in self._chunks)
+        return f'history: frames={count} bytes={size}' + (f' bits/frame={size * 8 / count:.2f}' if count else '')
+
+    def append(self, timestamp: int, arrival: int) -> None:
+        """Adds frame with stream timestamp, received at arrival time in nanoseconds"""
+        sample: Sample = Sample(timestamp % self._wrap, arrival // self._resolution)
+        if not self._chunks or self._chunks[-1].count >= TimestampHistory.CHUNK_SIZE:
+            if self._chunks:
+                if sample.timestamp == self._chunks[-1].last.timestamp:
+                    return
+                self._chunks[-1].close()
+            self._chunks.append(Chunk(sample))
+            self._begins.append(sample.arrival)
+        elif sample.timestamp != self._chunks[-1].last.timestamp:
+            self._chunks[-1].append(sample, self._wrap)
+
+    def range(self, begin: int, end: int) -> Iterator[Sample]:
+        """Yields frames received in [begin, end) wall-clock nanoseconds. Only chunks in range are decoded"""
+        begin //= self._resolution
+        end = -(-end // self._resolution)
+        for i in range(max(bisect.bisect_right(self._begins, begin) - 1, 0), len(self._chunks)):
+            chunk: Chunk = self._chunks[i]
+            if chunk.first.arrival >= end:
+                break
+            if chunk.last.arrival < begin:
+                continue
+            for sample in self._samples(chunk):
+                if begin <= sample.arrival < end:
+                    yield Sample(sample.timestamp, sample.arrival * self._resolution)
+
+    def lines(self, begin: int, end: int) -> List[str]:
+        """Returns text lines of frames received in [begin, end) wall-clock nanoseconds"""
+        rc: List[str] = []
+        previous: int = -1
+        half: int = self._wrap >> 1
+        for sample in self.range(begin, end):
+            delta: int = (sample.timestamp - previous + half) % self._wrap - half if previous >= 0 else 0
+            arrival: str = datetime.fromtimestamp(sample.arrival / 1e9).strftime('%H:%M:%S.%f')[:-3]
+            rc.append(f'ts={sample.timestamp}, delta={delta}, arrival={arrival}')
+            previous = sample.timestamp
+        return rc
+
+    def _samples(self, chunk: Chunk) -> List[Sample]:
+        if self._decoded[0] is not chunk or len(self._decoded[1]) != chunk.count:
+            self._decoded = (chunk, list(chunk.samples(self._wrap)))
+        return self._decoded[1]
@@ -0,0 +1,434 @@
+"""Online estimators of stream timing. Memory does not depend on number of samples.
+   Estimators of consecutive parts of series, e.g. regions of file, are merged into estimators of whole series"""
+from bisect import bisect_left
+from collections import deque
+from typing import Callable, List, Tuple, Union
+
+
+NTP_UNIX_OFFSET: int = 2208988800
+
+
+def ntp_to_ns(seconds: int, fraction: int) -> int:
+    """Converts 64 bit ntp timestamp to unix time in nanoseconds"""
+    return (seconds - NTP_UNIX_OFFSET) * 1000000000 + (fraction * 1000000000 >> 32)
+
+
+class Welford:
+    """Class of running mean and variance by Welford algorithm"""
+    __slots__ = ('count', 'mean', '_m2')
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.mean: float = 0.
+        self._m2: float = 0.
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        delta: float = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    def merge(self, other: 'Welford') -> None:
+        """Merges moments of other series by Chan's parallel algorithm"""
+        count: int = self.count + other.count
+        if other.count:
+            delta: float = other.mean - self.mean
+            self._m2 += other._m2 + delta * delta * self.count * other.count / count
+            self.mean += delta * other.count / count
+            self.count = count
+
+
+class Ewma:
+    """Class of exponentially weighted moving average"""
+    __slots__ = ('alpha', 'value')
+
+    def __init__(self, alpha: float = .1) -> None:
+        self.alpha: float = alpha
+        self.value: float = 0.
+
+    def update(self, value: float, first: bool = False) -> None:
+        self.value = value if first else self.value + self.alpha * (value - self.value)
+
+
+class P2Quantile:
+    """Class of quantile estimation by P-square algorithm of Jain and Chlamtac. Keeps five markers"""
+    __slots__ = ('p', '_heights', '_positions', '_desired', '_increments')
+
+    def __init__(self, p: float) -> None:
+        self.p: float = p
+        self._heights: List[float] = []
+        self._positions: List[int] = [1, 2, 3, 4, 5]
+        self._desired: List[float] = [1., 1. + 2. * p, 1. + 4. * p, 3. + 2. * p, 5.]
+        self._increments: Tuple[float, ...] = (0., p / 2., p, (1. + p) / 2., 1.)
+
+    @property
+    def value(self) -> float:
+        if len(self._heights) < 5:
+            heights: List[float] = sorted(self._heights)
+            return heights[int(round((len(heights) - 1) * self.p))] if heights else 0.
+        return self._heights[2]
+
+    def update(self, value: float) -> None:
+        q: List[float] = self._heights
+        if len(q) < 5:
+            q.append(value)
+            if len(q) == 5:
+                q.sort()
+            return
+        if value < q[0]:
+            q[0] = value
+            k: int = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = 0
+            while value >= q[k + 1]:
+                k += 1
+        n: List[int] = self._positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+        for i in (1, 2, 3):
+            d: float = self._desired[i] - n[i]
+            if (d >= 1. and n[i + 1] - n[i] > 1) or (d <= -1. and n[i - 1] - n[i] < -1):
+                s: int = 1 if d > 0 else -1
+                height: float = q[i] + s / (n[i + 1] - n[i - 1]) * \
+                    ((n[i] - n[i - 1] + s) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                     (n[i + 1] - n[i] - s) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + s * (q[i + s] - q[i]) / (n[i + s] - n[i])
+                q[i] = height
+                n[i] += s
+
+    def merge(self, other: 'P2Quantile') -> None:
+        """Merges estimation of other series. Markers of each series are taken as piecewise linear
+           distribution of its samples, merged markers are placed at desired positions of their sum"""
+        if len(other._heights) < 5 or len(self._heights) < 5:
+            small, large = (other, self) if len(other._heights) < 5 else (self, other)
+            heights: List[float] = list(small._heights)
+            self._heights, self._positions, self._desired = \
+                list(large._heights), list(large._positions), list(large._desired)
+            for value in heights:
+                self.update(value)
+            return
+        markers: List[Tuple[List[float], List[int]]] = [(self._heights, self._positions),
+                                                         (other._heights, other._positions)]
+        count: int = self._positions[4] + other._positions[4]
+        breaks: List[float] = sorted(set(self._heights + other._heights))
+        ranks: List[float] = [sum(P2Quantile._rank(h, q, n) for q, n in markers) for h in breaks]
+        heights = [breaks[0], 0., 0., 0., breaks[-1]]
+        positions: List[int] = [1, 0, 0, 0, count]
+        for i in (1, 2, 3):
+            desired: float = 1. + (count - 1) * self._increments[i]
+            k: int = min(max(bisect_left(ranks, desired), 1), len(ranks) - 1)
+            span: float = ranks[k] - ranks[k - 1]
+            share: float = min(max((desired - ranks[k - 1]) / span, 0.), 1.) if span else 0.
+            heights[i] = breaks[k - 1] + share * (breaks[k] - breaks[k - 1])
+            positions[i] = min(max(int(round(desired)), positions[i - 1] + 1), count - 4 + i)
+        self._heights, self._positions = heights, positions
+        self._desired = [1. + (count - 1) * x for x in self._increments]
+
+    @staticmethod
+    def _rank(value: float, heights: List[float], positions: List[int]) -> float:
+        """Returns interpolated number of samples not greater than value"""
+        if value < heights[0]:
+            return 0.
+        if value >= heights[4]:
+            return float(positions[4])
+        k: int = bisect_left(heights, value, 1)
+        if heights[k] == value:
+            return float(positions[k])
+        return positions[k - 1] + (value - heights[k - 1]) / (heights[k] - heights[k - 1]) * \
+            (positions[k] - positions[k - 1])
+
+
+class Estimator:
+    """Class of online estimators of one series: moments, ewma, quantiles and extremes with their timestamps"""
+    QUANTILES: Tuple[float, ...] = (.5, .95, .99)
+
+    def __init__(self) -> None:
+        self.moments: Welford = Welford()
+        self.ewma: Ewma = Ewma()
+        self.quantiles: List[P2Quantile] = [P2Quantile(p) for p in Estimator.QUANTILES]
+        self.minimum: Tuple[float, int] = (0., 0)
+        self.maximum: Tuple[float, int] = (0., 0)
+
+    def __repr__(self):
+        if not self.moments.count:
+            return 'n=0'
+        return f'n={self.moments.count} ' \
+               f'mean={self.moments.mean:.3f} ' \
+               f'std={self.moments.variance ** .5:.3f} ' \
+               f'ewma={self.ewma.value:.3f} ' + \
+               ' '.join(f'p{int(q.p * 100)}={q.value:.3f}' for q in self.quantiles) + \
+               f' min={self.minimum[0]:g}@{self.minimum[1]} max={self.maximum[0]:g}@{self.maximum[1]}'
+
+    def update(self, value: float, timestamp: int) -> None:
+        """Adds value observed at stream timestamp"""
+        first: bool = not self.moments.count
+        self.moments.update(value)
+        self.ewma.update(value, first)
+        for q in self.quantiles:
+            q.update(value)
+        if first or value < self.minimum[0]:
+            self.minimum = (value, timestamp)
+        if first or value > self.maximum[0]:
+            self.maximum = (value, timestamp)
+
+    def merge(self, other: 'Estimator') -> None:
+        """Merges estimators of other series, which follows this one"""
+        if not other.moments.count:
+            return
+        first: bool = not self.moments.count
+        self.moments.merge(other.moments)
+        self.ewma.value = other.ewma.value
+        for q, o in zip(self.quantiles, other.quantiles):
+            q.merge(o)
+        if first or other.minimum[0] < self.minimum[0]:
+            self.minimum = other.minimum
+        if first or other.maximum[0] > self.maximum[0]:
+            self.maximum = other.maximum
+
+
+class LinearFit:
+    """Class of incremental least squares fit of y = intercept + slope * x. Keeps means and co-moments only"""
+    __slots__ = ('count', 'mean_x', 'mean_y', '_cxy', '_m2x')
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.mean_x: float = 0.
+        self.mean_y: float = 0.
+        self._cxy: float = 0.
+        self._m2x: float = 0.
+
+    @property
+    def slope(self) -> float:
+        return self._cxy / self._m2x if self._m2x else 1.
+
+    def predict(self, x: float) -> float:
+        return self.mean_y + self.slope * (x - self.mean_x)
+
+    def update(self, x: float, y: float) -> None:
+        self.count += 1
+        dx: float = x - self.mean_x
+        self.mean_x += dx / self.count
+        self.mean_y += (y - self.mean_y) / self.count
+        self._cxy += dx * (y - self.mean_y)
+        self._m2x += dx * (x - self.mean_x)
+
+    def merge(self, other: 'LinearFit', shift: Tuple[float, float] = (0., 0.)) -> None:
+        """Merges fit of other points, shifted by (x, y) to coordinates of this fit.
+           Co-moments do not depend on shift"""
+        count: int = self.count + other.count
+        if other.count:
+            dx: float = other.mean_x + shift[0] - self.mean_x
+            dy: float = other.mean_y + shift[1] - self.mean_y
+            weight: float = self.count * other.count / count
+            self._cxy += other._cxy + dx * dy * weight
+            self._m2x += other._m2x + dx * dx * weight
+            self.mean_x += dx * other.count / count
+            self.mean_y += dy * other.count / count
+            self.count = count
+
+
+class ClockEstimator:
+    """Class to estimate source clock against arrival times in nanoseconds.
+       Frame time at source is taken from rtcp sender report mapping of timestamps to ntp time if there is one,
+       else from timestamps at nominal clock rate. Arrival time is fitted linearly against source time:
+       slope gives clock drift, residuals give jitter and jitter buffer size. End-to-end delay
+       is known only with sender reports and assumes that source and receiver clocks are synchronized"""
+    MIN_FIT: int = 16
+
+    def __init__(self, rate: int = 90000, wrap: int = 1 << 32) -> None:
+        self.rate: int = rate
+        self.delay: Estimator = Estimator()
+        self.jitter: float = 0.
+        self._wrap: int = wrap
+        self._report: Tuple[int, int] = (0, 0)
+        self.restart()
+
+    def __repr__(self):
+        if self._fit.count < ClockEstimator.MIN_FIT:
+            return 'clock: n/a'
+        return f'clock: drift={self.drift:+.1f}ppm ' \
+               f'jitter={self.jitter * 1000.:.3f}ms ' \
+               f'buffer={self.buffer:.1f}ms ' + \
+               (f'delay ms: {self.delay}' if self._report[0] else 'delay: n/a (no sender report)')
+
+    @property
+    def drift(self) -> float:
+        """Returns source clock drift in ppm, positive if source clock is faster than receiver one"""
+        return (1. / self._fit.slope - 1.) * 1e6 if self._fit.count >= ClockEstimator.MIN_FIT else 0.
+
+    @property
+    def buffer(self) -> float:
+        """Returns jitter buffer size in ms to absorb 98% of frame arrival deviations"""
+        if self._fit.count < ClockEstimator.MIN_FIT:
+            return 0.
+        return (self._late.value - self._early.value) * 1000.
+
+    def on_sender_report(self, ntp: int, timestamp: int) -> None:
+        """Handler, called when rtcp sender report maps timestamp to ntp time in unix nanoseconds"""
+        if self._timestamp < 0:
+            return
+        first: bool = not self._report[0]
+        self._report = (ntp, self._unwrap(timestamp))
+        if first:
+            self._restart_fit()
+
+    def update(self, timestamp: int, arrival: int) -> None:
+        """Adds frame with stream timestamp, received at arrival time in nanoseconds (0 if unknown)"""
+        if not arrival or (self._timestamp >= 0 and timestamp == self._timestamp % self._wrap):
+            return
+        self._timestamp = self._unwrap(timestamp) if self._timestamp >= 0 else timestamp
+        if self._report[0]:
+            source: int = self._report[0] + (self._timestamp - self._report[1]) * 1000000000 // self.rate
+            self.delay.update((arrival - source) / 1e6, timestamp)
+        else:
+            source = self._timestamp * 1000000000 // self.rate
+        if not self._fit.count:
+            self._base = (source, arrival)
+        x: float = (source - self._base[0]) / 1e9
+        y: float = (arrival - self._base[1]) / 1e9
+        if self._fit.count:
+            d: float = (y - self._previous[1]) - (x - self._previous[0])
+            self.jitter += (abs(d) - self.jitter) / 16.
+        if self._fit.count >= ClockEstimator.MIN_FIT:
+            residual: float = y - self._fit.predict(x)
+            self._early.update(residual)
+            self._late.update(residual)
+        self._fit.update(x, y)
+        self._previous = (x, y)
+
+    def merge(self, other: 'ClockEstimator') -> None:
+        """Merges estimation of other part of stream, which follows this one. Fit of other part is shifted
+           to base of this one. Source times of parts without sender reports may differ by timestamp wraps,
+           they are aligned to arrival times. Parts with and without sender report are aligned by arrival"""
+        self.delay.merge(other.delay)
+        if not other._fit.count:
+            return
+        if not self._fit.count:
+            self._fit, self._early, self._late = other._fit, other._early, other._late
+            self._base, self._previous, self.jitter = other._base, other._previous, other.jitter
+        else:
+            shift: Tuple[float, float] = ((other._base[0] - self._base[0]) / 1e9,
+                                          (other._base[1] - self._base[1]) / 1e9)
+            if bool(self._report[0]) != bool(other._report[0]):
+                shift = (shift[1], shift[1])
+            elif not other._report[0]:
+                period: float = self._wrap / self.rate
+                shift = (shift[0] + round((shift[1] - shift[0]) / period) * period, shift[1])
+            self.jitter = (self.jitter * self._fit.count + other.jitter * other._fit.count) / \
+                (self._fit.count + other._fit.count)
+            self._fit.merge(other._fit, shift)
+            self._early.merge(other._early)
+            self._late.merge(other._late)
+            self._previous = (other._previous[0] + shift[0], other._previous[1] + shift[1])
+        self._timestamp = other._timestamp
+        if other._report[0]:
+            self._report = other._report
+
+    def restart(self) -> None:
+        """Forgets timestamps, next frame starts new fit"""
+        self._timestamp: int = -1
+        self._report = (0, 0)
+        self._restart_fit()
+
+    def _restart_fit(self) -> None:
+        self._fit: LinearFit = LinearFit()
+        self._early: P2Quantile = P2Quantile(.01)
+        self._late: P2Quantile = P2Quantile(.99)
+        self._base: Tuple[int, int] = (0, 0)
+        self._previous: Tuple[float, float] = (0., 0.)
+
+    def _unwrap(self, timestamp: int) -> int:
+        half: int = self._wrap >> 1
+        return self._timestamp + (timestamp - self._timestamp % self._wrap + half) % self._wrap - half
+
+
+class StreamStatistics:
+    """Class of stream statistics: timestamp deltas in stream clock units and inter-arrival times in ms,
+       counters of frames, bytes and lost packets, few recent timestamp deltas and source clock estimation.
+       Samples with timestamp of previous sample belong to the same frame and are not counted.
+       Recorder, if set, gets every update: a frame, or a part of frame sources pass apart, with its size in bytes.
+       Statistics of consecutive parts of stream are merged"""
+    RECENT: int = 32
+
+    def __init__(self, wrap: int = 1 << 32, rate: int = 90000) -> None:
+        self.timestamp_delta: Estimator = Estimator()
+        self.inter_arrival: Estimator = Estimator()
+        self.clock: ClockEstimator = ClockEstimator(rate, wrap)
+        self.frames: int = 0
+        self.bytes: int = 0
+        self.lost: int = 0
+        self.recent: deque = deque(maxlen=StreamStatistics.RECENT)
+        self.recorder: Union[Callable[[int, int, int], None], None] = None
+        self._wrap: int = wrap
+        self._timestamp: int = -1
+        self._arrival: int = 0
+        self._first: Tuple[int, int] = (-1, 0)
+
+    def __repr__(self):
+        return f'timestamp delta: {self.timestamp_delta}\n' \
+               f'inter-arrival ms: {self.inter_arrival}\n' \
+               f'{self.clock}'
+
+    def update(self, timestamp: int, arrival: int = 0, size: int = 0) -> None:
+        """Adds packet of size bytes with stream timestamp, received at arrival time in nanoseconds (0 if unknown)"""
+        self.bytes += size
+        if self.recorder:
+            self.recorder(timestamp, arrival, size)
+        if timestamp == self._timestamp:
+            return
+        self.frames += 1
+        self.clock.update(timestamp, arrival)
+        if self._timestamp >= 0:
+            half: int = self._wrap >> 1
+            delta: int = (timestamp - self._timestamp + half) % self._wrap - half
+            self.timestamp_delta.update(delta, timestamp)
+            self.recent.append(delta)
+            if arrival and self._arrival:
+                self.inter_arrival.update((arrival - self._arrival) / 1000000., timestamp)
+        else:
+            self._first = (timestamp, arrival)
+        self._timestamp = timestamp
+        self._arrival = arrival
+
+    def merge(self, other: 'StreamStatistics') -> None:
+        """Merges statistics of other part of stream, which follows this one. Delta between last frame of this part
+           and first frame of other one is added, frame split between the parts is counted once"""
+        self.bytes += other.bytes
+        self.lost += other.lost
+        self.frames += other.frames
+        if other._first[0] < 0:
+            return
+        if self._timestamp >= 0:
+            timestamp, arrival = other._first
+            half: int = self._wrap >> 1
+            delta: int = (timestamp - self._timestamp + half) % self._wrap - half
+            if delta:
+                self.timestamp_delta.update(delta, timestamp)
+                if arrival and self._arrival:
+                    self.inter_arrival.update((arrival - self._arrival) / 1000000., timestamp)
+            else:
+                self.frames -= 1
+        else:
+            self._first = other._first
+        self.timestamp_delta.merge(other.timestamp_delta)
+        self.inter_arrival.merge(other.inter_arrival)
+        self.clock.merge(other.clock)
+        self.recent.extend(other.recent)
+        self._timestamp = other._timestamp
+        self._arrival = other._arrival
+
+    def restart(self) -> None:
+        """Forgets previous frame, next one starts new series of deltas"""
+        self._timestamp = -1
+        self._arrival = 0
+        self.clock.restart()
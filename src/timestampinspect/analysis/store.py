@@ -0,0 +1,284 @@
+"""Persistent store of frames and per-interval aggregates of streams in sqlite database (wal mode).
+   Tables are partitioned by day of arrival time (utc): frames_YYYYMMDD and intervals_YYYYMMDD"""
+import argparse
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Tuple
+from .statistics import StreamStatistics
+
+
+PARTITION_FORMAT: str = '%Y%m%d'
+WRAP: int = 1 << 32
+
+FRAMES_COLUMNS: str = 'stream INTEGER, arrival INTEGER, timestamp INTEGER, delta INTEGER, size INTEGER'
+INTERVALS_COLUMNS: str = 'stream INTEGER, time INTEGER, frames INTEGER, bytes INTEGER, ' \
+                         'delta_min INTEGER, delta_max INTEGER, delta_mean REAL, gap_max REAL, ' \
+                         'lost INTEGER, drift REAL, jitter REAL'
+
+
+def partition(ns: int) -> str:
+    """Returns partition suffix of unix time in nanoseconds"""
+    return datetime.fromtimestamp(ns // 1000000000, timezone.utc).strftime(PARTITION_FORMAT)
+
+
+class Interval:
+    """Class of aggregate of frames arrived during interval"""
+    __slots__ = ('start', 'frames', 'bytes', 'deltas', 'delta_min', 'delta_max', 'delta_sum', 'gap_max')
+
+    def __init__(self, start: int = 0) -> None:
+        self.start: int = start
+        self.frames: int = 0
+        self.bytes: int = 0
+        self.deltas: int = 0
+        self.delta_min: int = 0
+        self.delta_max: int = 0
+        self.delta_sum: int = 0
+        self.gap_max: float = 0.
+
+    def update(self, delta: int, gap: float) -> None:
+        """Adds timestamp delta and inter-arrival time in ms of frame"""
+        self.delta_min = min(self.delta_min, delta) if self.deltas else delta
+        self.delta_max = max(self.delta_max, delta) if self.deltas else delta
+        self.delta_sum += delta
+        self.deltas += 1
+        self.gap_max = max(self.gap_max, gap)
+
+
+class Frame:
+    """Class to merge packets with the same timestamp into frame"""
+    __slots__ = ('arrival', 'timestamp', 'delta', 'size', 'interval')
+
+    def __init__(self) -> None:
+        self.arrival: int = 0
+        self.timestamp: int = -1
+        self.delta: int = 0
+        self.size: int = 0
+        self.interval: Interval = Interval()
+
+
+class Store(threading.Thread):
+    """Class to write frames of streams to sqlite database. Connection threads only append packets
+       to queue, never waiting for the database; packets above queue limit are dropped and counted.
+       Store thread merges packets into frames and interval aggregates and writes them in a transaction
+       per batch. Insert statements are the same for every batch, so sqlite3 prepares them once"""
+    FLUSH: float = .5
+
+    def __init__(self,
+                 path: str,
+                 retention: int = 7,
+                 interval: float = 1.,
+                 limit: int = 1 << 20) -> None:
+        super().__init__(daemon=True)
+        self.dropped: int = 0
+        self._path: str = path
+        self._retention: int = retention
+        self._interval: int = int(interval * 1e9)
+        self._limit: int = limit
+        self._queue: deque = deque()
+        self._streams: List[Tuple[str, StreamStatistics]] = []
+        self._ids: List[int] = []
+        self._frames: List[Frame] = []
+        self._tables: set = set()
+        self._done: threading.Event = threading.Event()
+
+    def __repr__(self):
+        return f'Store(queued={len(self._queue)}, dropped={self.dropped})'
+
+    def recorder(self, name: str, statistics: StreamStatistics) -> Callable[[int, int, int], None]:
+        """Returns handler of packets of stream to set as statistics recorder"""
+        stream: int = len(self._streams)
+        self._streams.append((name, statistics))
+        queue: deque = self._queue
+
+        def record(timestamp: int, arrival: int, size: int) -> None:
+            if len(queue) < self._limit:
+                queue.append((stream, timestamp, arrival or time.time_ns(), size))
+            else:
+                self.dropped += 1
+        return record
+
+    def run(self) -> None:
+        db: sqlite3.Connection = sqlite3.connect(self._path)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute('CREATE TABLE IF NOT EXISTS streams (id INTEGER PRIMARY KEY, name TEXT UNIQUE)')
+        self._expire(db, time.time_ns())
+        while not self._done.wait(Store.FLUSH):
+            self._write(db, False)
+        self._write(db, True)
+        db.close()
+
+    def join(self, timeout=None) -> None:
+        """Writes queued packets and stops store thread"""
+        self._done.set()
+        if self.is_alive():
+            super().join(timeout)
+
+    def _write(self, db: sqlite3.Connection, last: bool) -> None:
+        frames: Dict[str, List[Tuple]] = {}
+        intervals: Dict[str, List[Tuple]] = {}
+        for _ in range(len(self._queue)):
+            self._on_packet(db, *self._queue.popleft(), frames, intervals)
+        if last:
+            for stream, frame in enumerate(self._frames):
+                if frame.timestamp >= 0:
+                    self._on_frame(stream, frame, frames)
+                    self._on_interval(stream, frame.interval, intervals)
+        with db:
+            for name in set(frames) | set(intervals):
+                if name not in self._tables:
+                    self._create(db, name)
+            for name, rows in frames.items():
+                db.executemany(f'INSERT INTO frames_{name} VALUES (?, ?, ?, ?, ?)', rows)
+            for name, rows in intervals.items():
+                db.executemany(f'INSERT INTO intervals_{name} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def _on_packet(self,
+                   db: sqlite3.Connection,
+                   stream: int,
+                   timestamp: int,
+                   arrival: int,
+                   size: int,
+                   frames: Dict[str, List[Tuple]],
+                   intervals: Dict[str, List[Tuple]]) -> None:
+        while len(self._ids) <= stream:
+            name: str = self._streams[len(self._ids)][0]
+            with db:
+                db.execute('INSERT OR IGNORE INTO streams (name) VALUES (?)', (name,))
+            self._ids.append(db.execute('SELECT id FROM streams WHERE name = ?', (name,)).fetchone()[0])
+            self._frames.append(Frame())
+        frame: Frame = self._frames[stream]
+        if timestamp == frame.timestamp:
+            frame.size += size
+            return
+        if frame.timestamp >= 0:
+            self._on_frame(stream, frame, frames)
+        if arrival >= frame.interval.start + self._interval:
+            self._on_interval(stream, frame.interval, intervals)
+            frame.interval = Interval(arrival - arrival % self._interval)
+        if frame.timestamp >= 0:
+            frame.delta = (timestamp - frame.timestamp + (WRAP >> 1)) % WRAP - (WRAP >> 1)
+            frame.interval.update(frame.delta, (arrival - frame.arrival) / 1e6)
+        frame.timestamp = timestamp
+        frame.arrival = arrival
+        frame.size = size
+
+    def _on_frame(self, stream: int, frame: Frame, frames: Dict[str, List[Tuple]]) -> None:
+        frames.setdefault(partition(frame.arrival), []).append((self._ids[stream],
+                                                                frame.arrival,
+                                                                frame.timestamp,
+                                                                frame.delta,
+                                                                frame.size))
+        frame.interval.frames += 1
+        frame.interval.bytes += frame.size
+
+    def _on_interval(self, stream: int, interval: Interval, intervals: Dict[str, List[Tuple]]) -> None:
+        """Adds row of interval. Counter of lost packets and clock estimation are taken at the moment"""
+        if not interval.frames:
+            return
+        statistics: StreamStatistics = self._streams[stream][1]
+        intervals.setdefault(partition(interval.start), []).append((self._ids[stream],
+                                                                    interval.start,
+                                                                    interval.frames,
+                                                                    interval.bytes,
+                                                                    interval.delta_min,
+                                                                    interval.delta_max,
+                                                                    interval.delta_sum / interval.deltas
+                                                                    if interval.deltas else 0.,
+                                                                    interval.gap_max,
+                                                                    statistics.lost,
+                                                                    statistics.clock.drift,
+                                                                    statistics.clock.jitter * 1000.))
+
+    def _create(self, db: sqlite3.Connection, name: str) -> None:
+        db.execute(f'CREATE TABLE IF NOT EXISTS frames_{name} ({FRAMES_COLUMNS})')
+        db.execute(f'CREATE INDEX IF NOT EXISTS frames_{name}_stream ON frames_{name} (stream, arrival)')
+        db.execute(f'CREATE TABLE IF NOT EXISTS intervals_{name} ({INTERVALS_COLUMNS})')
+        db.execute(f'CREATE INDEX IF NOT EXISTS intervals_{name}_stream ON intervals_{name} (stream, time)')
+        self._tables.add(name)
+        self._expire(db, time.time_ns())
+
+    def _expire(self, db: sqlite3.Connection, now: int) -> None:
+        """Drops partitions older than retention days"""
+        if not self._retention:
+            return
+        oldest: str = partition(now - self._retention * 86400 * 1000000000)
+        for table, in db.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                 "AND (name GLOB 'frames_*' OR name GLOB 'intervals_*')").fetchall():
+            if table.split('_')[-1] < oldest:
+                db.execute(f'DROP TABLE {table}')
+                self._tables.discard(table.split('_')[-1])
+
+
+def query(db: sqlite3.Connection,
+          table: str,
+          begin: int,
+          end: int,
+          stream: str = '') -> Iterator[Tuple]:
+    """Yields rows of table (frames or intervals) of streams with name containing stream,
+       with time in [begin, end) nanoseconds, prefixed with stream name"""
+    column: str = 'arrival' if table == 'frames' else 'time'
+    first: str = partition(begin)
+    last: str = partition(end - 1)
+    for name, in db.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ? ORDER BY name",
+                            (f'{table}_*',)).fetchall():
+        if not first <= name.split('_')[-1] <= last:
+            continue
+        yield from db.execute(f'SELECT s.name, t.* FROM {name} t JOIN streams s ON s.id = t.stream '
+                              f'WHERE t.{column} >= ? AND t.{column} < ? AND s.name LIKE ? '
+                              f'ORDER BY t.{column}',
+                              (begin, end, f'%{stream}%'))
+
+
+def _time(value: str) -> int:
+    """Parses iso time (local if no zone) or negative seconds before now to unix time in nanoseconds"""
+    try:
+        seconds: float = float(value)
+        return int((time.time() + seconds if seconds <= 0 else seconds) * 1e9)
+    except ValueError:
+        return int(datetime.fromisoformat(value).timestamp() * 1e9)
+
+
+def _format(row: Tuple) -> str:
+    when: str = datetime.fromtimestamp(row[2] / 1e9).isoformat(timespec='milliseconds')
+    return '\t'.join([row[0], when] + [f'{x:.3f}' if isinstance(x, float) else str(x) for x in row[3:]])
+
+
+def run(argv: List[str] = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(prog='tsinspect query',
+                                                              description='query frames stored by -store')
+    parser.add_argument('store', type=str, help='sqlite database file')
+    parser.add_argument('-stream', type=str, default='', help='part of stream name (def. all streams)')
+    parser.add_argument('-begin',
+                        type=str,
+                        default='-3600',
+                        help='iso time or seconds before now if negative (def. -3600)')
+    parser.add_argument('-end', type=str, default='0', help='iso time or seconds before now if negative (def. now)')
+    parser.add_argument('-intervals', action='store_true', help='print interval aggregates instead of frames')
+    parser.add_argument('-streams', action='store_true', help='print stored stream names')
+    args: argparse.Namespace = parser.parse_args(argv)
+    try:
+        db: sqlite3.Connection = sqlite3.connect(f'file:{args.store}?mode=ro', uri=True)
+    except sqlite3.Error as err:
+        parser.error(str(err))
+    try:
+        if args.streams:
+            for name, in db.execute('SELECT name FROM streams ORDER BY id'):
+                sys.stdout.write(f'{name}\n')
+            return
+        table: str = 'intervals' if args.intervals else 'frames'
+        columns: str = INTERVALS_COLUMNS if args.intervals else FRAMES_COLUMNS
+        sys.stdout.write('\t'.join(['name'] + [x.split()[0] for x in columns.split(', ')[1:]]) + '\n')
+        for row in query(db, table, _time(args.begin), _time(args.end), args.stream):
+            sys.stdout.write(_format(row) + '\n')
+    except (sqlite3.Error, ValueError) as err:
+        parser.error(str(err))
+    except BrokenPipeError:
+        pass
+    finally:
+        db.close()
+
@@ -0,0 +1,194 @@
+"""Coordinator of sharded monitoring. Splits stream inventory between workers, moves streams of lost workers
+   to the others and merges statistics reported by workers"""
+import argparse
+import selectors
+import shlex
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Set
+from .protocol import ASSIGN, HELLO, REPORT, Reader, send
+from ..display.console import ConsoleForm
+
+
+class WorkerState:
+    """Class of worker known to coordinator: its connection, assigned streams and last report"""
+    def __init__(self, sock: socket.socket) -> None:
+        self.socket: socket.socket = sock
+        self.reader: Reader = Reader(sock)
+        self.name: str = '{}:{}'.format(*sock.getpeername()[:2])
+        self.streams: Set[str] = set()
+        self.report: Dict[str, Dict[str, Any]] = {}
+        self.seen: float = time.monotonic()
+
+
+class Coordinator:
+    """Class to assign streams to workers, so that their numbers of streams differ at most by one.
+       Worker is lost if its connection is closed or it does not report for TIMEOUT periods"""
+    TIMEOUT: int = 3
+
+    def __init__(self, inventory: List[str], period: float = 5., verbose: bool = False) -> None:
+        self.inventory: List[str] = inventory
+        self.workers: List[WorkerState] = []
+        self._period: float = period
+        self._verbose: bool = verbose
+
+    def on_message(self, worker: WorkerState, message: Dict[str, Any]) -> None:
+        worker.seen = time.monotonic()
+        if message.get('type') == HELLO:
+            worker.name = message.get('name', worker.name)
+            if worker not in self.workers:
+                self.workers.append(worker)
+                self.balance()
+        elif message.get('type') == REPORT:
+            worker.report = message.get('streams', {})
+
+    def on_lost(self, worker: WorkerState) -> None:
+        if worker in self.workers:
+            self.workers.remove(worker)
+            ConsoleForm(worker.name).log_error(f'worker lost, {len(worker.streams)} streams to move')
+            self.balance()
+
+    def expire(self) -> List[WorkerState]:
+        """Returns workers which have not reported for TIMEOUT periods"""
+        now: float = time.monotonic()
+        return [w for w in self.workers if now - w.seen > Coordinator.TIMEOUT * self._period]
+
+    def balance(self) -> None:
+        """Assigns unassigned streams to least loaded workers, then moves streams from the most loaded ones
+           until numbers differ at most by one, so no more streams are moved than needed.
+           Only workers with changed streams are sent new assignment"""
+        if not self.workers:
+            return
+        assigned: Set[str] = set().union(*(w.streams for w in self.workers))
+        changed: Set[WorkerState] = set()
+        for url in self.inventory:
+            if url not in assigned:
+                worker: WorkerState = min(self.workers, key=lambda w: len(w.streams))
+                worker.streams.add(url)
+                changed.add(worker)
+        while True:
+            most: WorkerState = max(self.workers, key=lambda w: len(w.streams))
+            least: WorkerState = min(self.workers, key=lambda w: len(w.streams))
+            if len(most.streams) - len(least.streams) <= 1:
+                break
+            url = Coordinator._movable(most)
+            most.streams.remove(url)
+            least.streams.add(url)
+            changed |= {most, least}
+        for worker in changed:
+            try:
+                send(worker.socket, ASSIGN, streams=sorted(worker.streams))
+            except OSError:
+                pass  # lost worker is found by select
+
+    def log_statistics(self) -> None:
+        """Prints merged statistics of all workers and per worker, streams with errors are listed"""
+        totals: List[Dict[str, Any]] = []
+        for worker in self.workers:
+            streams: List[Dict[str, Any]] = [worker.report.get(url, {}) for url in sorted(worker.streams)]
+            totals += streams
+            ConsoleForm(worker.name).log_statistics(Coordinator._merge(streams))
+            for url in sorted(worker.streams):
+                summary: Dict[str, Any] = worker.report.get(url, {})
+                if self._verbose or not summary.get('alive', True) or summary.get('error'):
+                    ConsoleForm(worker.name).log_statistics(f'{url} {Coordinator._format(summary)}')
+        unassigned: int = len(self.inventory) - sum(len(w.streams) for w in self.workers)
+        ConsoleForm('coordinator').log_statistics(f'workers={len(self.workers)} {Coordinator._merge(totals)}' +
+                                                  (f' unassigned={unassigned}' if unassigned else ''))
+
+    @staticmethod
+    def _movable(worker: WorkerState) -> str:
+        """Returns stream to move off worker. Streams which are not alive or not reported yet go first,
+           so running sessions are not restarted"""
+        return min(sorted(worker.streams), key=lambda url: bool(worker.report.get(url, {}).get('alive')))
+
+    @staticmethod
+    def _merge(streams: List[Dict[str, Any]]) -> str:
+        return f'streams={len(streams)} ' \
+               f'alive={sum(1 for s in streams if s.get("alive"))} ' \
+               f'fps={sum(s.get("fps", 0.) for s in streams):.1f} ' \
+               f'kbit/s={sum(s.get("kbps", 0.) for s in streams):.0f} ' \
+               f'frames={sum(s.get("frames", 0) for s in streams)} ' \
+               f'lost={sum(s.get("lost", 0) for s in streams)}'
+
+    @staticmethod
+    def _format(summary: Dict[str, Any]) -> str:
+        if not summary:
+            return 'no report'
+        return ' '.join(f'{k}={v:.1f}' if isinstance(v, float) else f'{k}={v}'
+                        for k, v in summary.items() if k != 'error') + \
+            (f' error={summary["error"]}' if summary.get('error') else '')
+
+
+def serve(coordinator: Coordinator, listener: socket.socket, period: float) -> None:
+    """Accepts workers on listening socket and handles their messages"""
+    selector: selectors.DefaultSelector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ, None)
+    timing: float = time.monotonic()
+    try:
+        while True:
+            for key, _ in selector.select(timeout=max(timing + period - time.monotonic(), 0.)):
+                if key.data is None:
+                    sock, _ = listener.accept()
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    selector.register(sock, selectors.EVENT_READ, WorkerState(sock))
+                    continue
+                try:
+                    for message in key.data.reader.read():
+                        coordinator.on_message(key.data, message)
+                except (OSError, EOFError, ValueError):
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    coordinator.on_lost(key.data)
+            for worker in coordinator.expire():
+                selector.unregister(worker.socket)
+                worker.socket.close()
+                coordinator.on_lost(worker)
+            if time.monotonic() - timing >= period:
+                timing = time.monotonic()
+                coordinator.log_statistics()
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
+
+
+def run(argv: List[str] = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(prog='tsinspect coordinator',
+                                                              description='coordinator of sharded monitoring')
+    parser.add_argument('inventory', type=str, help='file of stream urls, one per line')
+    parser.add_argument('-port', type=int, default=7070, help='port to accept workers on (def. 7070)')
+    parser.add_argument('-period', type=float, default=5., help='report period sec. (def. 5)')
+    parser.add_argument('-workers', type=int, default=0, help='number of local workers to start (def. 0)')
+    parser.add_argument('-worker_options',
+                        type=str,
+                        default='',
+                        help='source options of local workers, e.g. -worker_options="-headers_only -cp 2232"')
+    parser.add_argument('-verbose', action='store_true', help='print statistics of every stream')
+    args: argparse.Namespace = parser.parse_args(argv)
+    try:
+        with open(args.inventory) as f:
+            inventory: List[str] = list(dict.fromkeys(x.strip() for x in f if x.strip() and not x.startswith('#')))
+        listener: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(('', args.port))
+        listener.listen()
+    except OSError as err:
+        parser.error(str(err))
+    workers: List[subprocess.Popen] = [subprocess.Popen([sys.executable,
+                                                         '-m', 'timestampinspect.cluster.worker',
+                                                         f'127.0.0.1:{args.port}',
+                                                         '-period', str(args.period),
+                                                         '-once'] + shlex.split(args.worker_options))
+                                       for _ in range(args.workers)]
+    try:
+        serve(Coordinator(inventory, args.period, args.verbose), listener, args.period)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
@@ -0,0 +1,35 @@
+"""Messages of coordinator and workers: json objects, one per line.
+   Worker sends hello on connect and report every period, coordinator sends assign with all streams of worker"""
+import json
+import socket
+from typing import Any, Dict, List
+
+
+HELLO: str = 'hello'
+ASSIGN: str = 'assign'
+REPORT: str = 'report'
+
+
+def send(sock: socket.socket, kind: str, **fields: Any) -> None:
+    sock.sendall(json.dumps(dict(fields, type=kind)).encode() + b'\n')
+
+
+class Reader:
+    """Class to split bytes received from socket into messages"""
+    def __init__(self, sock: socket.socket) -> None:
+        self._socket: socket.socket = sock
+        self._buffer: bytearray = bytearray()
+
+    def read(self) -> List[Dict[str, Any]]:
+        """Receives available bytes and returns complete messages. Raises EOFError if peer closed connection"""
+        data: bytes = self._socket.recv(1 << 16)
+        if not data:
+            raise EOFError()
+        self._buffer += data
+        messages: List[Dict[str, Any]] = []
+        end: int = self._buffer.find(b'\n')
+        while end >= 0:
+            messages.append(json.loads(self._buffer[:end].decode('utf-8')))
+            del self._buffer[:end + 1]
+            end = self._buffer.find(b'\n')
+        return messages
@@ -0,0 +1,135 @@
+"""Worker of sharded monitoring. Runs sources of streams assigned by coordinator and reports their statistics"""
+import argparse
+import os
+import select
+import socket
+import sys
+import time
+from typing import Any, Dict, List, Tuple, Union
+from .protocol import ASSIGN, HELLO, REPORT, Reader, send
+from ..analysis.statistics import StreamStatistics
+from ..display.application import Application
+from ..display.console import StreamRow
+from ..protocols.interface import SourceException
+
+
+class Worker:
+    """Class to run streams of shard. Dead streams are restarted after RETRY seconds"""
+    RETRY: float = 10.
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.name: str = f'{socket.gethostname()}:{os.getpid()}'
+        self._args: argparse.Namespace = args
+        self._streams: Dict[str, Tuple[Union[Application, None], StreamRow, float]] = {}
+
+    def assign(self, urls: List[str]) -> None:
+        """Stops streams which are not in urls and starts new ones"""
+        for url in [x for x in self._streams if x not in urls]:
+            self._stop(url)
+        for url in urls:
+            if url not in self._streams:
+                self._start(url)
+
+    def stop(self) -> None:
+        for url in list(self._streams):
+            self._stop(url)
+
+    def report(self, period: float) -> Dict[str, Dict[str, Any]]:
+        """Returns statistics of streams, restarting dead ones"""
+        now: float = time.monotonic()
+        streams: Dict[str, Dict[str, Any]] = {}
+        for url, (application, row, started) in list(self._streams.items()):
+            alive: bool = bool(application and application.is_alive())
+            err: Union[IOError, None] = application.verify() if application else None
+            if err:
+                row.error = str(err)
+            statistics: Union[StreamStatistics, None] = application.video_statistics() if application else None
+            if statistics:
+                row.update_rates(statistics, now, period)
+            streams[url] = Worker._summary(row, statistics, alive)
+            if not alive and now - started >= Worker.RETRY:
+                self._stop(url)
+                self._start(url)
+        return streams
+
+    def _start(self, url: str) -> None:
+        row: StreamRow = StreamRow(url)
+        application: Union[Application, None] = None
+        try:
+            application = Application.from_url(url, self._args)
+            application.on_created(row)
+        except (SourceException, OSError, ValueError) as err:
+            row.error = str(err)
+        self._streams[url] = (application, row, time.monotonic())
+
+    def _stop(self, url: str) -> None:
+        application: Union[Application, None] = self._streams.pop(url)[0]
+        application and application.stop()
+
+    @staticmethod
+    def _summary(row: StreamRow,
+                 statistics: Union[StreamStatistics, None],
+                 alive: bool) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {'alive': alive, 'error': row.error, 'fps': 0., 'kbps': 0., 'frames': 0, 'lost': 0}
+        if statistics and statistics.frames:
+            summary.update(fps=row.rates[0],
+                           kbps=row.rates[1],
+                           frames=statistics.frames,
+                           lost=statistics.lost,
+                           delta_min=statistics.timestamp_delta.minimum[0],
+                           delta_max=statistics.timestamp_delta.maximum[0],
+                           drift=statistics.clock.drift,
+                           jitter=statistics.clock.jitter * 1000.)
+        return summary
+
+
+def serve(worker: Worker, address: Tuple[str, int], period: float) -> None:
+    """Reports to coordinator at address until it closes connection"""
+    sock: socket.socket = socket.create_connection(address)
+    try:
+        reader: Reader = Reader(sock)
+        send(sock, HELLO, name=worker.name)
+        timing: float = time.monotonic()
+        while True:
+            readable, _, _ = select.select([sock], [], [], max(timing + period - time.monotonic(), 0.))
+            if readable:
+                for message in reader.read():
+                    if message.get('type') == ASSIGN:
+                        worker.assign(message['streams'])
+            if time.monotonic() - timing >= period:
+                timing = time.monotonic()
+                send(sock, REPORT, name=worker.name, streams=worker.report(period))
+    finally:
+        sock.close()
+
+
+def run(argv: List[str] = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(prog='tsinspect worker',
+                                                              description='worker of sharded monitoring')
+    parser.add_argument('coordinator', type=str, help='coordinator address host:port')
+    parser.add_argument('-period', type=float, default=5., help='report period sec. (def. 5)')
+    parser.add_argument('-once', action='store_true', help='exit when coordinator connection is lost')
+    Application.add_source_arguments(parser)
+    args: argparse.Namespace = parser.parse_args(argv)
+    host, _, port = args.coordinator.rpartition(':')
+    if not port.isdigit():
+        parser.error(f'invalid coordinator address {args.coordinator}')
+    worker: Worker = Worker(args)
+    try:
+        while True:
+            try:
+                serve(worker, (host or '127.0.0.1', int(port)), args.period)
+            except (OSError, EOFError, ValueError) as err:
+                sys.stderr.write(f'{worker.name} coordinator {args.coordinator}: {str(err) or "closed"}\n')
+            worker.stop()
+            if args.once:
+                break
+            time.sleep(1.)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.stop()
+
+
+if __name__ == '__main__':
+    run()
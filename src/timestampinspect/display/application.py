@@ -1,32 +1,121 @@
-"""NPSAppManaged application to manage the display"""
+"""Applications to receive streams of sources. Source data is shown in terminal forms or printed in headless mode.
+   Terminal forms are imported only when they are shown, so that headless modes do not need curses"""
 from __future__ import annotations
 import argparse
-import hashlib
+import signal
 import socket
+import sys
+import time
 
-import npyscreen
 import re
-from .display import DisplayException, DisplayForm
-from .axon import AxonForm
-from .flv import FlvForm
-from .rtsp import RtspForm
+from .console import ConsoleForm, StreamRow
 from ..protocols import connection, axon, flv, rtsp
-from Crypto.Cipher import AES
-from base64 import b32encode
-from typing import List, Tuple, Union
+from ..analysis import alignment
+from ..analysis.history import TimestampHistory
+from ..analysis.statistics import StreamStatistics
+from ..protocols.buffer import Policy
+from ..protocols.interface import SourceException
+from ..protocols.sink import Sink
+from typing import TYPE_CHECKING, List, Tuple, Union
+if TYPE_CHECKING:
+    from .dashboard import DashboardForm
+    from ..analysis.store import Store
 
 
 def run():
-    Application.create().run()
+    if len(sys.argv) > 1 and sys.argv[1] == 'analyze':
+        from ..offline.analyzer import run as analyze
+        return analyze(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'cdn':
+        from ..protocols.cdn import run as cdn
+        return cdn(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'load':
+        from ..load.generator import run as load
+        return load(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'standin':
+        from ..load.standin import run as standin
+        return standin(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'coordinator':
+        from ..cluster.coordinator import run as coordinator
+        return coordinator(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'worker':
+        from ..cluster.worker import run as worker
+        return worker(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'query':
+        from ..analysis.store import run as query
+        return query(sys.argv[2:])
+    application: Application = Application.create()
+    try:
+        if application.headless:
+            application.run_headless()
+        else:
+            from .terminal import TerminalApplication
+            TerminalApplication(application).run()
+    finally:
+        if application.store:
+            application.store.join()
+            application.store.dropped and ConsoleForm('store').log_error(f'{application.store.dropped} packets '
+                                                                         f'dropped at queue limit')
+
 
+class Application:
+    """Application to receive stream of source. FORM is kind and title of terminal form to show it in"""
+    FORM: Tuple[str, str] = ('', '')
 
-class Application(npyscreen.NPSAppManaged):
     @staticmethod
     def create() -> Application:
         parser: argparse.ArgumentParser = argparse.ArgumentParser(description='cctv-dvr frontend')
         parser.add_argument('url',
                             type=str,
-                            help='cctv url (http://cctvip:port/dvr_url/control/0/0)')
+                            nargs='+',
+                            help='cctv url (http://cctvip:port/dvr_url/control/0/0), '
+                                 'several urls are shown in dashboard')
+        Application.add_source_arguments(parser)
+        parser.add_argument('-headless',
+                            action='store_true',
+                            help='print stream data to stdout instead of terminal forms, SIGUSR1 prints statistics')
+        parser.add_argument('-dashboard', action='store_true', help='show statistics of streams in dashboard')
+        parser.add_argument('-compare',
+                            action='store_true',
+                            help='compare frame timing of streams of the same content with the first one')
+        parser.add_argument('-compare_window',
+                            type=int,
+                            default=30,
+                            help='seconds of frames to compare (def. 30)')
+        parser.add_argument('-store', type=str, help='sqlite database file to store frames of streams in')
+        parser.add_argument('-store_retention',
+                            type=int,
+                            default=7,
+                            help='days to keep stored frames (def. 7, 0 - forever)')
+        parser.add_argument('-store_interval',
+                            type=float,
+                            default=1.,
+                            help='interval of stored aggregates sec. (def. 1)')
+        args: argparse.Namespace = parser.parse_args()
+        if args.compare and len(args.url) < 2:
+            parser.error('compare needs two or more urls')
+        store: Union[Store, None] = None
+        if args.store:
+            from ..analysis.store import Store
+            store = Store(args.store, args.store_retention, args.store_interval)
+        if args.compare:
+            application: Application = CompareApplication([Application.from_url(url, args, store)
+                                                           for url in args.url],
+                                                          args.compare_window)
+            application.headless = True
+        elif len(args.url) > 1 or args.dashboard:
+            application = DashboardApplication([Application.from_url(url, args, store) for url in args.url])
+            application.headless = args.headless
+        else:
+            application = Application.from_url(args.url[0], args, store)
+            application.headless = args.headless
+        application.store = store
+        store and store.start()
+        return application
+
+    @staticmethod
+    def add_source_arguments(parser: argparse.ArgumentParser) -> None:
+        """Adds options of stream sources to parser"""
         parser.add_argument('-cp', type=int, default=2232, help='cctv-dvr control port (def. 2232)')
         parser.add_argument('-pos_period',
                             type=int,
@@ -35,21 +124,51 @@ class Application(npyscreen.NPSAppManaged):
         parser.add_argument('-speed', type=int, default=1, help='Axon stream speed (def. 1)')
         parser.add_argument('-cdn_password', type=str, help='used with cdn to encode content to aes128ecb')
         parser.add_argument('-cdn_id', type=str, default='id', help='used with cdn as camera ID (def. "id"')
-        args: argparse.Namespace = parser.parse_args()
-        m = re.search(r'(?P<proto>\w{4})://(?P<ip>[^/\r\n]+):(?P<port>\d{3,6})/(?P<content>.+)', args.url)
+        parser.add_argument('-transport',
+                            type=str,
+                            default='tcp',
+                            choices=['tcp', 'udp', 'multicast'],
+                            help='rtp transport of rtsp stream (def. tcp)')
+        parser.add_argument('-buffer_limit',
+                            type=int,
+                            default=0,
+                            help='stream buffer memory limit in bytes (def. 0 - no limit)')
+        parser.add_argument('-buffer_policy',
+                            type=str,
+                            default='truncate',
+                            choices=['resync', 'truncate'],
+                            help='policy to apply when stream buffer limit is hit (def. truncate)')
+        parser.add_argument('-headers_only',
+                            action='store_true',
+                            help='skip rtp and flv payload without buffering it')
+        parser.add_argument('-fingerprint',
+                            action='store_true',
+                            help='fingerprint video frames by crc32 to detect frozen and repeated ones')
+
+    @staticmethod
+    def from_url(url: str, args: argparse.Namespace, store: Union[Store, None] = None) -> Application:
+        m = re.search(r'(?P<proto>\w{4})://(?P<ip>[^/\r\n]+):(?P<port>\d{3,6})/(?P<content>.+)', url)
         if not m or m['proto'] not in ['http', 'rtsp']:
-            raise DisplayException(f'invalid url {args.url}')
+            raise SourceException(f'invalid url {url}')
         if m['proto'] == 'http':
             if args.cdn_password:
-                return CdnApplication((m['ip'], int(m['port'])), m['content'],
-                                      args.cdn_password, args.cdn_id, int(args.pos_period))
-            return CctvApplication((m['ip'], int(m['port'])), m['content'], int(args.cp), int(args.pos_period))
+                application: Application = CdnApplication((m['ip'], int(m['port'])), m['content'],
+                                                          args.cdn_password, args.cdn_id, int(args.pos_period))
+            else:
+                application = CctvApplication((m['ip'], int(m['port'])),
+                                              m['content'], int(args.cp), int(args.pos_period))
         elif 'SourceEndpoint.' in m['content']:
-            return AxonApplication((m['ip'], int(m['port'])), m['content'])
-        return RtspApplication((m['ip'], int(m['port'])), m['content'])
+            application = AxonApplication((m['ip'], int(m['port'])), m['content'])
+        else:
+            application = RtspApplication((m['ip'], int(m['port'])),
+                                          m['content'], rtsp.Transport[args.transport.upper()])
+        application.buffer_limit = (args.buffer_limit, Policy[args.buffer_policy.upper()])
+        application.headers_only = args.headers_only
+        application.fingerprint = args.fingerprint
+        application.store = store
+        return application
 
     def __init__(self, address: Tuple[str, int], content: str):
-        super().__init__()
         self._address: Tuple[str, int] = ('', 0)
         self._credentials: List = []
         credentials: List[str, ...] = address[0].split('@')
@@ -60,97 +179,262 @@ class Application(npyscreen.NPSAppManaged):
             self._address = address
         self._content: str = content
         self._connection: connection.Connection = connection.Connection()
+        self.buffer_limit: Tuple[int, Policy] = (0, Policy.TRUNCATE)
+        self.headers_only: bool = False
+        self.fingerprint: bool = False
+        self.headless: bool = False
+        self.store: Union[Store, None] = None
 
     def __del__(self) -> None:
         self._connection.join()
 
-    def on_created(self, form: DisplayForm) -> None:
+    def on_created(self, form: Sink) -> None:
+        """Handler, called when form to pass source data to is created. Starts connection to source"""
         raise NotImplementedError
 
     def verify(self) -> Union[socket.error, None]:
         return self._connection.exception
 
+    def is_alive(self) -> bool:
+        return self._connection.is_alive()
+
+    def stop(self) -> None:
+        self._connection.join()
+
     def request_action(self, action: Union[Tuple[str, str], Tuple[str]]) -> None:
         if self._connection:
             self._connection.request_action(action)
 
+    @property
+    def name(self) -> str:
+        return f'{self._address[0]}:{self._address[1]}/{self._content}'
+
+    def statistics(self) -> str:
+        return self._connection.statistics() + (f'\n{self.store!r}' if self.store else '')
+
+    def video_statistics(self) -> Union[StreamStatistics, None]:
+        return self._connection.video_statistics()
+
+    def video_history(self) -> Union[TimestampHistory, None]:
+        return self._connection.video_history()
+
+    def history(self, seconds: float) -> str:
+        """Returns frames received during last seconds"""
+        end: int = time.time_ns()
+        return self._connection.history(end - int(seconds * 1e9), end)
+
+    def _start(self) -> None:
+        """Starts created connection, its video frames are recorded into store if there is one"""
+        statistics: Union[StreamStatistics, None] = self._connection.video_statistics()
+        if self.store and statistics:
+            statistics.recorder = self.store.recorder(self.name, statistics)
+        self._connection.start()
+
+    def run_headless(self) -> None:
+        """Runs connection without terminal forms. Statistics are printed on SIGUSR1 and on exit"""
+        form: ConsoleForm = ConsoleForm()
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda *args: form.log_statistics(self.statistics()))
+        self.on_created(form)
+        try:
+            while self._connection.is_alive():
+                time.sleep(.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._connection.join()
+            err: Union[socket.error, None] = self.verify()
+            err and form.log_error(str(err))
+            form.log_statistics(self.statistics())
+
 
 class CctvApplication(Application):
-    """NPSAppManaged application to manage the CCTV display"""
+    """Application to receive CCTV stream"""
+    FORM: Tuple[str, str] = ('flv', 'cctv')
+
     def __init__(self, address: Tuple[str, int], content: str, control_port: int, pos_period: int = 0):
         super().__init__(address, content)
         self._control_port = control_port
         self._pos_period: int = pos_period
 
-    def onStart(self) -> None:
-        self.addForm('MAIN', FlvForm, name='cctv', connection=self._connection)
-
-    def on_created(self, form: DisplayForm):
+    def on_created(self, form: Sink):
         self._connection: connection.Connection[flv.Source] = \
             connection.Connection(self._address,
-                                  flv.Source(form, self._content, self._control_port),
+                                  flv.Source(form,
+                                             self._content,
+                                             self._control_port,
+                                             self.buffer_limit,
+                                             self.headers_only,
+                                             self.fingerprint),
                                   self._pos_period)
-        self._connection.start()
+        self._start()
 
 
 class CdnApplication(Application):
-    """NPSAppManaged application to manage the CCTV display"""
+    """Application to receive CCTV stream from cdn"""
+    FORM: Tuple[str, str] = ('flv', 'cdn')
+
     def __init__(self, address: Tuple[str, int], content: str, password: str, camera_id: str, pos_period: int = 0):
         super().__init__(address, content)
         self._pos_period: int = pos_period
         self._control_port = 2232
-        url: List[str, ...] = content.split('?')
-        if len(url) == 2:
-            self._content = url[0]
-            params: str = url[1]
-        self._encode_content(password, camera_id)
-        if params:
-            self._content += '/' + params
-
-    def onStart(self) -> None:
-        self.addForm('MAIN', FlvForm, name='cdn', connection=self._connection)
-
-    def on_created(self, form: DisplayForm):
+        from ..protocols import cdn
+        self._content = cdn.path(f'{self._address[0]}:{self._address[1]}', password, camera_id, content)
+
+    def on_created(self, form: Sink):
         self._connection: connection.Connection[flv.Source] = \
             connection.Connection(self._address,
-                                  flv.Source(form, self._content, self._control_port),
+                                  flv.Source(form,
+                                             self._content,
+                                             self._control_port,
+                                             self.buffer_limit,
+                                             self.headers_only,
+                                             self.fingerprint),
                                   self._pos_period)
-        self._connection.start()
-
-    @staticmethod
-    def _key(password: str) -> bytes:
-        sha1: bytes = hashlib.sha1(password.encode()).hexdigest()[:32]
-        return b''.join([int(sha1[i:i + 2], 16).to_bytes(1, 'big') for i in range(0, len(sha1), 2)])
-
-    def _encode_content(self, password: str, camera_id: str):
-        cdn_url: str = f'{self._address[0]}:{self._address[1]}/{camera_id}/{self._content}'
-        cdn_url += chr(0x0e) * (16 - len(cdn_url) % 16)
-        cipher = AES.new(self._key(password), AES.MODE_ECB)
-        enc: bytes = b''
-        for i in range(0, len(cdn_url), 16):
-            enc += cipher.encrypt(cdn_url[i:i + 16].encode())
-        self._content = b32encode(enc).rstrip(b'=').decode('utf-8')
+        self._start()
 
 
 class AxonApplication(Application):
-    """NPSAppManaged application to manage the Axon display"""
-    def onStart(self) -> None:
-        self.addForm('MAIN', AxonForm, name='axon')
+    """Application to receive Axon stream"""
+    FORM: Tuple[str, str] = ('axon', 'axon')
 
-    def on_created(self, form: DisplayForm):
+    def on_created(self, form: Sink):
         self._connection: connection.Connection[axon.Source] = \
             connection.Connection(self._address,
-                                  axon.Source(form, self._address[0], self._credentials, self._content))
-        self._connection.start()
+                                  axon.Source(form,
+                                              self._address[0],
+                                              self._credentials,
+                                              self._content,
+                                              self.buffer_limit,
+                                              self.headers_only,
+                                              self.fingerprint))
+        self._start()
 
 
 class RtspApplication(Application):
-    """NPSAppManaged application to manage the rtsp/rtp display"""
-    def onStart(self) -> None:
-        self.addForm('MAIN', RtspForm, name='rtsp')
+    """Application to receive rtsp/rtp stream"""
+    FORM: Tuple[str, str] = ('rtsp', 'rtsp')
 
-    def on_created(self, form: DisplayForm):
+    def __init__(self, address: Tuple[str, int], content: str, transport: rtsp.Transport = rtsp.Transport.TCP):
+        super().__init__(address, content)
+        self._transport: rtsp.Transport = transport
+
+    def on_created(self, form: Sink):
         self._connection: connection.Connection[rtsp.Source] = \
             connection.Connection(self._address,
-                                  rtsp.Source(form, self._credentials, self._content))
-        self._connection.start()
+                                  rtsp.Source(form,
+                                              self._credentials,
+                                              self._content,
+                                              self._transport,
+                                              self.buffer_limit,
+                                              self.headers_only,
+                                              self.fingerprint))
+        self._start()
+
+
+class DashboardApplication(Application):
+    """Application to receive many streams and show their statistics in dashboard"""
+    FORM: Tuple[str, str] = ('dashboard', 'dashboard')
+
+    def __init__(self, applications: List[Application]):
+        super().__init__(('', 0), '')
+        self.applications: List[Application] = applications
+
+    def __del__(self) -> None:
+        for application in self.applications:
+            application._connection.join()
+
+    def on_created(self, form: DashboardForm):
+        for application in self.applications:
+            application.on_created(form.add_stream(application.name))
+
+    def request_action(self, action: Union[Tuple[str, str], Tuple[str]]) -> None:
+        for application in self.applications:
+            application.request_action(action)
+
+    def statistics(self) -> str:
+        return '\n'.join([f'{application.name} {line}'
+                          for application in self.applications
+                          for line in application._connection.statistics().split('\n')] +
+                         ([repr(self.store)] if self.store else []))
+
+    def run_headless(self) -> None:
+        """Runs connections without terminal forms, lines of each stream are prefixed with its name"""
+        forms: List[ConsoleForm] = [ConsoleForm(application.name) for application in self.applications]
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda *args: self._log_statistics(forms))
+        for form, application in zip(forms, self.applications):
+            application.on_created(form)
+        try:
+            while any(application._connection.is_alive() for application in self.applications):
+                time.sleep(.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for form, application in zip(forms, self.applications):
+                application._connection.join()
+                err: Union[socket.error, None] = application.verify()
+                err and form.log_error(str(err))
+            self._log_statistics(forms)
+
+    def _log_statistics(self, forms: List[ConsoleForm]) -> None:
+        """Prints statistics of every stream and store state once"""
+        for form, application in zip(forms, self.applications):
+            form.log_statistics(application._connection.statistics())
+        self.store and ConsoleForm('store').log_statistics(repr(self.store))
+
+
+class CompareApplication(DashboardApplication):
+    """Application to compare frame timing of streams of the same content with the first one.
+       Comparison of last window seconds is printed periodically and on exit"""
+    PERIOD: int = 10
+
+    def __init__(self, applications: List[Application], window: int = 30):
+        super().__init__(applications)
+        self._window: int = window
+
+    def run_headless(self) -> None:
+        rows: List[StreamRow] = [StreamRow(application.name) for application in self.applications]
+        for row, application in zip(rows, self.applications):
+            application.on_created(row)
+        timing: float = time.time()
+        try:
+            while any(application._connection.is_alive() for application in self.applications):
+                time.sleep(.5)
+                if time.time() - timing >= CompareApplication.PERIOD:
+                    timing = time.time()
+                    self._compare()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._compare()
+            for application in self.applications:
+                application._connection.join()
+                err: Union[socket.error, None] = application.verify()
+                err and ConsoleForm(application.name).log_error(str(err))
+
+    def _compare(self) -> None:
+        end: int = time.time_ns()
+        frames: List[Tuple[List[float], List[int]]] = [self._frames(application, end - self._window * 1000000000, end)
+                                                       for application in self.applications]
+        for application, other in zip(self.applications[1:], frames[1:]):
+            c: alignment.Comparison = alignment.compare(frames[0], other)
+            ConsoleForm(application.name).log_statistics(
+                f'vs {self.applications[0].name}: '
+                f'frames={c.frames} '
+                f'lag={c.lag} '
+                f'correlation={c.correlation:.3f}{"" if c.correlation else " (aligned by arrival)"} '
+                f'offset={c.offset:.1f}ms '
+                f'latency={c.latency:.1f}ms '
+                f'dropped={c.dropped} '
+                f'duplicated={c.duplicated} '
+                f'rewritten={c.rewritten} (max deviation {c.deviation:.1f}ms)')
+
+    @staticmethod
+    def _frames(application: Application, begin: int, end: int) -> Tuple[List[float], List[int]]:
+        history: Union[TimestampHistory, None] = application.video_history()
+        statistics: Union[StreamStatistics, None] = application.video_statistics()
+        if not history or not statistics:
+            return [], []
+        samples: List = list(history.range(begin, end))
+        return alignment.to_ms([s.timestamp for s in samples], statistics.clock.rate), [s.arrival for s in samples]
@@ -59,6 +59,9 @@ class AxonForm(DisplayForm):
     def log_error(self, value: str) -> None:
         DisplayForm._to_box(self._rtsp_box, value)
 
+    def log_statistics(self, value: str) -> None:
+        DisplayForm._to_box(self._rtsp_box, value)
+
     def _on_waiting(self) -> None:
         self._http_box.display()
         self._rtp_box.display()
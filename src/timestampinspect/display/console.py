@@ -0,0 +1,58 @@
+"""Displays source information as text lines, without terminal forms"""
+import sys
+from typing import TextIO, Tuple
+from ..analysis.statistics import StreamStatistics
+from ..protocols.sink import Sink
+
+
+class ConsoleForm(Sink):
+    """Form to print source data into text stream. Each line is prefixed with stream name"""
+    def __init__(self, name: str = '', stream: TextIO = sys.stdout) -> None:
+        self._name: str = name
+        self._stream: TextIO = stream
+
+    def log_http(self, value: str) -> None:
+        self._print('http', value)
+
+    def log_rtsp(self, value: str) -> None:
+        self._print('rtsp', value)
+
+    def log_rtp(self, value: str) -> None:
+        self._print('rtp', value)
+
+    def log_flv(self, value: str) -> None:
+        self._print('flv', value)
+
+    def log_position(self, value: str) -> None:
+        self._print('position', value)
+
+    def log_error(self, value: str) -> None:
+        self._print('error', value)
+
+    def log_statistics(self, value: str) -> None:
+        self._print('statistics', value)
+
+    def _print(self, box: str, value: str) -> None:
+        for line in value.rstrip('\r\n').split('\n'):
+            self._stream.write(f'{self._name} {box}: {line}\n' if self._name else f'{box}: {line}\n')
+
+
+class StreamRow(Sink):
+    """Form of one dashboard stream. Source data lines are ignored, last error is kept to show"""
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.error: str = ''
+        self.rates: Tuple[float, float] = (0., 0.)
+        self._counters: Tuple[float, int, int] = (0., 0, 0)
+
+    def log_error(self, value: str) -> None:
+        self.error = value.split('\n')[0]
+
+    def update_rates(self, statistics: StreamStatistics, now: float, period: float) -> None:
+        """Updates frame rate and bitrate in kbit/s if period has passed since previous update"""
+        timing, frames, size = self._counters
+        if now - timing >= period:
+            if timing:
+                self.rates = ((statistics.frames - frames) / (now - timing),
+                              (statistics.bytes - size) * 8 / (now - timing) / 1000.)
+            self._counters = (now, statistics.frames, statistics.bytes)
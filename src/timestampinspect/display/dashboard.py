@@ -0,0 +1,107 @@
+"""Displays aggregated statistics of many streams as a grid, one row per stream"""
+import npyscreen
+import time
+from typing import List, Sequence, Tuple, Union
+from ..analysis.statistics import StreamStatistics
+from .console import StreamRow
+
+
+SPARKS: str = ' ▁▂▃▄▅▆▇█'
+
+
+def sparkline(values: Sequence[int], width: int) -> str:
+    """Returns last values as a line of block characters scaled between their minimum and maximum"""
+    values = list(values)[-width:]
+    if not values:
+        return ''
+    low: int = min(values)
+    scale: int = max(values) - low
+    return ''.join(SPARKS[1 + (v - low) * (len(SPARKS) - 2) // scale] if scale else SPARKS[1] for v in values)
+
+
+class DashboardForm(npyscreen.Form):
+    """Form to display streams as a grid. Redraws at most RENDER_RATE times per second and only changed cells"""
+    RENDER_RATE: float = 4.
+    RATE_PERIOD: float = 1.
+    SPARKLINE: int = 24
+    COLUMNS: Tuple[Tuple[str, int], ...] = (('stream', 32),
+                                            ('fps', 7),
+                                            ('kbit/s', 9),
+                                            ('delta min', 10),
+                                            ('delta max', 10),
+                                            ('lost', 8),
+                                            ('drift ppm', 10),
+                                            ('deltas', SPARKLINE + 2),
+                                            ('status', 0))
+
+    def __init__(self, *args, **kwargs):
+        self._rows: List[StreamRow] = []
+        self._cells: List[List[npyscreen.FixedText]] = []
+        self._rendered: float = 0.
+        super().__init__(*args, **kwargs)
+
+    def create(self) -> None:
+        self.keypress_timeout = 1
+        lines, columns = self.useable_space()
+        self._visible: int = max(lines - 5, 1)
+        self._columns: List[Tuple[int, int]] = []
+        x: int = 2
+        for title, width in DashboardForm.COLUMNS:
+            width = width or max(columns - x - 2, 1)
+            self._columns.append((x, width))
+            self.add(npyscreen.FixedText, value=title, editable=False, relx=x, rely=2, width=width)
+            x += width
+        self.parentApp.on_created(self)
+
+    def afterEditing(self) -> None:
+        self.parentApp.setNextForm(None)
+
+    def add_stream(self, name: str) -> StreamRow:
+        """Adds row of stream. Returns form to pass to stream source"""
+        row: StreamRow = StreamRow(name)
+        if len(self._rows) < self._visible:
+            self._cells.append([self.add(npyscreen.FixedText,
+                                         value='',
+                                         editable=False,
+                                         relx=x,
+                                         rely=3 + len(self._rows),
+                                         width=width) for x, width in self._columns])
+        self._rows.append(row)
+        return row
+
+    def while_waiting(self) -> None:
+        now: float = time.monotonic()
+        if now - self._rendered < 1. / DashboardForm.RENDER_RATE:
+            return
+        self._rendered = now
+        dirty: bool = False
+        for i, row in enumerate(self._rows):
+            statistics: Union[StreamStatistics, None] = self.parentApp.applications[i].video_statistics()
+            err: Union[IOError, None] = self.parentApp.applications[i].verify()
+            if err:
+                row.error = str(err)
+            if statistics:
+                row.update_rates(statistics, now, DashboardForm.RATE_PERIOD)
+            if i < len(self._cells):
+                for cell, text in zip(self._cells[i], DashboardForm._texts(row, statistics)):
+                    if cell.value != text:
+                        cell.value = text
+                        cell.update()
+                        dirty = True
+        dirty and self.refresh()
+
+    @staticmethod
+    def _texts(row: StreamRow, statistics: Union[StreamStatistics, None]) -> List[str]:
+        if not statistics or not statistics.frames:
+            return [row.name, '-', '-', '-', '-', '-', '-', '', row.error]
+        delta_min: str = f'{statistics.timestamp_delta.minimum[0]:g}' if statistics.frames > 1 else '-'
+        delta_max: str = f'{statistics.timestamp_delta.maximum[0]:g}' if statistics.frames > 1 else '-'
+        return [row.name,
+                f'{row.rates[0]:.1f}',
+                f'{row.rates[1]:.0f}',
+                delta_min,
+                delta_max,
+                str(statistics.lost),
+                f'{statistics.clock.drift:+.1f}',
+                sparkline(statistics.recent, DashboardForm.SPARKLINE),
+                row.error]
@@ -2,6 +2,7 @@
 import npyscreen
 from collections import deque
 from typing import Union
+from ..protocols.sink import Sink
 
 
 class DisplayException(ValueError):
@@ -42,7 +43,7 @@ class SliderBox(npyscreen.BoxTitle):
     _contained_widgets = npyscreen.Slider
 
 
-class DisplayForm(npyscreen.FormWithMenus):
+class DisplayForm(npyscreen.FormWithMenus, Sink):
     """Displays source information"""
     def create(self) -> None:
         raise NotImplementedError
@@ -73,9 +74,13 @@ class DisplayForm(npyscreen.FormWithMenus):
     def log_error(self, value: str) -> None:
         raise NotImplementedError
 
+    def log_statistics(self, value: str) -> None:
+        raise NotImplementedError
+
     def set_menu(self, name: str) -> None:
         m = self.new_menu(name=name)
-        for item in ['scale', 'seek', 'play', 'reverse', 'pause', 'forward', 'backward', 'shift']:
+        for item in ['scale', 'seek', 'play', 'reverse', 'pause', 'forward', 'backward', 'shift',
+                     'statistics', 'history']:
             m.addItem(text=item, onSelect=getattr(self, f'_on_select_{item}'))
 
     def _on_waiting(self):
@@ -120,6 +125,15 @@ class DisplayForm(npyscreen.FormWithMenus):
         except DisplayException:
             pass
 
+    def _on_select_statistics(self) -> None:
+        self.log_statistics(self.parentApp.statistics())
+
+    def _on_select_history(self) -> None:
+        try:
+            self.log_statistics(self.parentApp.history(float(DisplayForm._action_param())))
+        except (DisplayException, ValueError):
+            pass
+
     @staticmethod
     def _action_param() -> str:
         f: ActionParameterForm = ActionParameterForm(name='value', lines=6, columns=20)
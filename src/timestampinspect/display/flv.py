@@ -59,6 +59,9 @@ class FlvForm(DisplayForm):
     def log_error(self, value: str) -> None:
         DisplayForm._to_box(self._http_box, value)
 
+    def log_statistics(self, value: str) -> None:
+        DisplayForm._to_box(self._http_box, value)
+
     def _on_waiting(self) -> None:
         self._flv_box.display()
         self._http_box.display()
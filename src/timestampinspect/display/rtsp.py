@@ -51,6 +51,9 @@ class RtspForm(DisplayForm):
     def log_error(self, value: str) -> None:
         DisplayForm._to_box(self._rtsp_box, value)
 
+    def log_statistics(self, value: str) -> None:
+        DisplayForm._to_box(self._rtsp_box, value)
+
     def _on_waiting(self) -> None:
         self._rtp_box and self._rtp_box.display()
         self._rtsp_box and self._rtsp_box.display()
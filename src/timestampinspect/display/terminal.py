@@ -0,0 +1,46 @@
+"""NPSAppManaged application to show source data of application in terminal forms"""
+import npyscreen
+from typing import Dict, List, Tuple, Union
+from .application import Application
+from .axon import AxonForm
+from .dashboard import DashboardForm
+from .flv import FlvForm
+from .rtsp import RtspForm
+from ..protocols.sink import Sink
+
+
+FORMS: Dict[str, type] = {'flv': FlvForm,
+                          'axon': AxonForm,
+                          'rtsp': RtspForm,
+                          'dashboard': DashboardForm}
+
+
+class TerminalApplication(npyscreen.NPSAppManaged):
+    """NPSAppManaged application to manage the display. Form commands are passed to application"""
+    def __init__(self, application: Application) -> None:
+        super().__init__()
+        self._application: Application = application
+
+    def onStart(self) -> None:
+        kind, name = self._application.FORM
+        self.addForm('MAIN', FORMS[kind], name=name)
+
+    @property
+    def applications(self) -> List[Application]:
+        """Applications of dashboard streams"""
+        return self._application.applications
+
+    def on_created(self, form: Sink) -> None:
+        self._application.on_created(form)
+
+    def verify(self) -> Union[OSError, None]:
+        return self._application.verify()
+
+    def request_action(self, action: Union[Tuple[str, str], Tuple[str]]) -> None:
+        self._application.request_action(action)
+
+    def statistics(self) -> str:
+        return self._application.statistics()
+
+    def history(self, seconds: float) -> str:
+        return self._application.history(seconds)
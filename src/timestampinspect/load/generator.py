@@ -0,0 +1,278 @@
+"""DVR control-plane load generator. Drives many flv sessions through action sequences at target rate
+   and measures action latency, errors and stream recovery"""
+import argparse
+import random
+import re
+import sys
+import threading
+import time
+from typing import Dict, List, Tuple, Union
+from ..analysis.statistics import Estimator
+from ..protocols import connection, flv
+from ..protocols.sink import Sink
+
+
+# Actions of DisplayForm menu with choices of random parameter
+ACTIONS: Dict[str, Tuple] = {
+    'scale': (1, 2, 4, 8, 16),
+    'seek': tuple(range(0, 3600, 60)),
+    'play': (),
+    'rplay': (),
+    'pause': (),
+    'forward': (1, 5, 10, 30),
+    'backward': (1, 5, 10, 30),
+    'shift': (-60, -10, 10, 60)
+}
+
+
+class ActionMetrics:
+    """Class of metrics of one action: counts, latency of reply and time until stream tag after reply in ms"""
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.errors: int = 0
+        self.stalls: int = 0
+        self.latency: Estimator = Estimator()
+        self.recovery: Estimator = Estimator()
+
+    def __repr__(self):
+        return f'n={self.count} errors={self.errors} stalls={self.stalls} ' \
+               f'latency ms: {ActionMetrics._quantiles(self.latency)} ' \
+               f'recovery ms: {ActionMetrics._quantiles(self.recovery)}'
+
+    @staticmethod
+    def _quantiles(estimator: Estimator) -> str:
+        if not estimator.moments.count:
+            return '-'
+        return ' '.join(f'p{int(q.p * 100)}={q.value:.1f}' for q in estimator.quantiles) + \
+            f' max={estimator.maximum[0]:.1f}'
+
+
+class Metrics:
+    """Class of metrics of all sessions. Updated from connection threads"""
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self.actions: Dict[str, ActionMetrics] = {name: ActionMetrics() for name in ACTIONS}
+        self.stream_errors: int = 0
+
+    def __repr__(self):
+        with self._lock:
+            return '\n'.join(f'{name}: {metrics}' for name, metrics in self.actions.items() if metrics.count) + \
+                f'\nstream errors={self.stream_errors}'
+
+    @property
+    def count(self) -> int:
+        with self._lock:
+            return sum(metrics.count for metrics in self.actions.values())
+
+    def on_reply(self, action: str, status: int, latency: float) -> None:
+        with self._lock:
+            metrics: ActionMetrics = self.actions[action]
+            metrics.count += 1
+            if status != 200:
+                metrics.errors += 1
+            metrics.latency.update(latency, 0)
+
+    def on_timeout(self, action: str) -> None:
+        with self._lock:
+            self.actions[action].count += 1
+            self.actions[action].errors += 1
+
+    def on_recovery(self, action: str, recovery: Union[float, None]) -> None:
+        """Adds recovery time of stream after action, None if stream stalled"""
+        with self._lock:
+            if recovery is None:
+                self.actions[action].stalls += 1
+            else:
+                self.actions[action].recovery.update(recovery, 0)
+
+    def on_stream_error(self) -> None:
+        with self._lock:
+            self.stream_errors += 1
+
+
+class SessionForm(Sink):
+    """Form of one load session. Times action request and reply logged by flv source
+       and first stream tag after the reply. Stream is not expected to recover until play after pause"""
+    def __init__(self, metrics: Metrics, timeout: float) -> None:
+        # pending action is name, time of request and flag of request sent: stream reply is logged as http too
+        self.frames: int = 0
+        self._metrics: Metrics = metrics
+        self._timeout: float = timeout
+        self._lock: threading.Lock = threading.Lock()
+        self._pending: Union[Tuple[str, float, bool], None] = None
+        self._recovering: Union[Tuple[str, float], None] = None
+        self._paused: bool = False
+
+    @property
+    def busy(self) -> bool:
+        with self._lock:
+            return self._pending is not None
+
+    def request(self, action: str) -> None:
+        with self._lock:
+            self._pending = (action, time.monotonic(), False)
+
+    def expire(self) -> None:
+        """Counts pending action as error and stalled recovery if they take longer than timeout"""
+        now: float = time.monotonic()
+        with self._lock:
+            if self._pending and now - self._pending[1] > self._timeout:
+                self._metrics.on_timeout(self._pending[0])
+                self._pending = None
+            if self._recovering and now - self._recovering[1] > self._timeout:
+                self._metrics.on_recovery(self._recovering[0], None)
+                self._recovering = None
+
+    def log_http(self, value: str) -> None:
+        now: float = time.monotonic()
+        with self._lock:
+            if not self._pending:
+                return
+            if value.startswith('GET /?control='):
+                self._pending = (self._pending[0], now, True)
+            elif value.startswith('HTTP/') and self._pending[2]:
+                action, start, _ = self._pending
+                status: int = int(value.split()[1]) if len(value.split()) > 1 and value.split()[1].isdigit() else 0
+                self._metrics.on_reply(action, status, (now - start) * 1000.)
+                if status == 200:
+                    self._paused = action == 'pause' or (self._paused and action not in ('play', 'rplay'))
+                    self._recovering = None if self._paused else (action, now)
+                self._pending = None
+
+    def log_flv(self, value: str) -> None:
+        now: float = time.monotonic()
+        with self._lock:
+            self.frames += 1
+            if self._recovering:
+                self._metrics.on_recovery(self._recovering[0], (now - self._recovering[1]) * 1000.)
+                self._recovering = None
+
+    def log_error(self, value: str) -> None:
+        self._metrics.on_stream_error()
+
+
+class Scenario:
+    """Class of action sequence of session: lines of scenario file in cycle from random start,
+       or random actions with random parameters if there is no file"""
+    def __init__(self, lines: List[Tuple[str, ...]], generator: random.Random) -> None:
+        self._lines: List[Tuple[str, ...]] = lines
+        self._random: random.Random = generator
+        self._position: int = generator.randrange(len(lines)) if lines else 0
+
+    @staticmethod
+    def load(path: str) -> List[Tuple[str, ...]]:
+        """Returns actions of scenario file lines 'action [parameter]'. Empty lines and '#' comments are skipped"""
+        lines: List[Tuple[str, ...]] = []
+        with open(path) as f:
+            for line in f:
+                fields: List[str] = line.split('#')[0].split()
+                if not fields:
+                    continue
+                if fields[0] not in ACTIONS or len(fields) > 2:
+                    raise ValueError(f'invalid scenario line: {line.rstrip()}')
+                lines.append(tuple(fields))
+        return lines
+
+    def next(self) -> Tuple[str, ...]:
+        if self._lines:
+            action: Tuple[str, ...] = self._lines[self._position % len(self._lines)]
+            self._position += 1
+            return action
+        name: str = self._random.choice(list(ACTIONS))
+        return (name, str(self._random.choice(ACTIONS[name]))) if ACTIONS[name] else (name,)
+
+
+def run(argv: List[str] = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(prog='tsinspect load',
+                                                              description='dvr control-plane load generator')
+    parser.add_argument('url',
+                        type=str,
+                        help='cctv url (http://cctvip:port/dvr_url/control/0/0), {n} is replaced by session number')
+    parser.add_argument('-cp', type=int, default=2232, help='cctv-dvr control port (def. 2232)')
+    parser.add_argument('-sessions', type=int, default=10, help='number of concurrent sessions (def. 10)')
+    parser.add_argument('-rate', type=float, default=5., help='target rate of actions of all sessions per sec. '
+                                                              '(def. 5)')
+    parser.add_argument('-duration', type=int, default=60, help='test duration sec. (def. 60)')
+    parser.add_argument('-ramp', type=float, default=0., help='sec. between session starts (def. 0 - all at once)')
+    parser.add_argument('-scenario', type=str, help="file of lines 'action [parameter]' (def. random actions)")
+    parser.add_argument('-timeout', type=float, default=5., help='action reply and stream recovery timeout sec. '
+                                                                 '(def. 5)')
+    parser.add_argument('-period', type=int, default=10, help='report period sec. (def. 10)')
+    parser.add_argument('-seed', type=int, help='random seed of scenarios')
+    args: argparse.Namespace = parser.parse_args(argv)
+    m = re.search(r'http://(?P<ip>[^/\r\n:]+):(?P<port>\d{2,6})/(?P<content>.+)', args.url)
+    if not m:
+        parser.error(f'invalid url {args.url}')
+    try:
+        lines: List[Tuple[str, ...]] = Scenario.load(args.scenario) if args.scenario else []
+    except (OSError, ValueError) as err:
+        parser.error(str(err))
+    generator: random.Random = random.Random(args.seed)
+    metrics: Metrics = Metrics()
+    sessions: List[Tuple[connection.Connection, SessionForm, Scenario]] = []
+    start: float = time.monotonic()
+    timing: float = start
+    counted: Tuple[float, int] = (start, 0)
+    due: float = start
+    turn: int = 0
+    try:
+        while time.monotonic() - start < args.duration:
+            while len(sessions) < args.sessions and \
+                    (not args.ramp or time.monotonic() - start >= len(sessions) * args.ramp):
+                sessions.append(_session(m, len(sessions), args, metrics, Scenario(lines, generator)))
+            for _, form, _ in sessions:
+                form.expire()
+            # actions are due at target rate; ones missed for lack of idle sessions are dropped
+            idle: List[int] = [i for i, (c, form, _) in enumerate(sessions) if c.is_alive() and not form.busy]
+            while due <= time.monotonic():
+                if not idle:
+                    due = time.monotonic()
+                    break
+                i: int = min(idle, key=lambda x: (x - turn) % len(sessions))
+                idle.remove(i)
+                turn = i + 1
+                action: Tuple[str, ...] = sessions[i][2].next()
+                sessions[i][1].request(action[0])
+                sessions[i][0].request_action(action)
+                due += 1. / args.rate
+            time.sleep(min(max(due - time.monotonic(), 0.), .05))
+            if time.monotonic() - timing >= args.period:
+                timing = time.monotonic()
+                counted = _report(sessions, metrics, counted, args.rate)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for c, form, _ in sessions:
+            form.expire()
+            c.join()
+        _report(sessions, metrics, counted, args.rate)
+
+
+def _session(m: re.Match,
+             number: int,
+             args: argparse.Namespace,
+             metrics: Metrics,
+             scenario: Scenario) -> Tuple[connection.Connection, SessionForm, Scenario]:
+    form: SessionForm = SessionForm(metrics, args.timeout)
+    c: connection.Connection = connection.Connection((m['ip'], int(m['port'])),
+                                                     flv.Source(form,
+                                                                m['content'].replace('{n}', str(number)),
+                                                                args.cp,
+                                                                headers_only=True))
+    c.start()
+    return c, form, scenario
+
+
+def _report(sessions: List[Tuple[connection.Connection, SessionForm, Scenario]],
+            metrics: Metrics,
+            counted: Tuple[float, int],
+            rate: float) -> Tuple[float, int]:
+    now: float = time.monotonic()
+    count: int = metrics.count
+    alive: int = sum(1 for c, _, _ in sessions if c.is_alive())
+    sys.stdout.write(f'sessions={alive}/{len(sessions)} '
+                     f'actions/s={(count - counted[1]) / max(now - counted[0], 1e-9):.1f} (target {rate:g}) '
+                     f'frames={sum(form.frames for _, form, _ in sessions)}\n'
+                     f'{metrics}\n')
+    sys.stdout.flush()
+    return now, count
@@ -0,0 +1,137 @@
+"""Local stand-in of cctv-dvr for load tests. Streams flv of empty video tags and answers control actions"""
+import argparse
+import json
+import random
+import socketserver
+import sys
+import threading
+import time
+from typing import Dict, List
+from urllib.parse import parse_qs, urlsplit
+
+
+class Session:
+    """Class of playback state of one control id, shared by its stream and control connections"""
+    def __init__(self) -> None:
+        self.paused: bool = False
+        self.scale: float = 1.
+        self.position: float = 0.
+        self.lock: threading.Lock = threading.Lock()
+
+    def on_action(self, action: str, pos: str) -> None:
+        with self.lock:
+            if action == 'pause':
+                self.paused = True
+            elif action in ('play', 'rplay'):
+                self.paused = False
+            elif action == 'scale':
+                self.scale = max(float(pos), 1e-3)
+            elif action == 'seek':
+                self.position = float(pos)
+            elif action in ('forward', 'shift'):
+                self.position += float(pos)
+            elif action == 'backward':
+                self.position = max(self.position - float(pos), 0.)
+
+
+class StandIn:
+    """Class of stand-in state: sessions by control id and reply behaviour"""
+    def __init__(self, fps: float, delay: float, jitter: float, error_rate: float) -> None:
+        self.fps: float = fps
+        self.delay: float = delay
+        self.jitter: float = jitter
+        self.error_rate: float = error_rate
+        self._sessions: Dict[str, Session] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def session(self, control: str) -> Session:
+        with self._lock:
+            return self._sessions.setdefault(control, Session())
+
+
+class StreamHandler(socketserver.BaseRequestHandler):
+    """Handler of stream request: http reply, flv header and video tags at fps of session scale"""
+    def handle(self) -> None:
+        standin: StandIn = self.server.standin
+        request: bytes = self.request.recv(4096)
+        elements: List[str] = request.split(b' ', 2)[1].decode('utf-8').strip('/').split('/') if request else []
+        session: Session = standin.session(elements[-3] if len(elements) > 2 else '')
+        self.request.sendall(b'HTTP/1.0 200 OK\r\nContent-Type: video/x-flv\r\n\r\n'
+                             b'FLV\x01\x01\x00\x00\x00\x09')
+        timestamp: float = 0.
+        previous: int = 0
+        try:
+            while True:
+                with session.lock:
+                    paused, scale = session.paused, session.scale
+                if not paused:
+                    body: bytes = b'\x17\x01\x00\x00\x00' + random.getrandbits(64).to_bytes(8, 'big')
+                    ts: int = int(timestamp) & 0xffffffff
+                    self.request.sendall(previous.to_bytes(4, 'big') + b'\x09' + len(body).to_bytes(3, 'big') +
+                                         (ts & 0xffffff).to_bytes(3, 'big') + bytes((ts >> 24,)) + b'\x00\x00\x00' +
+                                         body)
+                    previous = 11 + len(body)
+                    timestamp += 1000. / standin.fps
+                    with session.lock:
+                        session.position += scale / standin.fps
+                time.sleep(1. / (standin.fps * scale))
+        except OSError:
+            pass
+
+
+class ControlHandler(socketserver.BaseRequestHandler):
+    """Handler of control request GET /?control=id&action=name[&pos=value]. Replies json with position"""
+    def handle(self) -> None:
+        standin: StandIn = self.server.standin
+        request: bytes = self.request.recv(4096)
+        if not request:
+            return
+        query: Dict[str, List[str]] = parse_qs(urlsplit(request.split(b' ', 2)[1].decode('utf-8')).query)
+        time.sleep(max(standin.delay + random.uniform(-standin.jitter, standin.jitter), 0.))
+        session: Session = standin.session(query.get('control', [''])[0])
+        try:
+            if random.random() < standin.error_rate:
+                raise ValueError('injected error')
+            session.on_action(query.get('action', [''])[0], query.get('pos', ['0'])[0])
+            with session.lock:
+                reply: str = 'HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n\r\n' + \
+                             json.dumps({'position': int(session.position)})
+        except ValueError as err:
+            reply = 'HTTP/1.0 500 Internal Server Error\r\nContent-Type: application/json\r\n\r\n' + \
+                    json.dumps({'error': str(err)})
+        self.request.sendall(reply.encode())
+
+
+class Server(socketserver.ThreadingTCPServer):
+    """Class of threading tcp server of stand-in"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, port: int, handler: type, standin: StandIn) -> None:
+        super().__init__(('', port), handler)
+        self.standin: StandIn = standin
+
+
+def run(argv: List[str] = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(prog='tsinspect standin',
+                                                              description='local stand-in of cctv-dvr for load tests')
+    parser.add_argument('-port', type=int, default=8080, help='stream port (def. 8080)')
+    parser.add_argument('-cp', type=int, default=2232, help='control port (def. 2232)')
+    parser.add_argument('-fps', type=float, default=25., help='video frames per sec. at scale 1 (def. 25)')
+    parser.add_argument('-delay', type=float, default=.01, help='control reply delay sec. (def. 0.01)')
+    parser.add_argument('-jitter', type=float, default=.005, help='control reply delay jitter sec. (def. 0.005)')
+    parser.add_argument('-error_rate', type=float, default=0., help='share of failed control replies (def. 0)')
+    args: argparse.Namespace = parser.parse_args(argv)
+    standin: StandIn = StandIn(args.fps, args.delay, args.jitter, args.error_rate)
+    servers: List[Server] = [Server(args.port, StreamHandler, standin), Server(args.cp, ControlHandler, standin)]
+    for server in servers[1:]:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    sys.stdout.write(f'stream port {args.port}, control port {args.cp}\n')
+    sys.stdout.flush()
+    try:
+        servers[0].serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.server_close()
@@ -0,0 +1,206 @@
+"""Offline analysis of flv files and pcap/pcapng captures of rtp streams.
+   Files are memory mapped, big files are split into regions analyzed by process pool.
+   Statistics of regions are merged into summary of every stream"""
+import argparse
+import io
+import mmap
+import multiprocessing
+import os
+import sys
+from typing import Dict, List, TextIO, Tuple, Union
+from . import capture
+from ..analysis.statistics import StreamStatistics
+from ..display.console import ConsoleForm
+from ..protocols import flv, nal, rtsp
+
+
+def run(argv: List[str] = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(prog='tsinspect analyze',
+                                                              description='offline timestamp analysis')
+    parser.add_argument('file', type=str, help='flv file or pcap/pcapng capture of rtp streams')
+    parser.add_argument('-processes',
+                        type=int,
+                        default=os.cpu_count(),
+                        help='number of processes to analyze file regions (def. cpu count)')
+    parser.add_argument('-region', type=int, default=256, help='size of file region in MB (def. 256)')
+    parser.add_argument('-codec',
+                        type=str,
+                        default='h264',
+                        choices=['h264', 'h265'],
+                        help='video codec of rtp streams in capture (def. h264)')
+    parser.add_argument('-fingerprint',
+                        action='store_true',
+                        help='fingerprint video frames by crc32 to detect frozen and repeated ones')
+    args: argparse.Namespace = parser.parse_args(argv)
+    size: int = os.path.getsize(args.file)
+    if not size:
+        parser.error(f'empty file {args.file}')
+    region: int = max(args.region, 1) << 20
+    codec: nal.Codec = nal.CODECS[args.codec.upper()]
+    regions: List[Tuple[str, int, int, nal.Codec, bool]] = [(args.file,
+                                                             start,
+                                                             min(start + region, size),
+                                                             codec,
+                                                             args.fingerprint)
+                                                            for start in range(0, size, region)]
+    streams: Dict[str, StreamStatistics] = {}
+    if len(regions) == 1 or args.processes < 2:
+        for r in regions:
+            _on_region(analyze(*r), streams)
+    else:
+        with multiprocessing.Pool(min(args.processes, len(regions))) as pool:
+            for result in pool.imap(_analyze_region, regions):
+                _on_region(result, streams)
+    if len(regions) > 1:
+        for name, statistics in streams.items():
+            ConsoleForm(f'summary {name}').log_statistics(f'regions={len(regions)} '
+                                                          f'frames={statistics.frames} '
+                                                          f'bytes={statistics.bytes} '
+                                                          f'lost={statistics.lost}\n{statistics!r}')
+
+
+def analyze(path: str,
+            start: int = 0,
+            end: int = -1,
+            codec: nal.Codec = nal.Codec.H264,
+            fingerprint: bool = False) -> Tuple[str, Dict[str, StreamStatistics]]:
+    """Analyzes units which begin in [start, end) region of file. Returns report text and statistics of streams"""
+    report: io.StringIO = io.StringIO()
+    streams: Dict[str, StreamStatistics] = {}
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        view: memoryview = memoryview(m)
+        try:
+            file_format: str = capture.file_format(view)
+            if file_format == 'flv':
+                streams = _analyze_flv(path, view, start, end, report, fingerprint)
+            elif file_format == 'pcap':
+                streams = _analyze_capture(capture.PcapReader(view),
+                                           start, end, CaptureAnalyzer(report, codec, fingerprint))
+            elif file_format == 'pcapng':
+                streams = _analyze_capture(capture.PcapngReader(view),
+                                           start, end, CaptureAnalyzer(report, codec, fingerprint))
+            else:
+                report.write(f'{path}: unknown file format\n')
+        finally:
+            view.release()
+    return report.getvalue(), streams
+
+
+class CaptureAnalyzer:
+    """Class to pass rtp flows of capture to rtsp sources. Interleaved flows are detected by '$' marker"""
+    def __init__(self, stream: TextIO, codec: nal.Codec = nal.Codec.H264, fingerprint: bool = False) -> None:
+        self._stream: TextIO = stream
+        self._codec: nal.Codec = codec
+        self._fingerprint: bool = fingerprint
+        self._sources: Dict[Tuple, rtsp.Source] = {}
+        self._forms: Dict[Tuple, ConsoleForm] = {}
+        self._sequences: Dict[Tuple, int] = {}
+
+    def on_frame(self, frame: capture.Frame) -> None:
+        segment: capture.Segment = capture.decode(frame.linktype, frame.data)
+        if segment and segment.payload:
+            if segment.protocol == capture.UDP:
+                self._on_datagram(segment, frame.timestamp)
+            else:
+                self._on_segment(segment, frame.timestamp)
+
+    def on_end(self) -> None:
+        for flow, source in self._sources.items():
+            source.flush()
+            self._forms[flow].log_statistics(source.statistics())
+
+    def statistics(self) -> Dict[str, StreamStatistics]:
+        """Returns statistics of rtp flows by flow name"""
+        return {source.content: source.stream_statistics for source in self._sources.values()}
+
+    def _on_datagram(self, segment: capture.Segment, timestamp: int) -> None:
+        payload: memoryview = segment.payload
+        if len(payload) < 12 or payload[0] >> 6 != 2:
+            return
+        if 200 <= payload[1] <= 204:
+            source: rtsp.Source = self._sources.get((capture.UDP,
+                                                     (segment.source[0], segment.source[1] - 1),
+                                                     (segment.destination[0], segment.destination[1] - 1)))
+            source and source.on_datagrams(1, [(payload, timestamp)])
+        elif payload[1] & 0x7f < 35 or payload[1] & 0x7f >= 96:
+            self._source(segment).on_datagrams(0, [(payload, timestamp)])
+
+    def _on_segment(self, segment: capture.Segment, timestamp: int) -> None:
+        flow: Tuple = (capture.TCP, segment.source, segment.destination)
+        payload: memoryview = segment.payload
+        if flow not in self._sources:
+            if len(payload) < 5 or payload[0] != 0x24 or payload[4] >> 6 != 2:
+                return
+            self._sequences[flow] = segment.sequence
+        overlap: int = (self._sequences[flow] - segment.sequence) & 0xffffffff
+        if overlap < 0x80000000:
+            if overlap >= len(payload):
+                return
+            payload = payload[overlap:]
+        self._sequences[flow] = (segment.sequence + len(segment.payload)) & 0xffffffff
+        self._source(segment).on_interleaved(payload, timestamp)
+
+    def _source(self, segment: capture.Segment) -> rtsp.Source:
+        flow: Tuple = (segment.protocol, segment.source, segment.destination)
+        source: rtsp.Source = self._sources.get(flow)
+        if not source:
+            name: str = f'{segment.source[0]}:{segment.source[1]}>{segment.destination[0]}:{segment.destination[1]}'
+            self._forms[flow] = ConsoleForm(name, self._stream)
+            source = rtsp.Source(self._forms[flow], [], name, fingerprint=self._fingerprint)
+            source.codec = self._codec
+            self._sources[flow] = source
+        return source
+
+
+def _analyze_region(region: Tuple[str, int, int, nal.Codec, bool]) -> Tuple[str, Dict[str, StreamStatistics]]:
+    return analyze(*region)
+
+
+def _on_region(result: Tuple[str, Dict[str, StreamStatistics]], streams: Dict[str, StreamStatistics]) -> None:
+    """Prints report of region and merges its statistics into statistics of previous regions"""
+    sys.stdout.write(result[0])
+    for name, statistics in result[1].items():
+        if name in streams:
+            streams[name].merge(statistics)
+        else:
+            streams[name] = statistics
+
+
+def _analyze_flv(path: str,
+                 view: memoryview,
+                 start: int,
+                 end: int,
+                 report: TextIO,
+                 fingerprint: bool) -> Dict[str, StreamStatistics]:
+    end = len(view) if end < 0 else end
+    form: ConsoleForm = ConsoleForm('', report)
+    source: flv.Source = flv.Source(form, path, 0, fingerprint=fingerprint)
+    if not start:
+        offset: int = source.on_tag(view, True) if len(view) >= 24 else len(view)
+    else:
+        source.on_header(view)
+        offset = _flv_boundary(view, start)
+        source.position = offset
+    while offset < end and offset + 15 <= len(view):
+        offset += source.on_tag(view[offset:])
+    form.log_statistics(source.statistics())
+    return {flv.TagType(tag_type).name.lower(): statistics for tag_type, statistics in source.stream_statistics.items()}
+
+
+def _flv_boundary(view: memoryview, offset: int) -> int:
+    for position in range(offset, len(view) - 15):
+        if view[position + 4] in (8, 9, 18) and view[position + 12:position + 15] == b'\x00\x00\x00':
+            size: int = int.from_bytes(view[position + 5:position + 8], byteorder='big')
+            following: int = position + 15 + size
+            if following + 4 > len(view) or \
+                    int.from_bytes(view[following:following + 4], byteorder='big') == size + 11:
+                return position
+    return len(view)
+
+
+def _analyze_capture(reader: Union[capture.PcapReader, capture.PcapngReader],
+                      start: int, end: int, analyzer: CaptureAnalyzer) -> Dict[str, StreamStatistics]:
+    for frame in reader.frames(start, end):
+        analyzer.on_frame(frame)
+    analyzer.on_end()
+    return analyzer.statistics()
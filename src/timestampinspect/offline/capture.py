@@ -0,0 +1,197 @@
+"""Capture file readers. Walk packets of memory mapped pcap/pcapng file without copying them"""
+import socket
+import struct
+from collections import namedtuple
+from typing import Dict, Iterator, List, Tuple, Union
+
+
+Frame: namedtuple = namedtuple('Frame', 'timestamp linktype data')
+Segment: namedtuple = namedtuple('Segment', 'protocol source destination sequence payload')
+
+TCP: int = 6
+UDP: int = 17
+
+PCAP_MAGIC: Dict[bytes, Tuple[str, int]] = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1000),
+    b'\xa1\xb2\xc3\xd4': ('>', 1000),
+    b'\x4d\x3c\xb2\xa1': ('<', 1),
+    b'\xa1\xb2\x3c\x4d': ('>', 1)
+}
+PCAPNG_MAGIC: bytes = b'\x0a\x0d\x0d\x0a'
+MAX_FRAME_SIZE: int = 262144
+BOUNDARY_CHAIN: int = 4
+BOUNDARY_SECONDS: int = 3600
+
+
+def file_format(view: memoryview) -> str:
+    """Returns 'flv', 'pcap', 'pcapng' or empty string if file format is unknown"""
+    signature: bytes = bytes(view[:4])
+    if signature[:3] == b'FLV':
+        return 'flv'
+    elif signature in PCAP_MAGIC:
+        return 'pcap'
+    elif signature == PCAPNG_MAGIC:
+        return 'pcapng'
+    return ''
+
+
+class PcapReader:
+    """Class to walk records of pcap file"""
+    def __init__(self, view: memoryview) -> None:
+        self._view: memoryview = view
+        order, self._scale = PCAP_MAGIC[bytes(view[:4])]
+        self._snaplen, self._linktype = struct.unpack_from(order + 'II', view, 16)
+        self._record: struct.Struct = struct.Struct(order + 'IIII')
+
+    def frames(self, start: int = 0, end: int = -1) -> Iterator[Frame]:
+        """Yields frames of records which begin in [start, end) region of file"""
+        end = len(self._view) if end < 0 else end
+        offset: int = self._boundary(start)
+        while offset < end and offset + 16 <= len(self._view):
+            seconds, fraction, size, _ = self._record.unpack_from(self._view, offset)
+            if offset + 16 + size > len(self._view):
+                break
+            yield Frame(seconds * 1000000000 + fraction * self._scale,
+                        self._linktype,
+                        self._view[offset + 16:offset + 16 + size])
+            offset += 16 + size
+
+    def _boundary(self, offset: int) -> int:
+        """Returns offset of first record at or after offset, which is followed by BOUNDARY_CHAIN valid records
+           captured within BOUNDARY_SECONDS, so that zero or random payload bytes are not taken for records"""
+        if offset <= 24:
+            return 24
+        for position in range(offset, len(self._view) - 16):
+            if self._chain(position):
+                return position
+        return len(self._view)
+
+    def _chain(self, offset: int) -> bool:
+        seconds: int = -1
+        for _ in range(BOUNDARY_CHAIN):
+            if offset == len(self._view):
+                return seconds >= 0
+            if offset + 16 > len(self._view):
+                return False
+            record_seconds, fraction, size, original_size = self._record.unpack_from(self._view, offset)
+            if not 0 < size <= min(original_size, self._snaplen, MAX_FRAME_SIZE) or \
+                    fraction >= 1000000000 // self._scale or \
+                    (seconds >= 0 and abs(record_seconds - seconds) > BOUNDARY_SECONDS):
+                return False
+            seconds = record_seconds
+            offset += 16 + size
+        return True
+
+
+class PcapngReader:
+    """Class to walk enhanced packet blocks of pcapng file"""
+    def __init__(self, view: memoryview) -> None:
+        self._view: memoryview = view
+        self._order: str = '<' if bytes(view[8:12]) == b'\x4d\x3c\x2b\x1a' else '>'
+        self._block: struct.Struct = struct.Struct(self._order + 'II')
+        self._packet: struct.Struct = struct.Struct(self._order + 'IIIII')
+        self._interfaces: List[Tuple[int, int]] = []
+        offset: int = 0
+        while offset + 12 <= len(view):
+            kind, length = self._block.unpack_from(view, offset)
+            if kind == 6 or length < 12:
+                break
+            if kind == 1:
+                self._interfaces.append(self._interface(offset, length))
+            offset += length
+
+    def frames(self, start: int = 0, end: int = -1) -> Iterator[Frame]:
+        """Yields frames of packet blocks which begin in [start, end) region of file"""
+        end = len(self._view) if end < 0 else end
+        offset: int = self._boundary(start)
+        while offset < end and offset + 12 <= len(self._view):
+            kind, length = self._block.unpack_from(self._view, offset)
+            if length < 12 or offset + length > len(self._view):
+                break
+            if kind == 6 and length >= 32:
+                interface, high, low, size, _ = self._packet.unpack_from(self._view, offset + 8)
+                if interface < len(self._interfaces):
+                    linktype, resolution = self._interfaces[interface]
+                    yield Frame(((high << 32) | low) * 1000000000 // resolution,
+                                linktype,
+                                self._view[offset + 28:offset + 28 + size])
+            offset += length
+
+    def _boundary(self, offset: int) -> int:
+        if offset == 0:
+            return 0
+        for position in range(offset - offset % 4, len(self._view) - 12, 4):
+            kind, length = self._block.unpack_from(self._view, position)
+            if kind == 6 and 32 <= length <= MAX_FRAME_SIZE and not length % 4 and \
+                    position + length <= len(self._view) and \
+                    self._block.unpack_from(self._view, position + length - 8)[1] == length:
+                return position
+        return len(self._view)
+
+    def _interface(self, offset: int, length: int) -> Tuple[int, int]:
+        linktype: int = struct.unpack_from(self._order + 'H', self._view, offset + 8)[0]
+        resolution: int = 1000000
+        position: int = offset + 16
+        while position + 4 <= offset + length - 4:
+            code, size = struct.unpack_from(self._order + 'HH', self._view, position)
+            if code == 0:
+                break
+            if code == 9 and size == 1:
+                value: int = self._view[position + 4]
+                resolution = 2 ** (value & 0x7f) if value & 0x80 else 10 ** value
+            position += 4 + (size + 3) // 4 * 4
+        return linktype, resolution
+
+
+def decode(linktype: int, data: memoryview) -> Union[Segment, None]:
+    """Decodes udp datagram or tcp segment of link layer frame. Returns None for other frames"""
+    offset: int = 0
+    ethertype: int = 0
+    if linktype == 1:
+        offset = 12
+        ethertype = int.from_bytes(data[offset:offset + 2], byteorder='big')
+        while ethertype in (0x8100, 0x88a8):
+            offset += 4
+            ethertype = int.from_bytes(data[offset:offset + 2], byteorder='big')
+        offset += 2
+    elif linktype == 113:
+        ethertype = int.from_bytes(data[14:16], byteorder='big')
+        offset = 16
+    elif linktype == 276:
+        ethertype = int.from_bytes(data[0:2], byteorder='big')
+        offset = 20
+    elif linktype in (0, 101, 12, 14, 228, 229):
+        offset = 4 if linktype == 0 else 0
+        ethertype = {4: 0x0800, 6: 0x86dd}.get(data[offset] >> 4, 0) if len(data) > offset else 0
+    if ethertype == 0x0800 and len(data) >= offset + 20:
+        if int.from_bytes(data[offset + 6:offset + 8], byteorder='big') & 0x3fff:
+            return None
+        family: int = socket.AF_INET
+        protocol: int = data[offset + 9]
+        addresses: Tuple[memoryview, memoryview] = (data[offset + 12:offset + 16], data[offset + 16:offset + 20])
+        end: int = offset + int.from_bytes(data[offset + 2:offset + 4], byteorder='big')
+        offset += (data[offset] & 0xf) * 4
+    elif ethertype == 0x86dd and len(data) >= offset + 40:
+        family = socket.AF_INET6
+        protocol = data[offset + 6]
+        addresses = (data[offset + 8:offset + 24], data[offset + 24:offset + 40])
+        end = offset + 40 + int.from_bytes(data[offset + 4:offset + 6], byteorder='big')
+        offset += 40
+    else:
+        return None
+    end = min(end, len(data))
+    if protocol == UDP and end >= offset + 8:
+        payload: memoryview = data[offset + 8:end]
+        sequence: int = 0
+    elif protocol == TCP and end >= offset + 20:
+        payload = data[offset + (data[offset + 12] >> 4) * 4:end]
+        sequence = int.from_bytes(data[offset + 4:offset + 8], byteorder='big')
+    else:
+        return None
+    return Segment(protocol,
+                   (socket.inet_ntop(family, bytes(addresses[0])),
+                    int.from_bytes(data[offset:offset + 2], byteorder='big')),
+                   (socket.inet_ntop(family, bytes(addresses[1])),
+                    int.from_bytes(data[offset + 2:offset + 4], byteorder='big')),
+                   sequence,
+                   payload)
@@ -6,14 +6,29 @@ import types
 from base64 import b64encode
 from datetime import datetime
 from typing import Tuple, Union
+from .buffer import Policy
+from ..analysis.history import TimestampHistory
+from ..analysis.statistics import StreamStatistics
 from .interface import Interface
-from ..display.display import DisplayForm
+from .sink import Sink
 from .rtsp import Source as GenericRtsp
 
 
 class Source(Interface):
-    def __init__(self, form: DisplayForm, address: str, credentials: list, content: str) -> None:
-        self._generic: GenericRtsp = GenericRtsp(form, credentials, content)
+    def __init__(self,
+                 form: Sink,
+                 address: str,
+                 credentials: list,
+                 content: str,
+                 buffer_limit: Tuple[int, Policy] = (0, Policy.TRUNCATE),
+                 headers_only: bool = False,
+                 fingerprint: bool = False) -> None:
+        self._generic: GenericRtsp = GenericRtsp(form,
+                                                 credentials,
+                                                 content,
+                                                 buffer_limit=buffer_limit,
+                                                 headers_only=headers_only,
+                                                 fingerprint=fingerprint)
         self._speed: int = 1
         r = self._get_range(address)
         self._generic.range = [r['start'], r['end']]
@@ -28,6 +43,24 @@ class Source(Interface):
     def on_stream(self, key: selectors.SelectorKey, data: bytes, expected_length: int) -> int:
         return self._generic.on_stream(key, data, expected_length)
 
+    def statistics(self) -> str:
+        return self._generic.statistics()
+
+    def video_statistics(self) -> StreamStatistics:
+        return self._generic.video_statistics()
+
+    def video_history(self) -> TimestampHistory:
+        return self._generic.video_history()
+
+    def history(self, begin: int, end: int) -> str:
+        return self._generic.history(begin, end)
+
+    def skip_size(self) -> int:
+        return self._generic.skip_size()
+
+    def on_skip(self, data: memoryview) -> None:
+        self._generic.on_skip(data)
+
     def add_action(self,
                    selector: selectors.DefaultSelector,
                    stream_socket: socket.socket,
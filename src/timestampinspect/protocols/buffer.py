@@ -0,0 +1,46 @@
+"""Memory bounded buffer of stream source"""
+from enum import IntEnum
+
+
+Policy: IntEnum = IntEnum('Policy', ('RESYNC',
+                                     'TRUNCATE')
+                          )
+
+
+class StreamBuffer(bytearray):
+    """Class of stream buffer with memory limit and policy to apply when the limit is hit.
+       Zero limit means unbounded buffer. Buffer is parsed right after every socket read, so it holds
+       only the unit being received, and the limit is hit only by units larger than the limit"""
+    def __init__(self, limit: int = 0, policy: Policy = Policy.TRUNCATE) -> None:
+        super().__init__()
+        self.limit: int = limit
+        self.policy: Policy = policy
+        self.skip: int = 0
+        self.dropped_bytes: int = 0
+        self.dropped_packets: int = 0
+
+    def __repr__(self):
+        return f'Dropped(bytes={self.dropped_bytes}, packets={self.dropped_packets})'
+
+    def overflow(self) -> bool:
+        return 0 < self.limit <= len(self)
+
+    def discard(self, data: bytes) -> bytes:
+        """Cuts bytes left to skip from head of incoming data"""
+        if self.skip:
+            size: int = min(self.skip, len(data))
+            self.skip -= size
+            return data[size:]
+        return data
+
+    def drop(self, size: int, packets: int = 0) -> None:
+        """Drops size bytes. Buffered bytes first, the rest is skipped from incoming data"""
+        buffered: int = min(size, len(self))
+        del self[:buffered]
+        self.skip += size - buffered
+        self.dropped_bytes += size
+        self.dropped_packets += packets
+
+    def clear(self) -> None:
+        super().clear()
+        self.skip = 0
@@ -0,0 +1,65 @@
+"""CDN url tokens. Content url is encrypted by aes128 ecb with key derived from password and base32 encoded"""
+import argparse
+import functools
+import hashlib
+import sys
+from base64 import b32encode
+from typing import Iterable, Iterator, List, TextIO
+
+
+CACHE_SIZE: int = 65536
+
+
+def key(password: str) -> bytes:
+    """Returns aes128 key: first 16 bytes of sha1 of password"""
+    return hashlib.sha1(password.encode()).digest()[:16]
+
+
+@functools.lru_cache(maxsize=256)
+def _cipher(password: str):
+    from Crypto.Cipher import AES  # only cdn urls need pycrypto, imported when first one is encoded
+    return AES.new(key(password), AES.MODE_ECB)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def token(address: str, password: str, camera_id: str, content: str) -> str:
+    """Returns token of content of camera at cdn address (host:port)"""
+    plain: bytes = f'{address}/{camera_id}/{content}'.encode()
+    plain += b'\x0e' * (16 - len(plain) % 16)
+    return b32encode(_cipher(password).encrypt(plain)).rstrip(b'=').decode('utf-8')
+
+
+def path(address: str, password: str, camera_id: str, content: str) -> str:
+    """Returns cdn path of content. Url parameters after '?' are not encrypted and follow token"""
+    url: List[str] = content.split('?', 1)
+    return token(address, password, camera_id, url[0]) + (f'/{url[1]}' if len(url) == 2 and url[1] else '')
+
+
+def batch(inventory: Iterable[str], password: str = '') -> Iterator[str]:
+    """Yields cdn urls of inventory lines 'host:port camera_id content [password]'.
+       Empty lines and lines starting with '#' are skipped"""
+    for line in inventory:
+        fields: List[str] = line.split()
+        if not fields or fields[0].startswith('#'):
+            continue
+        if len(fields) < 3 or (len(fields) < 4 and not password):
+            raise ValueError(f'invalid inventory line: {line.rstrip()}')
+        yield f'http://{fields[0]}/{path(fields[0], fields[3] if len(fields) > 3 else password, fields[1], fields[2])}'
+
+
+def run(argv: List[str] = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(prog='tsinspect cdn',
+                                                              description='cdn urls of cameras in inventory')
+    parser.add_argument('inventory',
+                        type=str,
+                        help="file of lines 'host:port camera_id content [password]', - for stdin")
+    parser.add_argument('-cdn_password', type=str, default='', help='password of lines without one')
+    args: argparse.Namespace = parser.parse_args(argv)
+    inventory: TextIO = sys.stdin if args.inventory == '-' else open(args.inventory)
+    try:
+        for url in batch(inventory, args.cdn_password):
+            sys.stdout.write(url + '\n')
+    except ValueError as err:
+        parser.error(str(err))
+    finally:
+        inventory is sys.stdin or inventory.close()
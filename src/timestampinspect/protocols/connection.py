@@ -5,6 +5,9 @@ import threading
 import time
 import types
 from typing import TypeVar, Generic, Tuple, List, Union
+from .udp import DatagramReceiver
+from ..analysis.history import TimestampHistory
+from ..analysis.statistics import StreamStatistics
 
 
 T = TypeVar('T')
@@ -19,6 +22,8 @@ class Connection(Generic[T], threading.Thread):
         self._pos_period: int = pos_period
         self._stream_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._actions: List[Tuple[str, str]] = []
+        self._datagram_sockets: List[socket.socket] = []
+        self._scratch: memoryview = memoryview(bytearray(1 << 16))
         self._lock: threading.Lock = threading.Lock()
         self._running = True
         self.exception: Union[OSError, None] = None
@@ -43,6 +48,7 @@ class Connection(Generic[T], threading.Thread):
         timing = time.time()
         while self._is_running():
             self._add_actions(selector)
+            self._add_datagram_sockets(selector)
             for key, mask in selector.select(timeout=.01):
                 if key.data:
                     try:
@@ -52,27 +58,47 @@ class Connection(Generic[T], threading.Thread):
                             if key.data.outb:
                                 sent = key.fileobj.send(key.data.outb)  # Should be ready to write
                                 key.data.outb = key.data.outb[sent:]
+                        Connection._watch_write(selector, key)
                     except:  # noqa # pylint: disable=bare-except
                         selector.unregister(key.fileobj)
                         key.fileobj.close()
                         if key.data.addr == self._address[1]:
-                            self._stop()
+                            self._halt()
             if self._pos_period and time.time() - timing > self._pos_period:
                 timing = time.time()
                 self.request_action(('getpos',))
         self._stream_socket.close()
+        for s in self._datagram_sockets:
+            s.close()
         selector.close()
 
     def join(self, timeout=None) -> None:
-        self._stop()
+        self._halt()
         if super().is_alive():
             super().join(timeout)
 
+    def statistics(self) -> str:
+        return self._proto.statistics() if self._proto else ''
+
+    def video_statistics(self) -> Union[StreamStatistics, None]:
+        return self._proto.video_statistics() if self._proto else None
+
+    def video_history(self) -> Union[TimestampHistory, None]:
+        return self._proto.video_history() if self._proto else None
+
+    def history(self, begin: int, end: int) -> str:
+        return self._proto.history(begin, end) if self._proto else ''
+
     def request_action(self, action: Union[Tuple[str, str], Tuple[str]]) -> None:
         with self._lock:
             self._actions.append(action)
 
     def _on_data(self, key: selectors.SelectorKey, expected_length: int) -> int:
+        if getattr(key.data, 'receiver', None):
+            self._proto.on_datagrams(key.data.channel, key.data.receiver.receive())
+            return expected_length
+        if key.data.addr == self._address[1] and self._proto.skip_size():
+            return self._on_skip(key, expected_length)
         data: bytes = key.fileobj.recv(1024)
         if data:
             if key.data.addr == self._address[1]:
@@ -81,20 +107,51 @@ class Connection(Generic[T], threading.Thread):
                 self._proto.on_action_reply(data)
         raise EOFError()
 
+    def _on_skip(self, key: selectors.SelectorKey, expected_length: int) -> int:
+        size: int = key.fileobj.recv_into(self._scratch, min(self._proto.skip_size(), len(self._scratch)))
+        if size:
+            self._proto.on_skip(self._scratch[:size])
+            return expected_length
+        raise EOFError()
+
     def _add_actions(self, selector: selectors.DefaultSelector) -> None:
         with self._lock:
             for action in self._actions:
-                sock: Union[socket.socket, None] = self._proto.add_action(selector,
-                                                                          self._stream_socket,
-                                                                          self._address[0], self._address[1], action)
+                try:
+                    sock: Union[socket.socket, None] = self._proto.add_action(selector,
+                                                                              self._stream_socket,
+                                                                              self._address[0], self._address[1],
+                                                                              action)
+                except socket.error as err:
+                    self.exception = err
+                    continue
                 if sock:
                     self._stream_socket = sock
             self._actions.clear()
 
+    @staticmethod
+    def _watch_write(selector: selectors.DefaultSelector, key: selectors.SelectorKey) -> None:
+        """Waits for socket to be writable only while it has data to send, not to spin on select"""
+        events: int = selectors.EVENT_READ | (selectors.EVENT_WRITE if key.data.outb else 0)
+        if key.events != events:
+            selector.modify(key.fileobj, events, key.data)
+
+    def _add_datagram_sockets(self, selector: selectors.DefaultSelector) -> None:
+        for channel, sock in enumerate(self._proto.datagram_sockets()):
+            if sock not in self._datagram_sockets:
+                self._datagram_sockets.append(sock)
+                selector.register(sock,
+                                  selectors.EVENT_READ,
+                                  types.SimpleNamespace(addr=None,
+                                                        inb=b'',
+                                                        outb=b'',
+                                                        channel=channel,
+                                                        receiver=DatagramReceiver(sock)))
+
     def _is_running(self):
         with self._lock:
             return self._running
 
-    def _stop(self):
+    def _halt(self):
         with self._lock:
             self._running = False
@@ -2,15 +2,61 @@
 import json
 import selectors
 import socket
+import struct
+import time
+from array import array
+from bisect import bisect_right
 from collections import namedtuple
-from typing import List, Tuple, Dict, Union
+from enum import IntEnum
+from typing import Any, List, Tuple, Dict, Union
 import types
+from .buffer import Policy, StreamBuffer
 from .interface import Interface
-from ..display.display import DisplayForm
+from ..analysis.fingerprint import Repeat, RepeatDetector
+from ..analysis.history import Sample, TimestampHistory
+from ..analysis.statistics import StreamStatistics
+from .sink import Sink
 
 
 FlvHeader: namedtuple = namedtuple('FlvHeader', 'signature version audio video offset')
 FlvTag: namedtuple = namedtuple('FlvTag', 'type, size, timestamp, sid')
+VideoTagHeader: namedtuple = namedtuple('VideoTagHeader', 'frame codec packet_type composition_time')
+
+
+class TagType(IntEnum):
+    AUDIO = 8,
+    VIDEO = 9,
+    SCRIPT = 18
+
+
+class FrameType(IntEnum):
+    KEY = 1,
+    INTER = 2,
+    DISPOSABLE = 3,
+    GENERATED = 4,
+    INFO = 5
+
+
+class KeyframeIndex:
+    """Class of keyframe index. Keeps keyframe timestamps and stream positions in typed arrays"""
+    def __init__(self) -> None:
+        self._timestamps: array = array('q')
+        self._positions: array = array('q')
+
+    def __len__(self) -> int:
+        return len(self._timestamps)
+
+    def append(self, timestamp: int, position: int) -> int:
+        """Adds keyframe. Returns interval from previous keyframe"""
+        interval: int = timestamp - self._timestamps[-1] if self._timestamps else 0
+        self._timestamps.append(timestamp)
+        self._positions.append(position)
+        return interval
+
+    def find(self, timestamp: int) -> Union[Tuple[int, int], None]:
+        """Returns timestamp and position of last keyframe not later than timestamp"""
+        i: int = bisect_right(self._timestamps, timestamp) - 1
+        return (self._timestamps[i], self._positions[i]) if i >= 0 else None
 
 
 class FlvParser:
@@ -19,47 +65,88 @@ class FlvParser:
         self._header: FlvHeader = FlvHeader('', 0, False, False, 0)
         self._previous_tag_size: int = 0
         self._tag: FlvTag = FlvTag(0, 0, 0, 0)
+        self._video: Union[VideoTagHeader, None] = None
 
     @property
     def tag(self):
         return self._tag
 
+    @property
+    def video(self) -> Union[VideoTagHeader, None]:
+        """Video tag header of last parsed tag, None if tag is not video"""
+        return self._video
+
     def ready(self) -> bool:
         return True if self._header.signature else False
 
+    def parse_header(self, data: bytes) -> int:
+        self._header = FlvHeader(bytes(data[:3]).decode('utf-8'),
+                                 int(data[3]),
+                                 (data[4] >> 2) & 1,
+                                 (data[4]) & 1,
+                                 int.from_bytes(data[5:9], byteorder='big'))
+        return self._header.offset
+
     def parse(self, data: bytes):
         offset: int = 0
         if not self._header.signature:
-            self._header = FlvHeader(data[:3].decode('utf-8'),
-                                     int(data[3]),
-                                     (data[4] >> 2) & 1,
-                                     (data[4]) & 1,
-                                     int.from_bytes(data[5:9], byteorder='big'))
-            offset = self._header.offset
-        self._previous_tag_size = int.from_bytes(data[offset:offset+13], byteorder='big')
+            offset = self.parse_header(data)
+        self._previous_tag_size = int.from_bytes(data[offset:offset+4], byteorder='big')
         offset += 4
         self._tag = FlvTag(int(data[offset]),
                            int.from_bytes(data[offset+1:offset+4], byteorder='big'),
-                           int.from_bytes(bytearray(data[offset+7])+data[offset+4:offset+7], byteorder='big'),
+                           (data[offset+7] << 24) | int.from_bytes(data[offset+4:offset+7], byteorder='big'),
                            int.from_bytes(data[offset+8:offset+11], byteorder='big'))
+        self._video = None
+        if self._tag.type == TagType.VIDEO and self._tag.size >= 5 and len(data) >= offset + 16:
+            codec: int = data[offset+11] & 0xf
+            avc: bool = codec in (7, 12)
+            self._video = VideoTagHeader(data[offset+11] >> 4,
+                                         codec,
+                                         data[offset+12] if avc else -1,
+                                         int.from_bytes(data[offset+13:offset+16], byteorder='big', signed=True)
+                                         if avc else 0)
         return offset + 11 + self._tag.size
 
+    @staticmethod
+    def parse_script(data: bytes) -> Tuple[str, Any]:
+        """Decodes amf0 name and value of script tag body"""
+        try:
+            name, offset = _amf0(data, 0)
+            return name, _amf0(data, offset)[0]
+        except (IndexError, ValueError, struct.error):
+            return '', None
+
     def __repr__(self):
         return str(self._header)
 
 
 class Source(Interface):
-    def __init__(self, form: DisplayForm, content: str, control_port: int) -> None:
-        self._form: DisplayForm = form
+    def __init__(self,
+                 form: Sink,
+                 content: str,
+                 control_port: int,
+                 buffer_limit: Tuple[int, Policy] = (0, Policy.TRUNCATE),
+                 headers_only: bool = False,
+                 fingerprint: bool = False) -> None:
+        self._form: Sink = form
         self._content: str = content
         self._control_port: int = control_port
-        self._buffer: bytearray = bytearray()
+        self._buffer: StreamBuffer = StreamBuffer(*buffer_limit)
+        self._headers_only: bool = headers_only
         self._parser: FlvParser = FlvParser()
         elements: List[str, ...] = content.split('/')
         self._control: str = ''
         if len(elements) > 2 and elements[-1] == elements[-2] == '0':
             self._control = elements[-3]
-        self._timestamp_delta: List[int, int] = [0, 0]
+        self._timestamps: Dict[int, int] = {}
+        self.position: int = 0
+        self.keyframes: KeyframeIndex = KeyframeIndex()
+        self.stream_statistics: Dict[int, StreamStatistics] = {TagType.VIDEO: StreamStatistics(rate=1000),
+                                                               TagType.AUDIO: StreamStatistics(rate=1000)}
+        self.stream_history: Dict[int, TimestampHistory] = {TagType.VIDEO: TimestampHistory(),
+                                                            TagType.AUDIO: TimestampHistory()}
+        self.fingerprints: Union[RepeatDetector, None] = RepeatDetector() if fingerprint else None
 
     def stream_request(self, address: str, port: int) -> bytes:
         return f'GET /{self._content} HTTP/1.0\r\n' \
@@ -72,34 +159,104 @@ class Source(Interface):
 
     def on_action_reply(self, data: bytes) -> None:
         headers: List[str, ...] = data.decode('utf-8').split('\r\n')
+        self._form.log_http(data.decode('utf-8'))
         js: Dict[str, str] = json.loads(headers[-1])
         if int(headers[0].split()[-2]) == 200 and 'position' in js:
             self._form.log_position(f'{js["position"]}')
-        self._form.log_http(data.decode('utf-8'))
 
     def on_stream(self, key: selectors.SelectorKey, data: bytes, expected_length: int) -> int:
-        self._buffer += data
+        arrival: int = time.time_ns()
+        self._buffer += self._buffer.discard(data)
         if not self._parser.ready():
             pos = self._buffer.find(b'\x0d\x0a\x0d\x0a')
-            if pos > 0:
-                http_reply: str = self._buffer[:pos + 4].decode('utf-8')
-                self._form.log_http(http_reply)
-                self._buffer = self._buffer[pos + 4:]
-                expected_length = self._parser.parse(self._buffer)
-                self._set_timestamp()
-                self._form.log_flv(f'{self._parser}\n'
-                                   f'ts={self._parser.tag.timestamp}, '
-                                   f'delta={self._parser.tag.timestamp - self._timestamp_delta[1]}')
-                self._timestamp_delta[1] = self._parser.tag.timestamp
-        elif len(self._buffer) >= expected_length + 15:
-            self._buffer = self._buffer[expected_length:]
-            expected_length = self._parser.parse(self._buffer)
-            self._set_timestamp()
-            self._form.log_flv(f'ts={self._parser.tag.timestamp}, '
-                               f'delta={self._parser.tag.timestamp - self._timestamp_delta[1]}')
-            self._timestamp_delta[1] = self._parser.tag.timestamp
+            if pos < 0 or not self._tag_ready(pos + 13):
+                return expected_length
+            http_reply: str = self._buffer[:pos + 4].decode('utf-8')
+            self._form.log_http(http_reply)
+            del self._buffer[:pos + 4]
+            expected_length = self.on_tag(self._buffer, True, arrival)
+        while self._tag_ready(expected_length):
+            del self._buffer[:expected_length]
+            expected_length = self.on_tag(self._buffer, arrival=arrival)
+        if self._headers_only and len(self._buffer) < expected_length:
+            skip: int = expected_length - len(self._buffer)
+            self._buffer.clear()
+            self._buffer.skip = skip
+            expected_length = 0
+        elif self._buffer.overflow():
+            self._buffer.drop(expected_length, 1 if self._buffer.policy == Policy.RESYNC else 0)
+            self._form.log_flv(repr(self._buffer))
+            expected_length = 0
         return expected_length
 
+    def on_header(self, data: bytes) -> int:
+        """Handler, called when flv header is framed apart from tags.
+           Returns offset of first tag"""
+        return self._parser.parse_header(data)
+
+    def on_tag(self, data: bytes, first: bool = False, arrival: int = 0) -> int:
+        """Handler, called when flv tag is framed. Data starts with previous tag size,
+           or with flv header if first. Arrival time is in nanoseconds, 0 if unknown.
+           Returns offset of next tag"""
+        expected_length: int = self._parser.parse(data)
+        tag: FlvTag = self._parser.tag
+        position: int = self.position + expected_length - 11 - tag.size
+        self.position += expected_length
+        line: str = (f'{self._parser}\n' if first else '') + \
+            f'ts={tag.timestamp}, delta={tag.timestamp - self._timestamps.get(tag.type, tag.timestamp)}'
+        self._timestamps[tag.type] = tag.timestamp
+        if tag.type in self.stream_statistics:
+            self.stream_statistics[tag.type].update(tag.timestamp, arrival, 15 + tag.size)
+            self.stream_history[tag.type].append(tag.timestamp, arrival)
+        if self.fingerprints and tag.type == TagType.VIDEO:
+            line += self._on_fingerprint(data, expected_length)
+        if self._parser.video:
+            line += self._on_video(self._parser.video, position)
+        elif tag.type == TagType.AUDIO:
+            line += f', audio, skew={tag.timestamp - self._timestamps.get(TagType.VIDEO, tag.timestamp)}'
+        elif tag.type == TagType.SCRIPT and len(data) >= expected_length:
+            name, value = FlvParser.parse_script(data[expected_length - tag.size:expected_length])
+            line += f', {name}(' + \
+                    ', '.join(f'{k}={v:g}' if isinstance(v, float) else f'{k}={v}'
+                              for k, v in (value.items() if isinstance(value, dict) else [])
+                              if isinstance(v, (bool, float, str))) + ')'
+        self._form.log_flv(line)
+        return expected_length
+
+    def statistics(self) -> str:
+        lines: List[str] = []
+        for tag_type, statistics in self.stream_statistics.items():
+            lines += [f'{TagType(tag_type).name.lower()} {x}' for x in repr(statistics).split('\n')]
+            lines.append(f'{TagType(tag_type).name.lower()} {self.stream_history[tag_type]!r}')
+        return '\n'.join(lines + ([repr(self.fingerprints)] if self.fingerprints else []) + [repr(self._buffer)])
+
+    def video_statistics(self) -> StreamStatistics:
+        return self.stream_statistics[TagType.VIDEO]
+
+    def video_history(self) -> TimestampHistory:
+        return self.stream_history[TagType.VIDEO]
+
+    def history(self, begin: int, end: int) -> str:
+        """Returns history lines of [begin, end) and keyframe which first video frame of the range is decoded from"""
+        lines: List[str] = []
+        for tag_type, history in self.stream_history.items():
+            lines += [f'{TagType(tag_type).name.lower()} {x}' for x in history.lines(begin, end)]
+        first: Union[Sample, None] = next(iter(self.stream_history[TagType.VIDEO].range(begin, end)), None)
+        keyframe: Union[Tuple[int, int], None] = self.keyframes.find(first.timestamp) if first else None
+        if keyframe:
+            lines.insert(0, f'video decoded from keyframe ts={keyframe[0]}, position={keyframe[1]}')
+        elif first:
+            lines.insert(0, f'video keyframe before ts={first.timestamp} is not received')
+        return '\n'.join(lines)
+
+    def skip_size(self) -> int:
+        return self._buffer.skip
+
+    def on_skip(self, data: memoryview) -> None:
+        self._buffer.skip -= len(data)
+        if self.fingerprints and self._parser.tag.type == TagType.VIDEO:
+            self.fingerprints.update_payload(data)
+
     def add_action(self,
                    selector: selectors.DefaultSelector,
                    stream_socket: socket.socket,
@@ -122,7 +279,71 @@ class Source(Interface):
             request = request + f'&pos={action[1]}'
         return (request + f'&sec HTTP/1.0\r\nHost: {address}:{self._control_port}\r\n\r\n').encode()
 
-    def _set_timestamp(self):
-        if not self._timestamp_delta[0]:
-            self._timestamp_delta[0] = self._parser.tag.timestamp
-            self._timestamp_delta[1] = self._parser.tag.timestamp
+    def _tag_ready(self, offset: int) -> bool:
+        """Tells if tag at offset has its headers buffered. Script tag must be buffered whole"""
+        if len(self._buffer) < offset + 20:
+            return False
+        if self._buffer[offset + 4] == TagType.SCRIPT:
+            return len(self._buffer) >= offset + 15 + int.from_bytes(self._buffer[offset + 5:offset + 8],
+                                                                     byteorder='big')
+        return True
+
+    def _on_fingerprint(self, data: bytes, expected_length: int) -> str:
+        timestamp: int = self.fingerprints.timestamp
+        with memoryview(data)[expected_length - self._parser.tag.size:min(expected_length, len(data))] as view:
+            repeat: Repeat = self.fingerprints.update(self._parser.tag.timestamp, view)
+        if repeat == Repeat.PREVIOUS:
+            return f', previous frame ts={timestamp} frozen, run={self.fingerprints.run}'
+        elif repeat == Repeat.WINDOW:
+            return f', previous frame ts={timestamp} repeated'
+        return ''
+
+    def _on_video(self, video: VideoTagHeader, position: int) -> str:
+        rc: str = ''
+        if video.packet_type >= 0:
+            rc = f', pts={self._parser.tag.timestamp + video.composition_time}, cts={video.composition_time}'
+        if video.packet_type == 0:
+            return rc + ', sequence header'
+        try:
+            rc += f', {FrameType(video.frame).name.lower()}'
+        except ValueError:
+            rc += f', frame={video.frame}'
+        if video.frame == FrameType.KEY:
+            rc += f', interval={self.keyframes.append(self._parser.tag.timestamp, position)}'
+        return rc
+
+
+def _amf0(data: bytes, offset: int) -> Tuple[Any, int]:
+    """Decodes amf0 value at offset. Returns value and offset of next one"""
+    marker: int = data[offset]
+    offset += 1
+    if marker == 0:
+        return struct.unpack_from('>d', data, offset)[0], offset + 8
+    elif marker == 1:
+        return bool(data[offset]), offset + 1
+    elif marker in (2, 12):
+        size_length: int = 2 if marker == 2 else 4
+        size: int = int.from_bytes(data[offset:offset + size_length], byteorder='big')
+        offset += size_length
+        return bytes(data[offset:offset + size]).decode('utf-8', 'replace'), offset + size
+    elif marker in (3, 8):
+        offset += 4 if marker == 8 else 0
+        rc: Dict[str, Any] = {}
+        while offset + 3 <= len(data) and bytes(data[offset:offset + 3]) != b'\x00\x00\x09':
+            size = int.from_bytes(data[offset:offset + 2], byteorder='big')
+            key: str = bytes(data[offset + 2:offset + 2 + size]).decode('utf-8', 'replace')
+            rc[key], offset = _amf0(data, offset + 2 + size)
+        return rc, offset + 3
+    elif marker == 10:
+        count: int = int.from_bytes(data[offset:offset + 4], byteorder='big')
+        offset += 4
+        values: List[Any] = []
+        for _ in range(count):
+            value, offset = _amf0(data, offset)
+            values.append(value)
+        return values, offset
+    elif marker == 11:
+        return struct.unpack_from('>d', data, offset)[0], offset + 10
+    elif marker in (5, 6):
+        return None, offset
+    raise ValueError(f'unsupported amf0 marker {marker}')
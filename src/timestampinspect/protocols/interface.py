@@ -2,7 +2,14 @@
 import abc
 import selectors
 import socket
-from typing import Tuple, Union
+from typing import List, Tuple, Union
+from ..analysis.history import TimestampHistory
+from ..analysis.statistics import StreamStatistics
+
+
+class SourceException(ValueError):
+    """Exception to raise in sources if stream can not be received"""
+    pass
 
 
 class Interface(abc.ABC):
@@ -36,3 +43,36 @@ class Interface(abc.ABC):
         """Adds action in action queue to be passed to source.
            Returns new stream socket or None"""
         raise NotImplementedError
+
+    def skip_size(self) -> int:
+        """Returns how many next stream bytes source does not need"""
+        return 0
+
+    def on_skip(self, data: memoryview) -> None:
+        """Handler, called when stream bytes source does not need are received"""
+        pass
+
+    def statistics(self) -> str:
+        """Returns summary of stream statistics"""
+        return ''
+
+    def video_statistics(self) -> Union[StreamStatistics, None]:
+        """Returns statistics of video stream, None if source does not keep them"""
+        return None
+
+    def video_history(self) -> Union[TimestampHistory, None]:
+        """Returns history of video stream frames, None if source does not keep it"""
+        return None
+
+    def history(self, begin: int, end: int) -> str:
+        """Returns frames received in [begin, end) wall-clock nanoseconds"""
+        return ''
+
+    def datagram_sockets(self) -> List[socket.socket]:
+        """Returns sockets to receive stream datagrams from. Index of socket is its channel"""
+        return []
+
+    def on_datagrams(self, channel: int, packets: List[Tuple[memoryview, int]]) -> None:
+        """Handler, called when batch of stream datagrams is received.
+           Packet is paired with its arrival time in nanoseconds"""
+        pass
@@ -0,0 +1,72 @@
+"""Lookup tables to classify H.264 and H.265 rtp payload by its first bytes"""
+from collections import namedtuple
+from enum import IntEnum
+from typing import Dict, List, Tuple
+
+
+Codec: IntEnum = IntEnum('Codec', ('H264',
+                                   'H265')
+                         )
+Kind: IntEnum = IntEnum('Kind', ('SINGLE',
+                                 'AGGREGATION',
+                                 'FRAGMENT',
+                                 'UNKNOWN')
+                        )
+
+Unit: namedtuple = namedtuple('Unit', 'type kind header_size')
+Fragment: namedtuple = namedtuple('Fragment', 's e type')
+
+
+def _h264_unit(octet: int) -> Unit:
+    unit_type: int = octet & 0x1f
+    if 1 <= unit_type <= 23:
+        return Unit(unit_type, Kind.SINGLE, 1)
+    elif 24 <= unit_type <= 27:
+        return Unit(unit_type, Kind.AGGREGATION, 1)
+    elif unit_type in (28, 29):
+        return Unit(unit_type, Kind.FRAGMENT, 1)
+    return Unit(unit_type, Kind.UNKNOWN, 1)
+
+
+def _h265_unit(octet: int) -> Unit:
+    unit_type: int = (octet >> 1) & 0x3f
+    if unit_type < 48:
+        return Unit(unit_type, Kind.SINGLE, 2)
+    elif unit_type == 48:
+        return Unit(unit_type, Kind.AGGREGATION, 2)
+    elif unit_type == 49:
+        return Unit(unit_type, Kind.FRAGMENT, 2)
+    return Unit(unit_type, Kind.UNKNOWN, 2)
+
+
+# Tables are indexed by first octet of nal unit header and by fragmentation unit header octet
+UNITS: Dict[Codec, Tuple[Unit, ...]] = {
+    Codec.H264: tuple(_h264_unit(octet) for octet in range(256)),
+    Codec.H265: tuple(_h265_unit(octet) for octet in range(256))
+}
+FRAGMENTS: Dict[Codec, Tuple[Fragment, ...]] = {
+    Codec.H264: tuple(Fragment(octet >> 7, (octet >> 6) & 1, octet & 0x1f) for octet in range(256)),
+    Codec.H265: tuple(Fragment(octet >> 7, (octet >> 6) & 1, octet & 0x3f) for octet in range(256))
+}
+KEY_TYPES: Dict[Codec, frozenset] = {
+    Codec.H264: frozenset((5,)),
+    Codec.H265: frozenset(range(16, 22))
+}
+CODECS: Dict[str, Codec] = {
+    'H264': Codec.H264,
+    'H265': Codec.H265,
+    'HEVC': Codec.H265
+}
+
+
+def aggregated_types(codec: Codec, payload: bytes, offset: int = 0) -> List[int]:
+    """Returns types of nal units in STAP-A, STAP-B or AP payload at offset"""
+    unit: Unit = UNITS[codec][payload[offset]]
+    position: int = offset + unit.header_size + (2 if codec == Codec.H264 and unit.type == 25 else 0)
+    if codec == Codec.H264 and unit.type > 25:
+        return []
+    rc: List[int] = []
+    while position + 2 < len(payload):
+        rc.append(UNITS[codec][payload[position + 2]].type)
+        position += 2 + int.from_bytes(payload[position:position + 2], byteorder='big')
+    return rc
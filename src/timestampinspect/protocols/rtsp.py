@@ -1,12 +1,19 @@
 """Rtsp client"""
 import selectors
 import socket
+import struct
+import time
 from base64 import b64encode
 from collections import namedtuple
 from enum import IntEnum
-from typing import Tuple, Union
-from .interface import Interface
-from ..display.display import DisplayForm, DisplayException
+from typing import Dict, List, Tuple, Union
+from . import nal, udp
+from ..analysis.fingerprint import Repeat, RepeatDetector
+from ..analysis.history import TimestampHistory
+from ..analysis.statistics import StreamStatistics, ntp_to_ns
+from .buffer import Policy, StreamBuffer
+from .interface import Interface, SourceException
+from .sink import Sink
 
 
 State: IntEnum = IntEnum('State', ('INITIAL',
@@ -15,33 +22,45 @@ State: IntEnum = IntEnum('State', ('INITIAL',
                                    'ASK_PLAYING',
                                    'PLAYING')
                          )
-
-
-class UnitType(IntEnum):
-    NonIDR = 1,
-    IDR = 5,
-    FU_A = 28
+Transport: IntEnum = IntEnum('Transport', ('TCP',
+                                           'UDP',
+                                           'MULTICAST')
+                             )
 
 
 RtpInterleaved: namedtuple = namedtuple('RtpInterleaved', 'preamble channel size')
 RtpHeader: namedtuple = namedtuple('RtpHeader', 'version P X CC M pt cseq timestamp ssrc')
-UnitHeader: namedtuple = namedtuple('UnitHeader', 'f nri type')
-FUHeader: namedtuple = namedtuple('FUHeader', 's e r type')
 
 
 class Source(Interface):
-    def __init__(self, form: DisplayForm, credentials: list, content: str) -> None:
-        self.form: DisplayForm = form
+    def __init__(self,
+                 form: Sink,
+                 credentials: list,
+                 content: str,
+                 transport: Transport = Transport.TCP,
+                 buffer_limit: Tuple[int, Policy] = (0, Policy.TRUNCATE),
+                 headers_only: bool = False,
+                 fingerprint: bool = False) -> None:
+        self.form: Sink = form
         self.credentials = credentials
         self.content: str = content
         self._sequence: int = 1
-        self._buffer: bytearray = bytearray()
-        self._interleaved: RtpInterleaved = RtpInterleaved('$', 0, 0)
+        self._buffer: StreamBuffer = StreamBuffer(*buffer_limit)
+        self._headers_only: bool = headers_only
+        self._interleaved: RtpInterleaved = RtpInterleaved(0x24, 0, 0)
         self._state: State = State.INITIAL
         self.url: str = ''
         self._control: list = []
         self._session: str = ''
         self._transport: str = ''
+        self._transport_type: Transport = transport
+        self._datagram_sockets: List[socket.socket] = []
+        self._rtp_sequence: int = -1
+        self._frame_size: int = 0
+        self.codec: nal.Codec = nal.Codec.H264
+        self.stream_statistics: StreamStatistics = StreamStatistics()
+        self.stream_history: TimestampHistory = TimestampHistory()
+        self.fingerprints: Union[RepeatDetector, None] = RepeatDetector() if fingerprint else None
         self.range = []
         self._authorization: str = ''
         self.timestamp_delta: list = [0, 0]
@@ -58,10 +77,13 @@ class Source(Interface):
 
     def on_stream(self, key: selectors.SelectorKey, data: bytes, expected_length: int) -> int:
         if self._state == State.PLAYING:
-            self._on_rtp_data(data)
+            if self._transport_type == Transport.TCP:
+                self.on_interleaved(data, time.time_ns())
+            else:
+                self.form.log_rtsp(data.decode('utf-8', 'replace'))
         else:
             try:
-                if self._session:
+                if self._session and self._transport_type == Transport.TCP:
                     reply_end = data.find(0x24)
                 else:
                     reply_end = data.find(b'\x0d\x0a\x0d\x0a')
@@ -70,7 +92,7 @@ class Source(Interface):
                                                          data[reply_end + 4:])
                 elif reply_end >= 0 and self._session:
                     self._state = State.PLAYING
-                    self._on_rtp_data(data[reply_end:])
+                    self.on_interleaved(data[reply_end:], time.time_ns())
             except UnicodeDecodeError:
                 self._state = State.PLAYING
         return len(data)
@@ -83,10 +105,85 @@ class Source(Interface):
                    action: Tuple[str, str]) -> Union[socket.socket, None]:
         return None
 
+    def skip_size(self) -> int:
+        return self._buffer.skip
+
+    def on_skip(self, data: memoryview) -> None:
+        self._buffer.skip -= len(data)
+        if self.fingerprints:
+            self.fingerprints.update_payload(data)
+
+    def statistics(self) -> str:
+        return f'{self.stream_statistics}\n' \
+               f'{self.stream_history!r}\n' + \
+               (f'{self.fingerprints!r}\n' if self.fingerprints else '') + \
+               f'lost={self.stream_statistics.lost}, {self._buffer!r}'
+
+    def video_statistics(self) -> StreamStatistics:
+        return self.stream_statistics
+
+    def video_history(self) -> TimestampHistory:
+        return self.stream_history
+
+    def history(self, begin: int, end: int) -> str:
+        return '\n'.join(self.stream_history.lines(begin, end))
+
+    def datagram_sockets(self) -> List[socket.socket]:
+        return self._datagram_sockets
+
+    def on_datagrams(self, channel: int, packets: List[Tuple[memoryview, int]]) -> None:
+        if not channel & 1:
+            for packet, arrival in packets:
+                self._on_rtp_packet(packet, arrival)
+        else:
+            for packet, _ in packets:
+                self._on_rtcp_packet(packet)
+
+    def on_interleaved(self, data: bytes, arrival: int) -> None:
+        """Handler, called when interleaved rtp/rtcp data is received at arrival time in nanoseconds"""
+        self._buffer += self._buffer.discard(data)
+        offset: int = 0
+        with memoryview(self._buffer) as view:
+            while len(self._buffer) - offset >= 4:
+                interleaved: RtpInterleaved = RtpInterleaved(self._buffer[offset],
+                                                             self._buffer[offset + 1],
+                                                             int.from_bytes(self._buffer[offset + 2:offset + 4],
+                                                                            byteorder='big'))
+                if interleaved.preamble != 0x24:
+                    resync: int = self._buffer.find(0x24, offset + 1)
+                    if resync < 0:
+                        resync = len(self._buffer)
+                    self._buffer.dropped_bytes += resync - offset
+                    offset = resync
+                    continue
+                end: int = offset + 4 + interleaved.size
+                if end > len(self._buffer):
+                    if self._headers_only and not interleaved.channel & 1 and \
+                            self._on_rtp_headers(view[offset + 4:], arrival, interleaved.size):
+                        self._buffer.skip = end - len(self._buffer)
+                        offset = len(self._buffer)
+                    break
+                if not interleaved.channel & 1:
+                    self._on_rtp_packet(view[offset + 4:end], arrival)
+                else:
+                    self._on_rtcp_packet(view[offset + 4:end])
+                offset = end
+        del self._buffer[:offset]
+        if self._buffer.overflow():
+            self._on_overflow(arrival)
+
+    def flush(self) -> None:
+        """Counts bytes of fragments of unfinished frame, e.g. when capture region ends"""
+        self.stream_statistics.bytes += self._frame_size
+        self._frame_size = 0
+
     def clear(self):
         self._state: State = State.INITIAL
         self._session = ''
         self.timestamp_delta = [0, 0]
+        self._rtp_sequence = -1
+        self._frame_size = 0
+        self.stream_statistics.restart()
         self._buffer.clear()
 
     def _on_rtsp_dialog(self, headers: list, remains: bytes) -> bytes:
@@ -94,7 +191,7 @@ class Source(Interface):
         self._set_status(headers[0])
         rc = b''
         if not (self._status == 200 or self._status == 401):
-            raise DisplayException(f'Source {self.url} not found')
+            raise SourceException(f'Source {self.url} not found')
         for hdr in headers:
             out_bytes: bytes = {
                 'CSeq': self._set_sequence,
@@ -112,45 +209,103 @@ class Source(Interface):
             self.form.log_rtsp(rc.decode('utf-8'))
         return rc
 
-    def _on_rtp_data(self, data: bytes):
-        self._buffer += data
-        while True:
-            interleaved: RtpInterleaved = RtpInterleaved(str(self._buffer[0]),
-                                                         self._buffer[1],
-                                                         int.from_bytes(self._buffer[2:4], byteorder='big'))
-            if len(self._buffer) > interleaved.size + 8:
-                header: RtpHeader = RtpHeader((self._buffer[4] >> 6) & 3,
-                                              (self._buffer[4] >> 5) & 1,
-                                              (self._buffer[4] >> 4) & 1,
-                                              (self._buffer[4]) & 0xf,
-                                              (self._buffer[5] >> 7) & 1,
-                                              (self._buffer[5]) & 0x7f,
-                                              int.from_bytes(self._buffer[6:8], byteorder='big'),
-                                              int.from_bytes(self._buffer[8:12], byteorder='big'),
-                                              int.from_bytes(self._buffer[12:16], byteorder='big'))
-                unit: UnitHeader = UnitHeader(self._buffer[16] >> 7,
-                                              (self._buffer[16] >> 5) & 3,
-                                              (self._buffer[16]) & 0x1f)
-                if unit.type == UnitType.FU_A:
-                    fu_header: FUHeader = FUHeader(self._buffer[17] >> 7,
-                                                   (self._buffer[17] >> 6) & 1,
-                                                   (self._buffer[17] >> 5) & 1,
-                                                   (self._buffer[17]) & 0x1f)
-                    if fu_header.e:
-                        self._initialize_timestamp_set(header)
-                        self.form.log_rtp(f'Rtp(type={fu_header.type},'
-                                          f' ts={header.timestamp},'
-                                          f' delta={header.timestamp - self.timestamp_delta[1]})')
-                        self.timestamp_delta[1] = header.timestamp
-                else:
-                    self._initialize_timestamp_set(header)
-                    self.form.log_rtp(f'Rtp(type={unit.type},'
-                                      f' ts={header.timestamp},'
-                                      f' delta={header.timestamp - self.timestamp_delta[1]})')
-                    self.timestamp_delta[1] = header.timestamp
-                self._buffer = self._buffer[interleaved.size + 4:]
-            else:
-                break
+    def _on_overflow(self, arrival: int) -> None:
+        if self._buffer.policy == Policy.RESYNC:
+            offset: int = self._buffer.find(0x24, 1)
+            self._buffer.drop(offset if offset > 0 else len(self._buffer), 1)
+        else:
+            size: int = int.from_bytes(self._buffer[2:4], byteorder='big')
+            if not self._buffer[1] & 1:
+                with memoryview(self._buffer) as view:
+                    self._on_rtp_packet(view[4:], arrival, size)
+            self._buffer.drop(4 + size)
+        self.form.log_rtp(repr(self._buffer))
+
+    def _on_rtp_headers(self, packet: memoryview, arrival: int, size: int) -> bool:
+        """Analyzes rtp packet if its headers are received. Payload is not needed"""
+        if not packet:
+            return False
+        length: int = 12 + 4 * (packet[0] & 0xf)
+        if packet[0] & 0x10:
+            if len(packet) < length + 4:
+                return False
+            length += 4 + 4 * int.from_bytes(packet[length + 2:length + 4], byteorder='big')
+        if len(packet) < length + 3:
+            return False
+        self._on_rtp_packet(packet, arrival, size)
+        return True
+
+    def _on_rtp_packet(self, packet: memoryview, arrival: int, size: int = 0) -> None:
+        """Analyzes rtp packet, which may be truncated. Size is full packet size if it is truncated.
+           Sizes of fragments are summed up and passed to statistics with the end fragment"""
+        if len(packet) < 12:
+            return
+        self._frame_size += size or len(packet)
+        header: RtpHeader = RtpHeader((packet[0] >> 6) & 3,
+                                      (packet[0] >> 5) & 1,
+                                      (packet[0] >> 4) & 1,
+                                      (packet[0]) & 0xf,
+                                      (packet[1] >> 7) & 1,
+                                      (packet[1]) & 0x7f,
+                                      int.from_bytes(packet[2:4], byteorder='big'),
+                                      int.from_bytes(packet[4:8], byteorder='big'),
+                                      int.from_bytes(packet[8:12], byteorder='big'))
+        self._check_sequence(header)
+        offset: int = 12 + 4 * header.CC
+        if header.X and len(packet) >= offset + 4:
+            offset += 4 + 4 * int.from_bytes(packet[offset + 2:offset + 4], byteorder='big')
+        if len(packet) < offset + 2:
+            return
+        if self.fingerprints:
+            timestamp: int = self.fingerprints.timestamp
+            self._on_fingerprint(timestamp, self.fingerprints.update(header.timestamp, packet[offset:]))
+        unit: nal.Unit = nal.UNITS[self.codec][packet[offset]]
+        if unit.kind == nal.Kind.FRAGMENT:
+            if len(packet) <= offset + unit.header_size:
+                return
+            fragment: nal.Fragment = nal.FRAGMENTS[self.codec][packet[offset + unit.header_size]]
+            if not fragment.e:
+                return
+            unit_type: str = str(fragment.type)
+        elif unit.kind == nal.Kind.AGGREGATION:
+            unit_type = f'{unit.type}{nal.aggregated_types(self.codec, packet, offset)}'
+        else:
+            unit_type = str(unit.type)
+        self._initialize_timestamp_set(header)
+        self.stream_statistics.update(header.timestamp, arrival, self._frame_size)
+        self._frame_size = 0
+        self.stream_history.append(header.timestamp, arrival)
+        self.form.log_rtp(f'Rtp(type={unit_type},'
+                          f' ts={header.timestamp},'
+                          f' delta={header.timestamp - self.timestamp_delta[1]})')
+        self.timestamp_delta[1] = header.timestamp
+
+    def _on_fingerprint(self, timestamp: int, repeat: Repeat) -> None:
+        if repeat == Repeat.PREVIOUS:
+            self.form.log_rtp(f'Frozen(ts={timestamp}, run={self.fingerprints.run})')
+        elif repeat == Repeat.WINDOW:
+            self.form.log_rtp(f'Repeated(ts={timestamp})')
+
+    def _on_rtcp_packet(self, packet: memoryview) -> None:
+        """Analyzes compound rtcp packet. Sender reports map rtp timestamps to ntp time"""
+        offset: int = 0
+        while offset + 8 <= len(packet):
+            length: int = 4 + 4 * int.from_bytes(packet[offset + 2:offset + 4], byteorder='big')
+            if packet[offset + 1] == 200 and length >= 28 and offset + 20 <= len(packet):
+                seconds, fraction, timestamp = struct.unpack_from('>III', packet, offset + 8)
+                self.stream_statistics.clock.on_sender_report(ntp_to_ns(seconds, fraction), timestamp)
+                self.form.log_rtp(f'Rtcp(SR, ntp={seconds}.{fraction * 1000000 >> 32:06d}, ts={timestamp})')
+            offset += length
+
+    def _check_sequence(self, header: RtpHeader) -> None:
+        if self._rtp_sequence >= 0:
+            gap: int = (header.cseq - self._rtp_sequence - 1) & 0xffff
+            if gap and gap < 0x8000:
+                self.stream_statistics.lost += gap
+                self.form.log_rtp(f'Rtp(cseq={header.cseq},'
+                                  f' lost={gap},'
+                                  f' total lost={self.stream_statistics.lost})')
+        self._rtp_sequence = header.cseq
 
     def _initialize_timestamp_set(self, header: RtpHeader):
         if not self.timestamp_delta[0]:
@@ -171,8 +326,14 @@ class Source(Interface):
         self._control = [x.split(':')[1] for x in description if 'a=control:' in x and '*' not in x]
         if not self.range:
             self.range = [x.split(':')[1].split('=')[1] for x in description if 'a=range:' in x][0].split('-')
+        codecs: List[List[str]] = [x.split()[1].split('/') for x in description
+                                   if x.startswith('a=rtpmap:') and len(x.split()) > 1]
+        encoding: List[str] = next((x for x in codecs if x[0].upper() in nal.CODECS), ['H264'])
+        self.codec = nal.CODECS[encoding[0].upper()]
+        if len(encoding) > 1 and encoding[1].isdigit():
+            self.stream_statistics.clock.rate = int(encoding[1])
         return f'SETUP {self._content_base}{self._control[0]} RTSP/1.0\r\n'\
-               f'Transport: RTP/AVP/TCP;unicast;interleaved=0-1\r\n' \
+               f'Transport: {self._transport_request()}\r\n' \
                f'CSeq: {self._sequence}\r\n' \
                f'User-Agent: pyCCTV_front\r\n' \
                f'{self._authorization}\r\n'.encode()
@@ -186,6 +347,20 @@ class Source(Interface):
 
     def _set_transport(self, **kwargs) -> None:
         self._transport = kwargs.get('header').split()[1]
+        if self._transport_type == Transport.MULTICAST and not self._datagram_sockets:
+            params: Dict[str, str] = dict(x.split('=', 1) for x in self._transport.split(';') if '=' in x)
+            self._datagram_sockets = udp.multicast_pair(params['destination'],
+                                                        int(params['port'].split('-')[0]))
+
+    def _transport_request(self) -> str:
+        if self._transport_type == Transport.UDP:
+            if not self._datagram_sockets:
+                self._datagram_sockets = udp.unicast_pair()
+            port: int = self._datagram_sockets[0].getsockname()[1]
+            return f'RTP/AVP;unicast;client_port={port}-{port + 1}'
+        elif self._transport_type == Transport.MULTICAST:
+            return 'RTP/AVP;multicast'
+        return 'RTP/AVP/TCP;unicast;interleaved=0-1'
 
     def _set_authentication(self, **kwargs) -> bytes:
         realm = kwargs.get('header').split()[1]
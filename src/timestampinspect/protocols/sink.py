@@ -0,0 +1,25 @@
+"""Receiver of source data. Sources pass stream data lines to sink, so they do not depend on display"""
+
+
+class Sink:
+    """Class of sink to pass source data lines to. Lines are dropped, subclasses show or keep them"""
+    def log_http(self, value: str) -> None:
+        pass
+
+    def log_rtsp(self, value: str) -> None:
+        pass
+
+    def log_rtp(self, value: str) -> None:
+        pass
+
+    def log_flv(self, value: str) -> None:
+        pass
+
+    def log_position(self, value: str) -> None:
+        pass
+
+    def log_error(self, value: str) -> None:
+        pass
+
+    def log_statistics(self, value: str) -> None:
+        pass
@@ -0,0 +1,85 @@
+"""Datagram transport for rtp/rtcp. Reads datagrams in batches into preallocated buffers"""
+import socket
+import struct
+import sys
+import time
+from typing import List, Tuple, Union
+
+
+# Socket module does not export SO_TIMESTAMPNS, Linux value is the one of asm-generic and x86/arm.
+# Arrival is taken from the clock on other platforms. Timestamp is native struct timespec of time_t and long
+SO_TIMESTAMPNS: Union[int, None] = getattr(socket, 'SO_TIMESTAMPNS', 35 if sys.platform.startswith('linux') else None)
+TIMESPEC: struct.Struct = struct.Struct('@ll')
+RECEIVE_BUFFER_SIZE: int = 1 << 21
+
+
+class DatagramReceiver:
+    """Class to receive datagrams with arrival time in nanoseconds.
+       Kernel receive timestamps are used if the platform supports them"""
+    def __init__(self, sock: socket.socket, batch: int = 32, size: int = 2048) -> None:
+        self.socket: socket.socket = sock
+        self._views: List[memoryview] = [memoryview(bytearray(size)) for _ in range(batch)]
+        self._ancillary_size: int = socket.CMSG_SPACE(TIMESPEC.size) if SO_TIMESTAMPNS else 0
+
+    def receive(self) -> List[Tuple[memoryview, int]]:
+        """Returns pending datagrams as (packet, arrival) pairs.
+           Packets stay valid until next call"""
+        packets: List[Tuple[memoryview, int]] = []
+        for view in self._views:
+            try:
+                size, ancillary, _, _ = self.socket.recvmsg_into([view], self._ancillary_size)
+            except (BlockingIOError, InterruptedError):
+                break
+            packets.append((view[:size], DatagramReceiver._arrival(ancillary)))
+        return packets
+
+    @staticmethod
+    def _arrival(ancillary: list) -> int:
+        for level, kind, data in ancillary:
+            if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS and len(data) >= TIMESPEC.size:
+                seconds, nanoseconds = TIMESPEC.unpack_from(data)
+                return seconds * 1000000000 + nanoseconds
+        return time.time_ns()
+
+
+def unicast_pair(attempts: int = 16) -> List[socket.socket]:
+    """Binds rtp socket to even port and rtcp socket to the next one"""
+    for _ in range(attempts):
+        rtp: socket.socket = _datagram_socket()
+        rtp.bind(('', 0))
+        port: int = rtp.getsockname()[1]
+        if not port & 1:
+            rtcp: socket.socket = _datagram_socket()
+            try:
+                rtcp.bind(('', port + 1))
+                return [rtp, rtcp]
+            except OSError:
+                rtcp.close()
+        rtp.close()
+    raise OSError('no free rtp/rtcp port pair')
+
+
+def multicast_pair(group: str, port: int, interface: str = '0.0.0.0') -> List[socket.socket]:
+    """Joins multicast group on rtp port and the next one"""
+    rc: List[socket.socket] = []
+    for p in (port, port + 1):
+        s: socket.socket = _datagram_socket()
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind(('', p))
+        s.setsockopt(socket.IPPROTO_IP,
+                     socket.IP_ADD_MEMBERSHIP,
+                     struct.pack('4s4s', socket.inet_aton(group), socket.inet_aton(interface)))
+        rc.append(s)
+    return rc
+
+
+def _datagram_socket() -> socket.socket:
+    s: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.setblocking(False)
+    try:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+        if SO_TIMESTAMPNS:
+            s.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+    except OSError:
+        pass
+    return s
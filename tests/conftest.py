@@ -0,0 +1,35 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+import pytest
+
+SOURCE: str = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+RUN: str = 'from timestampinspect.display.application import run; run()'
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def environment() -> dict:
+    """Environment of tsinspect subprocesses"""
+    return dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SOURCE, os.environ.get('PYTHONPATH')])))
+
+
+@pytest.fixture
+def standin(environment):
+    """Runs local stand-in of cctv-dvr on free ports. Yields stream and control ports"""
+    port, control = free_port(), free_port()
+    process = subprocess.Popen([sys.executable, '-c', RUN, 'standin', '-port', str(port), '-cp', str(control)],
+                               env=environment, stdout=subprocess.DEVNULL)
+    time.sleep(.5)
+    try:
+        yield port, control
+    finally:
+        process.terminate()
+        process.wait()
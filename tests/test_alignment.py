@@ -0,0 +1,52 @@
+import random
+from timestampinspect.analysis import alignment
+
+
+def streams():
+    """Returns reference stream of 300 frames with varying intervals and other stream of the same content:
+       it starts at frame 10, is 5 s ahead in timestamps and 250 ms late in arrival, drops frames 100, 101
+       and 200, duplicates frame 150 and has timestamp of frame 180 rewritten by 5 ms"""
+    rng: random.Random = random.Random(4)
+    timestamps = [0.]
+    for _ in range(299):
+        timestamps.append(timestamps[-1] + rng.choice((33., 34., 33., 40., 27.)))
+    arrivals = [10 ** 18 + int(x * 1e6) + rng.randint(0, 3000000) for x in timestamps]
+    other_timestamps, other_arrivals = [], []
+    for i in range(10, 300):
+        if i in (100, 101, 200):
+            continue
+        other_timestamps.append(timestamps[i] + 5000. + (5. if i == 180 else 0.))
+        other_arrivals.append(arrivals[i] + 250000000)
+        if i == 150:
+            other_timestamps.append(timestamps[i] + 5015.)
+            other_arrivals.append(arrivals[i] + 260000000)
+    return (timestamps, arrivals), (other_timestamps, other_arrivals)
+
+
+def test_to_ms_unwraps():
+    base: float = ((1 << 32) - 90) / 90.
+    assert [x - base for x in alignment.to_ms([(1 << 32) - 90, 0, 90], 90000)] == [0., 1., 2.]
+
+
+def test_best_lag():
+    rng: random.Random = random.Random(1)
+    reference = [rng.uniform(30., 50.) for _ in range(200)]
+    assert alignment.best_lag(reference, reference[17:])[0] == -17
+    assert alignment.best_lag(reference[17:], reference)[0] == 17
+    assert alignment.best_lag(reference, reference) == (0, 1.)
+
+
+def test_compare():
+    reference, other = streams()
+    rc: alignment.Comparison = alignment.compare(reference, other)
+    assert rc == alignment.Comparison(287, -10, 1., 5000., 250., 3, 1, 1, 5.)
+    rc = alignment.compare(other, reference)
+    assert (rc.lag, rc.offset, rc.latency, rc.dropped, rc.duplicated) == (10, -5000., -250., 1, 3)
+
+
+def test_compare_of_constant_intervals_aligns_by_arrival():
+    timestamps = [i * 40. for i in range(100)]
+    arrivals = [10 ** 18 + i * 40000000 for i in range(100)]
+    rc: alignment.Comparison = alignment.compare((timestamps, arrivals),
+                                                 ([x + 1000. for x in timestamps[5:]], arrivals[5:]))
+    assert (rc.frames, rc.lag, rc.correlation, rc.offset, rc.latency, rc.dropped) == (95, -5, 0., 1000., 0., 0)
@@ -0,0 +1,43 @@
+import hashlib
+from base64 import b32encode
+import pytest
+from timestampinspect.protocols import cdn
+
+AES = pytest.importorskip('Crypto.Cipher.AES')
+KNOWN: str = 'BCOLLHRA7SNXJQC7FWJ742FVUUL5P4SOGVFTUCYCLWPK6WPIVHYA'  # checked with openssl enc -aes-128-ecb
+
+
+def reference(address: str, password: str, camera_id: str, content: str) -> str:
+    """Token as encoded before tokens were cached: new cipher per url, url encrypted block by block"""
+    url: str = f'{address}/{camera_id}/{content}'
+    url += chr(0x0e) * (16 - len(url) % 16)
+    cipher = AES.new(bytes.fromhex(hashlib.sha1(password.encode()).hexdigest()[:32]), AES.MODE_ECB)
+    return b32encode(b''.join(cipher.encrypt(url[i:i + 16].encode())
+                              for i in range(0, len(url), 16))).rstrip(b'=').decode('utf-8')
+
+
+@pytest.mark.parametrize('content', ['a', 'archive/1700000000/0', 'x' * 15, 'x' * 16, 'x' * 40])
+def test_cached_token_is_uncached_one(content):
+    cdn.token.cache_clear()
+    expected: str = reference('10.0.0.1:8080', 'secret', '42', content)
+    assert cdn.token('10.0.0.1:8080', 'secret', '42', content) == expected
+    assert cdn.token('10.0.0.1:8080', 'secret', '42', content) == expected
+    assert cdn.token.cache_info().hits == 1
+
+
+def test_token_known_answer():
+    assert reference('10.0.0.1:8080', 'secret', '42', 'live') == KNOWN
+    assert cdn.token('10.0.0.1:8080', 'secret', '42', 'live') == KNOWN
+
+
+def test_path_keeps_parameters_plain():
+    assert cdn.path('h:1', 'p', '7', 'live?speed=2') == cdn.token('h:1', 'p', '7', 'live') + '/speed=2'
+    assert cdn.path('h:1', 'p', '7', 'live?') == cdn.token('h:1', 'p', '7', 'live')
+
+
+def test_batch():
+    lines = ['# comment', '', 'h:1 7 live', 'h:2 8 live?speed=2 other']
+    assert list(cdn.batch(lines, 'p')) == ['http://h:1/' + reference('h:1', 'p', '7', 'live'),
+                                           'http://h:2/' + reference('h:2', 'other', '8', 'live') + '/speed=2']
+    with pytest.raises(ValueError):
+        list(cdn.batch(['h:1 7 live']))
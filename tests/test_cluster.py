@@ -0,0 +1,91 @@
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+from timestampinspect.cluster.coordinator import Coordinator, WorkerState
+from timestampinspect.cluster.protocol import HELLO
+
+RUN: str = 'from timestampinspect.display.application import run; run()'
+
+
+def connected(listener: socket.socket) -> WorkerState:
+    """Returns state of worker connected to listener, its peer is kept open by the state"""
+    peer: socket.socket = socket.create_connection(listener.getsockname())
+    worker: WorkerState = WorkerState(listener.accept()[0])
+    worker.peer = peer
+    return worker
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_joining_worker_takes_least_and_dead_streams():
+    inventory = [f'rtsp://camera/{i}' for i in range(10)]
+    coordinator: Coordinator = Coordinator(inventory)
+    with socket.socket() as listener:
+        listener.bind(('127.0.0.1', 0))
+        listener.listen()
+        workers = [connected(listener) for _ in range(4)]
+        try:
+            for worker in workers[:3]:
+                coordinator.on_message(worker, {'type': HELLO, 'name': f'w{len(coordinator.workers)}'})
+            assert sorted(len(w.streams) for w in workers[:3]) == [3, 3, 4]
+            dead = set()
+            for worker in workers[:3]:
+                worker.report = {url: {'alive': True} for url in worker.streams}
+                url = sorted(worker.streams)[-1]
+                worker.report[url]['alive'] = False
+                dead.add(url)
+            before = {url for w in workers[:3] for url in w.streams}
+            coordinator.on_message(workers[3], {'type': HELLO, 'name': 'w3'})
+            assert sorted(len(w.streams) for w in workers) == [2, 2, 3, 3]
+            assert workers[3].streams <= dead
+            assert {url for w in workers for url in w.streams} == before
+            coordinator.on_lost(workers[0])
+            assert sorted(len(w.streams) for w in workers[1:]) == [3, 3, 4]
+            assert {url for w in workers[1:] for url in w.streams} == set(inventory)
+        finally:
+            for worker in workers:
+                worker.socket.close()
+                worker.peer.close()
+
+
+def test_repeated_hello_registers_worker_once():
+    coordinator: Coordinator = Coordinator([f'rtsp://camera/{i}' for i in range(4)])
+    with socket.socket() as listener:
+        listener.bind(('127.0.0.1', 0))
+        listener.listen()
+        workers = [connected(listener) for _ in range(2)]
+        try:
+            for worker in workers + workers[:1]:
+                coordinator.on_message(worker, {'type': HELLO, 'name': 'w'})
+            coordinator.on_message(workers[0], {'type': HELLO, 'name': 'renamed'})
+            assert coordinator.workers == workers and workers[0].name == 'renamed'
+            assert [len(w.streams) for w in workers] == [2, 2]
+        finally:
+            for worker in workers:
+                worker.socket.close()
+                worker.peer.close()
+
+
+def test_local_workers_share_streams(standin, environment, tmp_path):
+    port, control = standin
+    inventory = tmp_path / 'inventory.txt'
+    inventory.write_text(''.join(f'http://127.0.0.1:{port}/a/{i}/0/0\n' for i in range(7)))
+    coordinator = subprocess.Popen([sys.executable, '-c', RUN, 'coordinator', str(inventory),
+                                    '-port', str(free_port()), '-period', '.5', '-workers', '3',
+                                    '-worker_options', f'-cp {control}'],
+                                   env=environment, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    time.sleep(4.)
+    coordinator.send_signal(signal.SIGINT)
+    output: str = coordinator.communicate(timeout=10)[0].decode()
+    lines = output.splitlines()
+    last = [x for x in lines if x.startswith('coordinator ')][-1]
+    assert 'workers=3 streams=7 alive=7 ' in last
+    shares = [int(re.search(r' streams=(\d+)', x).group(1)) for x in lines[lines.index(last) - 3:lines.index(last)]]
+    assert sorted(shares) == [2, 2, 3]
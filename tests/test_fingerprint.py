@@ -0,0 +1,66 @@
+from timestampinspect.analysis.fingerprint import Repeat, RepeatDetector, SAMPLE_LIMIT, SAMPLE_SIZE
+
+
+def feed(detector: RepeatDetector, units: list) -> list:
+    """Passes every unit as one chunk with next timestamp and finishes the last one. Returns repeat kinds"""
+    kinds = [detector.update(i * 3600, memoryview(unit)) for i, unit in enumerate(units + [b'end'])]
+    return kinds[1:]
+
+
+def test_identical_units_are_frozen_run():
+    detector: RepeatDetector = RepeatDetector()
+    kinds = feed(detector, [b'a' * 100] + [b'b' * 100] * 4 + [b'c' * 100] + [b'b' * 100] * 2)
+    assert kinds == [Repeat.NONE, Repeat.NONE] + [Repeat.PREVIOUS] * 3 + [Repeat.NONE, Repeat.WINDOW, Repeat.PREVIOUS]
+    assert (detector.frames, detector.frozen, detector.repeated) == (8, 4, 1)
+    assert detector.longest == (3, 4 * 3600) and detector.run == 1
+
+
+def test_alternating_units_repeat_in_window():
+    detector: RepeatDetector = RepeatDetector()
+    assert feed(detector, [b'a', b'b'] * 3) == [Repeat.NONE] * 2 + [Repeat.WINDOW] * 4
+    assert (detector.frozen, detector.repeated, detector.longest) == (0, 4, (0, 0))
+
+
+def test_units_leave_window():
+    assert feed(RepeatDetector(window=2), [b'a', b'b', b'c', b'a'])[-1] == Repeat.NONE
+    assert feed(RepeatDetector(window=3), [b'a', b'b', b'c', b'a'])[-1] == Repeat.WINDOW
+    detector: RepeatDetector = RepeatDetector(window=2)
+    feed(detector, [b'a', b'b', b'c', b'd'])
+    assert len(detector._counts) == 2
+
+
+def test_chunks_of_unit_hash_as_whole():
+    detector: RepeatDetector = RepeatDetector()
+    for i in range(2):
+        detector.update(i, memoryview(b'ab'))
+        detector.update_payload(memoryview(b'cd'))
+        detector.update(i, memoryview(b'ef'))
+    assert detector.update(2, memoryview(b'')) == Repeat.PREVIOUS
+
+
+def test_large_units_are_sampled_above_limit():
+    size: int = SAMPLE_LIMIT + 40000
+
+    def unit(change: int = -1) -> bytearray:
+        rc: bytearray = bytearray(size)
+        if change >= 0:
+            rc[change] = 1
+        return rc
+    # Whole chunk is hashed up to limit, bytes after limit are not
+    assert feed(RepeatDetector(), [unit(), unit(SAMPLE_LIMIT - 1)])[-1] == Repeat.NONE
+    assert feed(RepeatDetector(), [unit(), unit(SAMPLE_LIMIT + 1000)])[-1] == Repeat.PREVIOUS
+    # Size is a part of fingerprint
+    assert feed(RepeatDetector(), [unit(), unit() + b'x'])[-1] == Repeat.NONE
+
+    def chunked(change: int = -1) -> Repeat:
+        detector: RepeatDetector = RepeatDetector()
+        for i, data in enumerate((unit(), unit(change))):
+            detector.update(i, memoryview(data)[:60000])
+            detector.update_payload(memoryview(data)[60000:SAMPLE_LIMIT + 20000])
+            detector.update_payload(memoryview(data)[SAMPLE_LIMIT + 20000:])
+        return detector.update(2, memoryview(b''))
+    # Chunk crossing limit is hashed up to limit, later chunks by their first SAMPLE_SIZE bytes
+    assert chunked(SAMPLE_LIMIT - 1) == Repeat.NONE
+    assert chunked(SAMPLE_LIMIT + 10) == Repeat.PREVIOUS
+    assert chunked(SAMPLE_LIMIT + 20000 + SAMPLE_SIZE - 1) == Repeat.NONE
+    assert chunked(SAMPLE_LIMIT + 20000 + SAMPLE_SIZE) == Repeat.PREVIOUS
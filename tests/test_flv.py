@@ -0,0 +1,45 @@
+from timestampinspect.protocols import flv
+from timestampinspect.protocols.sink import Sink
+
+START: int = 10 ** 18
+TAG_SIZE: int = 11 + 605 + 4
+
+
+def stream(count: int, gop: int = 25) -> bytes:
+    """Returns flv of count avc video tags 40 ms apart, every gop-th one is keyframe"""
+    data: bytearray = bytearray(b'FLV\x01\x01\x00\x00\x00\x09' + bytes(4))
+    for i in range(count):
+        body: bytes = bytes([0x17 if not i % gop else 0x27, 1, 0, 0, 0]) + bytes(600)
+        timestamp: int = i * 40
+        data += bytes([flv.TagType.VIDEO]) + len(body).to_bytes(3, 'big') + \
+            (timestamp & 0xffffff).to_bytes(3, 'big') + bytes([timestamp >> 24]) + bytes(3) + body + \
+            (11 + len(body)).to_bytes(4, 'big')
+    return bytes(data)
+
+
+def source(data: bytes) -> flv.Source:
+    """Returns source fed with tags of data, received 40 ms apart"""
+    rc: flv.Source = flv.Source(Sink(), 'a/b/0/0', 0)
+    offset: int = rc.on_tag(data, True, START)
+    tag: int = 1
+    while offset + 15 <= len(data):
+        offset += rc.on_tag(memoryview(data)[offset:], arrival=START + tag * 40000000)
+        tag += 1
+    return rc
+
+
+def test_keyframe_index_find():
+    index: flv.KeyframeIndex = flv.KeyframeIndex()
+    assert index.append(0, 13) == 0
+    assert index.append(1000, 5000) == 1000
+    assert index.find(-1) is None
+    assert index.find(999) == (0, 13)
+    assert index.find(1000) == (1000, 5000)
+
+
+def test_history_reports_keyframe_of_range():
+    rc: flv.Source = source(stream(100))
+    assert len(rc.keyframes) == 4
+    lines = rc.history(START + 2100000000, START + 2200000000).split('\n')
+    assert lines[0] == f'video decoded from keyframe ts=2000, position={13 + 50 * TAG_SIZE}'
+    assert lines[1].startswith('video ts=2120')
@@ -0,0 +1,137 @@
+import random
+from types import SimpleNamespace
+import pytest
+from timestampinspect.load import generator
+from timestampinspect.load.generator import ACTIONS, Metrics, Scenario, SessionForm
+
+GET: str = 'GET /?control=c&action=seek&pos=60 HTTP/1.0'
+
+
+class Clock:
+    """Monotonic clock of generator module set by test"""
+    def __init__(self) -> None:
+        self.now: float = 100.
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    rc: Clock = Clock()
+    monkeypatch.setattr(generator, 'time', SimpleNamespace(monotonic=rc))
+    return rc
+
+
+def act(form: SessionForm, clock: Clock, action: str, status: str = '200 OK') -> None:
+    """Requests action, sends it after 10 ms and receives reply after 50 ms more"""
+    form.request(action)
+    clock.now += .01
+    form.log_http(GET)
+    clock.now += .05
+    form.log_http(f'HTTP/1.1 {status}')
+
+
+def test_latency_and_recovery(clock):
+    metrics: Metrics = Metrics()
+    form: SessionForm = SessionForm(metrics, 5.)
+    form.request('seek')
+    assert form.busy
+    form.log_http('HTTP/1.0 200 OK')
+    assert form.busy
+    clock.now += .01
+    form.log_http(GET)
+    clock.now += .05
+    form.log_http('HTTP/1.1 200 OK')
+    assert not form.busy
+    clock.now += .1
+    form.log_flv('tag')
+    form.log_flv('tag')
+    seek = metrics.actions['seek']
+    assert (seek.count, seek.errors, seek.stalls, form.frames) == (1, 0, 0, 2)
+    assert seek.latency.moments.mean == pytest.approx(50.)
+    assert seek.recovery.moments.count == 1 and seek.recovery.moments.mean == pytest.approx(100.)
+
+
+def test_no_recovery_until_play_after_pause(clock):
+    metrics: Metrics = Metrics()
+    form: SessionForm = SessionForm(metrics, 5.)
+    act(form, clock, 'pause')
+    act(form, clock, 'seek')
+    clock.now += 10.
+    form.expire()
+    form.log_flv('tag')
+    act(form, clock, 'play')
+    clock.now += .2
+    form.log_flv('tag')
+    assert [metrics.actions[x].count for x in ('pause', 'seek', 'play')] == [1, 1, 1]
+    assert [metrics.actions[x].recovery.moments.count for x in ('pause', 'seek', 'play')] == [0, 0, 1]
+    assert metrics.actions['play'].recovery.moments.mean == pytest.approx(200.)
+    assert sum(x.stalls for x in metrics.actions.values()) == 0
+
+
+def test_errors_timeouts_and_stalls(clock):
+    metrics: Metrics = Metrics()
+    form: SessionForm = SessionForm(metrics, 5.)
+    act(form, clock, 'scale', '500 Internal Server Error')
+    clock.now += 10.
+    form.expire()
+    assert (metrics.actions['scale'].errors, metrics.actions['scale'].stalls) == (1, 0)
+    form.request('seek')
+    clock.now += 4.
+    form.expire()
+    assert form.busy
+    clock.now += 2.
+    form.expire()
+    assert not form.busy
+    assert (metrics.actions['seek'].count, metrics.actions['seek'].errors) == (1, 1)
+    act(form, clock, 'shift')
+    clock.now += 6.
+    form.expire()
+    form.log_flv('tag')
+    shift = metrics.actions['shift']
+    assert (shift.count, shift.errors, shift.stalls, shift.recovery.moments.count) == (1, 0, 1, 0)
+    form.log_error('closed')
+    assert metrics.stream_errors == 1
+
+
+def test_scenario_load(tmp_path):
+    path = tmp_path / 'scenario.txt'
+    path.write_text('# warm up\n\nseek 60  # to minute\nplay\n  pause\n')
+    assert Scenario.load(str(path)) == [('seek', '60'), ('play',), ('pause',)]
+    for line in ('jump 10\n', 'seek 60 120\n'):
+        path.write_text(line)
+        with pytest.raises(ValueError):
+            Scenario.load(str(path))
+
+
+def test_scenario_cycles_from_random_start():
+    lines = [('seek', '60'), ('play',), ('pause',)]
+    start: int = random.Random(7).randrange(len(lines))
+    scenario: Scenario = Scenario(lines, random.Random(7))
+    assert [scenario.next() for _ in range(6)] == [lines[(start + i) % 3] for i in range(6)]
+
+
+def test_random_actions_with_parameters():
+    scenario: Scenario = Scenario([], random.Random(3))
+    actions = [scenario.next() for _ in range(200)]
+    assert {x[0] for x in actions} == set(ACTIONS)
+    for action in actions:
+        choices = ACTIONS[action[0]]
+        assert len(action) == (2 if choices else 1)
+        assert not choices or int(action[1]) in choices
+    other: Scenario = Scenario([], random.Random(3))
+    assert [other.next() for _ in range(200)] == actions
+
+
+def test_run_against_standin(standin, capsys):
+    port, control = standin
+    generator.run([f'http://127.0.0.1:{port}/dvr/s{{n}}/0/0', '-cp', str(control), '-sessions', '3', '-rate', '10',
+                   '-duration', '2', '-period', '5', '-seed', '1', '-timeout', '2'])
+    output: str = capsys.readouterr().out
+    report: str = output[output.rindex('sessions='):]
+    # sessions are joined before the last report
+    assert report.startswith('sessions=0/3 ') and report.rstrip().endswith('stream errors=0')
+    assert 5. < float(report.split('actions/s=')[1].split()[0]) <= 15.
+    assert 'latency ms: p50=' in report and 'errors=0 ' in report
+    assert int(report.split('frames=')[1].split()[0]) > 0
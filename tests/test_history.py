@@ -0,0 +1,36 @@
+import random
+from timestampinspect.analysis.history import BitReader, BitWriter, Sample, TimestampHistory
+
+
+def test_dod_round_trip():
+    values = [0, 1, -1, 7, -8, 8, -9, 127, -128, 128, 32767, -32768, 32768, -(1 << 40), (1 << 62)]
+    writer: BitWriter = BitWriter()
+    for value in values:
+        writer.write_dod(value)
+    reader: BitReader = BitReader(writer.getvalue())
+    assert [reader.read_dod() for _ in values] == values
+
+
+def test_history_round_trip():
+    rng: random.Random = random.Random(5)
+    history: TimestampHistory = TimestampHistory(resolution=1)
+    samples = []
+    timestamp, arrival = (1 << 32) - 3600 * 100, 10 ** 18
+    for i in range(TimestampHistory.CHUNK_SIZE * 2 + 100):
+        timestamp = (timestamp + rng.choice((3600, 3600, 3600, 7200, -3600))) % (1 << 32)
+        arrival += rng.randint(0, 80000000)
+        history.append(timestamp, arrival)
+        history.append(timestamp, arrival + 1000)  # packet of the same frame is not kept
+        samples.append(Sample(timestamp, arrival))
+    assert len(history) == len(samples)
+    assert list(history.range(0, 1 << 62)) == samples
+    begin, end = samples[5000].arrival, samples[6000].arrival
+    assert list(history.range(begin, end)) == [x for x in samples if begin <= x.arrival < end]
+
+
+def test_history_resolution():
+    history: TimestampHistory = TimestampHistory()
+    history.append(0, 1234567890)
+    history.append(3600, 1274567890)
+    assert list(history.range(0, 1 << 62)) == [Sample(0, 1234000000), Sample(3600, 1274000000)]
+    assert history.lines(1234000000, 1274000000)[0].startswith('ts=0, delta=0')
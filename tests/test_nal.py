@@ -0,0 +1,37 @@
+from timestampinspect.protocols import nal
+
+
+def test_h264_units():
+    assert nal.UNITS[nal.Codec.H264][0x65] == nal.Unit(5, nal.Kind.SINGLE, 1)
+    assert nal.UNITS[nal.Codec.H264][0x41] == nal.Unit(1, nal.Kind.SINGLE, 1)
+    assert nal.UNITS[nal.Codec.H264][0x78] == nal.Unit(24, nal.Kind.AGGREGATION, 1)
+    assert nal.UNITS[nal.Codec.H264][0x7c] == nal.Unit(28, nal.Kind.FRAGMENT, 1)
+    assert nal.UNITS[nal.Codec.H264][0x7d] == nal.Unit(29, nal.Kind.FRAGMENT, 1)
+    assert nal.UNITS[nal.Codec.H264][0x1e].kind == nal.Kind.UNKNOWN
+
+
+def test_h265_units():
+    assert nal.UNITS[nal.Codec.H265][19 << 1] == nal.Unit(19, nal.Kind.SINGLE, 2)
+    assert nal.UNITS[nal.Codec.H265][48 << 1] == nal.Unit(48, nal.Kind.AGGREGATION, 2)
+    assert nal.UNITS[nal.Codec.H265][49 << 1 | 1] == nal.Unit(49, nal.Kind.FRAGMENT, 2)
+    assert nal.UNITS[nal.Codec.H265][50 << 1].kind == nal.Kind.UNKNOWN
+
+
+def test_fragments():
+    assert nal.FRAGMENTS[nal.Codec.H264][0x85] == nal.Fragment(1, 0, 5)
+    assert nal.FRAGMENTS[nal.Codec.H264][0x05] == nal.Fragment(0, 0, 5)
+    assert nal.FRAGMENTS[nal.Codec.H264][0x45] == nal.Fragment(0, 1, 5)
+    assert nal.FRAGMENTS[nal.Codec.H265][0x93] == nal.Fragment(1, 0, 19)
+    assert nal.FRAGMENTS[nal.Codec.H265][0x53] == nal.Fragment(0, 1, 19)
+
+
+def test_aggregated_types():
+    sps, pps, idr = bytes([0x67, 0]), bytes([0x68, 0, 0]), bytes([0x65])
+    stap_a: bytes = bytes([0x78]) + b''.join(len(x).to_bytes(2, 'big') + x for x in (sps, pps, idr))
+    assert nal.aggregated_types(nal.Codec.H264, b'\x80' * 12 + stap_a, 12) == [7, 8, 5]
+    stap_b: bytes = bytes([0x79, 0, 1]) + b''.join(len(x).to_bytes(2, 'big') + x for x in (sps, idr))
+    assert nal.aggregated_types(nal.Codec.H264, stap_b) == [7, 5]
+    assert nal.aggregated_types(nal.Codec.H264, bytes([0x7a, 0, 0, 0])) == []
+    vps, idr265 = bytes([32 << 1, 1, 0]), bytes([19 << 1, 1])
+    ap: bytes = bytes([48 << 1, 1]) + b''.join(len(x).to_bytes(2, 'big') + x for x in (vps, idr265))
+    assert nal.aggregated_types(nal.Codec.H265, ap) == [32, 19]
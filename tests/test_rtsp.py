@@ -0,0 +1,152 @@
+import socket
+import struct
+import sys
+import time
+import pytest
+from timestampinspect.analysis.statistics import ntp_to_ns
+from timestampinspect.protocols import nal, rtsp, udp
+from timestampinspect.protocols.buffer import Policy
+from timestampinspect.protocols.sink import Sink
+
+PAYLOAD: int = 976
+
+
+def rtp(sequence: int, timestamp: int, payload: bytes, marker: bool = False) -> bytes:
+    return bytes([0x80, 96 | (0x80 if marker else 0)]) + sequence.to_bytes(2, 'big') + \
+        timestamp.to_bytes(4, 'big') + (1234).to_bytes(4, 'big') + payload
+
+
+def fragmented(frames: int, fragments: int = 3, codec: nal.Codec = nal.Codec.H264) -> list:
+    """Returns rtp packets of frames of one idr unit, each split into fragmentation units"""
+    indicator: bytes = bytes([0x7c]) if codec == nal.Codec.H264 else bytes([49 << 1, 1])
+    unit_type: int = 5 if codec == nal.Codec.H264 else 19
+    packets = []
+    for frame in range(frames):
+        for fragment in range(fragments):
+            header: int = unit_type | (0x80 if not fragment else 0) | (0x40 if fragment == fragments - 1 else 0)
+            packets.append(rtp(len(packets), frame * 3600, indicator + bytes([header]) + bytes(PAYLOAD),
+                               fragment == fragments - 1))
+    return packets
+
+
+def interleaved(packets: list, channel: int = 0) -> bytes:
+    return b''.join(bytes([0x24, channel]) + len(x).to_bytes(2, 'big') + x for x in packets)
+
+
+def source(**kwargs) -> rtsp.Source:
+    rc: rtsp.Source = rtsp.Source(Sink(), [], 'c', **kwargs)
+    rc._state = rtsp.State.PLAYING
+    return rc
+
+
+def test_fragmented_frames_count_every_fragment():
+    packets = fragmented(10)
+    rc: rtsp.Source = source()
+    rc.on_interleaved(interleaved(packets), 10 ** 18)
+    assert rc.stream_statistics.frames == 10
+    assert rc.stream_statistics.bytes == sum(len(x) for x in packets)
+    assert rc.stream_statistics.timestamp_delta.moments.mean == 3600.
+
+
+def test_fragmented_h265_datagrams():
+    packets = fragmented(4, 2, nal.Codec.H265)
+    rc: rtsp.Source = source()
+    rc.codec = nal.Codec.H265
+    rc.on_datagrams(0, [(memoryview(x), 10 ** 18) for x in packets])
+    assert (rc.stream_statistics.frames, rc.stream_statistics.bytes) == (4, sum(len(x) for x in packets))
+
+
+def test_headers_only_counts_skipped_payload():
+    packets = fragmented(10)
+    rc: rtsp.Source = source(headers_only=True)
+    data: bytes = interleaved(packets)
+    for i in range(0, len(data), 100):
+        chunk: bytes = data[i:i + 100]
+        skip: int = min(rc.skip_size(), len(chunk))
+        if skip:
+            rc.on_skip(memoryview(chunk[:skip]))
+        if len(chunk) > skip:
+            rc.on_interleaved(chunk[skip:], 10 ** 18)
+    assert (rc.stream_statistics.frames, rc.stream_statistics.bytes) == (10, sum(len(x) for x in packets))
+
+
+def test_overflowed_rtcp_is_not_counted():
+    rc: rtsp.Source = source(buffer_limit=(64, Policy.TRUNCATE))
+    rc.on_interleaved(bytes([0x24, 1]) + (400).to_bytes(2, 'big') + bytes([0x80, 200, 0, 99]) + bytes(96), 10 ** 18)
+    assert rc.stream_statistics.frames == 0
+    rc.on_interleaved(bytes(300), 10 ** 18)
+    rc.on_interleaved(interleaved(fragmented(2)), 10 ** 18)
+    assert rc.stream_statistics.frames == 2
+
+
+def sender_report(seconds: int, fraction: int, timestamp: int) -> bytes:
+    return bytes([0x80, 200]) + (6).to_bytes(2, 'big') + (1234).to_bytes(4, 'big') + \
+        struct.pack('>III', seconds, fraction, timestamp) + bytes(8)
+
+
+def receive(sockets: list) -> list:
+    """Returns batches of datagrams pending on sockets by channel"""
+    time.sleep(.1)
+    return [udp.DatagramReceiver(s).receive() for s in sockets]
+
+
+def test_udp_transport_rtp_loss_and_sender_reports():
+    rc: rtsp.Source = source(transport=rtsp.Transport.UDP)
+    request: str = rc._transport_request()
+    sockets = rc.datagram_sockets()
+    port: int = sockets[0].getsockname()[1]
+    sender: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        assert request == f'RTP/AVP;unicast;client_port={port}-{port + 1}' and not port & 1
+        assert sockets[1].getsockname()[1] == port + 1
+        for sequence in (0, 1, 2, 5, 6):
+            sender.sendto(rtp(sequence, sequence * 3600, bytes([0x65]) + bytes(100), True), ('127.0.0.1', port))
+        sender.sendto(sender_report(3900000000, 1 << 31, 7200), ('127.0.0.1', port + 1))
+        for channel, packets in enumerate(receive(sockets)):
+            assert len(packets) == (5, 1)[channel]
+            rc.on_datagrams(channel, packets)
+    finally:
+        sender.close()
+        for s in sockets:
+            s.close()
+    assert (rc.stream_statistics.frames, rc.stream_statistics.lost) == (5, 2)
+    assert rc.stream_statistics.bytes == 5 * 113
+    assert rc.stream_statistics.clock._report == (ntp_to_ns(3900000000, 1 << 31), 7200)
+
+
+def test_datagram_arrival_from_kernel_timestamp(monkeypatch):
+    if not sys.platform.startswith('linux'):
+        pytest.skip('kernel receive timestamps are used on linux only')
+    sockets = udp.unicast_pair()
+    sender: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sent: int = time.time_ns()
+        sender.sendto(bytes(20), ('127.0.0.1', sockets[0].getsockname()[1]))
+        time.sleep(.1)
+        monkeypatch.setattr(udp.time, 'time_ns', lambda: 0)
+        packets = udp.DatagramReceiver(sockets[0]).receive()
+    finally:
+        monkeypatch.undo()
+        sender.close()
+        for s in sockets:
+            s.close()
+    assert len(packets) == 1 and len(packets[0][0]) == 20
+    assert sent <= packets[0][1] < sent + 100000000
+
+
+def test_multicast_transport_joins_destination():
+    rc: rtsp.Source = source(transport=rtsp.Transport.MULTICAST)
+    assert rc._transport_request() == 'RTP/AVP;multicast'
+    sockets = udp.unicast_pair()
+    port: int = sockets[0].getsockname()[1]
+    for s in sockets:
+        s.close()
+    try:
+        rc._set_transport(header=f'Transport: RTP/AVP;multicast;destination=239.255.12.34;port={port}-{port + 1}')
+    except OSError as err:
+        pytest.skip(f'no multicast: {err}')
+    try:
+        assert [s.getsockname()[1] for s in rc.datagram_sockets()] == [port, port + 1]
+    finally:
+        for s in rc.datagram_sockets():
+            s.close()
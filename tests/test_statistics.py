@@ -0,0 +1,65 @@
+import random
+from timestampinspect.analysis.statistics import P2Quantile, StreamStatistics, Welford
+
+
+def frames(count: int, wrap_in: int = 100):
+    """Yields (timestamp, arrival, size) of 25 fps stream at 90 kHz, whose clock is 30 ppm slow
+       and whose timestamps wrap after wrap_in frames. Every fifth frame has two packets"""
+    rng: random.Random = random.Random(7)
+    timestamp: int = (1 << 32) - 3600 * wrap_in
+    for i in range(count):
+        arrival: int = 10 ** 18 + int(i * 40e6 * (1 + 30e-6)) + rng.randint(0, 2000000)
+        yield (timestamp + 3600 * i) & 0xffffffff, arrival, 1000
+        if not i % 5:
+            yield (timestamp + 3600 * i) & 0xffffffff, arrival + 1000, 500
+
+
+def test_welford_merge_is_exact():
+    values = [random.Random(1).uniform(-5, 5) for _ in range(1000)]
+    whole, left, right = Welford(), Welford(), Welford()
+    for i, v in enumerate(values):
+        whole.update(v)
+        (left if i < 300 else right).update(v)
+    left.merge(right)
+    assert left.count == whole.count
+    assert abs(left.mean - whole.mean) < 1e-9
+    assert abs(left.variance - whole.variance) < 1e-9
+
+
+def test_p2_quantile_merge_is_close():
+    rng = random.Random(2)
+    left, right = P2Quantile(.95), P2Quantile(.95)
+    values = [rng.gauss(0., 1.) for _ in range(20000)]
+    for i, v in enumerate(values):
+        (left if i < 8000 else right).update(v)
+    left.merge(right)
+    assert abs(left.value - sorted(values)[int(.95 * len(values))]) < .1
+
+
+def test_p2_quantile_merge_of_few_samples():
+    left, right = P2Quantile(.5), P2Quantile(.5)
+    for v in (1., 2.):
+        left.update(v)
+    for v in (3., 4., 5.):
+        right.update(v)
+    left.merge(right)
+    assert left.value == 3.
+
+
+def test_stream_statistics_merge_of_regions():
+    packets = list(frames(3000))
+    whole = StreamStatistics()
+    for packet in packets:
+        whole.update(*packet)
+    merged = StreamStatistics()
+    for begin, end in ((0, 700), (700, 2299), (2299, len(packets))):  # second cut splits frame
+        part = StreamStatistics()
+        for packet in packets[begin:end]:
+            part.update(*packet)
+        merged.merge(part)
+    assert (merged.frames, merged.bytes) == (whole.frames, whole.bytes) == (3000, 3300000)
+    assert merged.timestamp_delta.moments.count == whole.timestamp_delta.moments.count == 2999
+    assert merged.timestamp_delta.minimum[0] == merged.timestamp_delta.maximum[0] == 3600
+    assert abs(merged.inter_arrival.moments.mean - whole.inter_arrival.moments.mean) < 1e-6
+    assert abs(merged.clock.drift - whole.clock.drift) < .1
+    assert abs(merged.clock.drift + 30.) < 2.
@@ -0,0 +1,89 @@
+import sqlite3
+from datetime import datetime, timezone
+from timestampinspect.analysis import store
+from timestampinspect.analysis.statistics import StreamStatistics
+
+SECOND: int = 1000000000
+FRAME: int = 40000000
+
+
+def midnight() -> int:
+    """Returns start of current utc day in nanoseconds"""
+    now: datetime = datetime.now(timezone.utc)
+    return int(datetime(now.year, now.month, now.day, tzinfo=timezone.utc).timestamp()) * SECOND
+
+
+def iso(ns: int) -> str:
+    return datetime.fromtimestamp(ns / SECOND, timezone.utc).isoformat()
+
+
+def recorded(path: str, boundary: int) -> None:
+    """Records 2 s. of stream a at 25 fps, every frame in two packets, and 2 s. of stream b at 5 fps
+       around partition boundary"""
+    db: sqlite3.Connection = sqlite3.connect(path)
+    db.execute(f'CREATE TABLE frames_20000101 ({store.FRAMES_COLUMNS})')
+    db.execute(f'CREATE TABLE intervals_20000101 ({store.INTERVALS_COLUMNS})')
+    db.close()
+    s: store.Store = store.Store(path, retention=7, interval=1.)
+    a = s.recorder('camera/a', StreamStatistics())
+    b = s.recorder('camera/b', StreamStatistics())
+    for k in range(50):
+        arrival: int = boundary - SECOND + k * FRAME
+        a(k * 3600, arrival, 60)
+        a(k * 3600, arrival + 1000, 40)
+        if not k % 5:
+            b(k * 3600, arrival + 1, 500)
+    s.start()
+    s.join()
+
+
+def test_store_partitions_frames_and_intervals(tmp_path):
+    path: str = str(tmp_path / 'store.db')
+    boundary: int = midnight()
+    recorded(path, boundary)
+    db: sqlite3.Connection = sqlite3.connect(path)
+    try:
+        assert db.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        tables = sorted(x for x, in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'"))
+        days = [store.partition(boundary - 1), store.partition(boundary)]
+        assert tables == sorted(['streams'] + [f'{t}_{d}' for t in ('frames', 'intervals') for d in days])
+        assert db.execute('SELECT id, name FROM streams').fetchall() == [(1, 'camera/a'), (2, 'camera/b')]
+        for day, delta in zip(days, (0, 3600)):
+            rows = db.execute(f'SELECT arrival, delta, size FROM frames_{day} WHERE stream = 1').fetchall()
+            assert len(rows) == 25 and all(x[2] == 100 for x in rows)
+            assert rows[0][1] == delta and all(x[1] == 3600 for x in rows[1:])
+            assert len(db.execute(f'SELECT * FROM frames_{day} WHERE stream = 2').fetchall()) == 5
+        intervals = [db.execute(f'SELECT time, frames, bytes, delta_min, delta_max, delta_mean, gap_max '
+                                f'FROM intervals_{day} WHERE stream = 1').fetchall() for day in days]
+        assert intervals == [[(boundary - SECOND, 25, 2500, 3600, 3600, 3600., 40.)],
+                             [(boundary, 25, 2500, 3600, 3600, 3600., 40.)]]
+        rows = list(store.query(db, 'frames', boundary - SECOND, boundary + SECOND, '/a'))
+        assert len(rows) == 50 and {x[0] for x in rows} == {'camera/a'}
+        assert [x[2] for x in rows] == sorted(x[2] for x in rows)
+        assert len(list(store.query(db, 'intervals', boundary - SECOND, boundary + SECOND))) == 4
+    finally:
+        db.close()
+
+
+def test_query_cli(tmp_path, capsys):
+    path: str = str(tmp_path / 'store.db')
+    boundary: int = midnight()
+    recorded(path, boundary)
+    store.run([path, '-streams'])
+    assert capsys.readouterr().out == 'camera/a\ncamera/b\n'
+    store.run([path, '-stream', 'b', '-begin', iso(boundary - SECOND), '-end', iso(boundary + SECOND)])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == 'name\tarrival\ttimestamp\tdelta\tsize' and len(lines) == 11
+    assert all(x.startswith('camera/b\t') and x.endswith('\t500') for x in lines[1:])
+    store.run([path, '-intervals', '-begin', iso(boundary), '-end', iso(boundary + SECOND)])
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 3 and lines[1].split('\t')[2:4] == ['25', '2500']
+
+
+def test_packets_above_queue_limit_are_dropped(tmp_path):
+    s: store.Store = store.Store(str(tmp_path / 'store.db'), limit=10)
+    record = s.recorder('camera/a', StreamStatistics())
+    for k in range(15):
+        record(k * 3600, k * FRAME + 1, 100)
+    assert s.dropped == 5
+    assert repr(s) == 'Store(queued=10, dropped=5)'